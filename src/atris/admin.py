@@ -1,13 +1,24 @@
+import json
+
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.contenttypes.models import ContentType
+from django.core.paginator import Paginator
 from django.db import connections, models
+from django.db.models import Q
 from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html, format_html_join
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 
 from atris.models import ArchivedHistoricalRecord, HistoricalRecord, history_logging
 
 
+PREFIX_SEARCH_SUFFIX = "*"
+
+
 class ContentTypeListFilter(admin.SimpleListFilter):
     # Human-readable title which will be displayed in the
     # right admin sidebar just above the filter options.
@@ -24,16 +35,18 @@ class ContentTypeListFilter(admin.SimpleListFilter):
         human-readable name for the option that will appear
         in the right sidebar.
         """
-        followed_content_types = [
-            ContentType.objects.get_for_model(model)
-            for model in history_logging.registered_models.keys()
-        ]
+        # The content types are cached by ContentTypeManager, so they are
+        # fetched with one query, the first time only.
+        followed_content_types = ContentType.objects.get_for_models(
+            *history_logging.registered_models.keys(),
+        ).values()
 
-        filter_results = set()
-        for content_type in followed_content_types:
-            filter_results.add((content_type.id, _(content_type.model)))
+        filter_results = {
+            (content_type.id, _(content_type.model))
+            for content_type in followed_content_types
+        }
 
-        return filter_results
+        return sorted(filter_results, key=lambda result: str(result[1]))
 
     def queryset(self, request, queryset):
         """
@@ -45,44 +58,167 @@ class ContentTypeListFilter(admin.SimpleListFilter):
             return queryset.filter(content_type__id=self.value())
 
 
+def get_table_row_estimate(using, db_table):
+    """
+    Returns the number of rows of the table estimated by Postgres (reltuples
+    from pg_class) or None if the table was never analyzed.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+            [connection.ops.quote_name(db_table)],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def is_unfiltered(query):
+    return (
+        not query.where
+        and query.high_mark is None
+        and query.low_mark == 0
+        and not query.select
+        and not query.group_by
+        and not query.distinct
+    )
+
+
+def get_estimated_count(queryset):
+    """
+    Returns the number of objects of the queryset as estimated by the Postgres
+    planner, without running a COUNT(*): the table statistics when the
+    queryset is not filtered, the row estimate of its query plan otherwise.
+    Counts the objects on other databases.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset.count()
+    if is_unfiltered(queryset.query):
+        count = get_table_row_estimate(queryset.db, queryset.model._meta.db_table)
+        if count is not None:
+            return count
+    plan = json.loads(queryset.explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 class ApproxCountPgQuerySet(models.query.QuerySet):
     """approximate unconstrained count(*) with reltuples from pg_class"""
 
     def count(self):
         if hasattr(connections[self.db].client.connection, "pg_version"):
-            query = self.query
-            no_filtration_used = (
-                not query.where
-                and query.high_mark is None
-                and query.low_mark == 0
-                and not query.select
-                and not query.group_by
-                and not query.having
-                and not query.distinct
-            )
-            if no_filtration_used:
-                parts = [p.strip('"') for p in self.model._meta.db_table.split(".")]
-                if 1 <= len(parts) <= 2:
-                    cursor = connections[self.db].cursor()
-                    if len(parts) == 1:
-                        cursor.execute(
-                            "SELECT reltuples::bigint "
-                            "FROM pg_class "
-                            "WHERE relname = %s",
-                            parts,
-                        )
-                    else:
-                        cursor.execute(
-                            "SELECT reltuples::bigint "
-                            "FROM pg_class c "
-                            "JOIN pg_namespace n on (c.relnamespace = n.oid) "
-                            "WHERE n.nspname = %s AND c.relname = %s",
-                            parts,
-                        )
-                    return cursor.fetchall()[0][0]
+            if is_unfiltered(self.query):
+                count = get_table_row_estimate(self.db, self.model._meta.db_table)
+                if count is not None:
+                    return count
         return self.query.get_count(using=self.db)
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator which never counts the objects, using the planner's estimate
+    instead. See `get_estimated_count`.
+    """
+
+    @cached_property
+    def count(self):
+        return get_estimated_count(self.object_list)
+
+
+class HistoryChangeList(ChangeList):
+    """
+    Change list which does not load the columns that are not displayed in the
+    list, such as the snapshots, and which navigates between pages with
+    keysets instead of page numbers: the next page holds the records after
+    the last one shown (`?after=<id>`), the previous page the records before
+    the first one shown (`?before=<id>`). The records are never counted and
+    no page is fetched with an OFFSET.
+    """
+
+    AFTER_VAR = "after"
+    BEFORE_VAR = "before"
+
+    def get_queryset(self, request, *args, **kwargs):
+        # The keysets are not filters. Removing them from the parameters also
+        # resets the navigation when a filter or the ordering is changed.
+        self.after = self.params.pop(self.AFTER_VAR, None)
+        self.before = self.params.pop(self.BEFORE_VAR, None)
+        self.ordering = self.get_ordering(request, self.root_queryset)
+        queryset = super().get_queryset(request, *args, **kwargs)
+        return queryset.defer(*self.model_admin.list_deferred_fields)
+
+    def get_results(self, request):
+        # The page numbers are not used.
+        self.page_num = 1
+        super().get_results(request)
+        self.previous_page_url = self.next_page_url = None
+        if self.show_all and self.can_show_all:
+            return
+        forward = self.before is None
+        cursor = self.after if forward else self.before
+        queryset = self.queryset
+        if cursor is not None:
+            queryset = queryset.filter(self.get_keyset_filter(cursor, forward))
+        if not forward:
+            queryset = queryset.order_by(*self.get_reversed_ordering())
+        results = list(queryset[: self.list_per_page + 1])
+        has_more = len(results) > self.list_per_page
+        results = results[: self.list_per_page]
+        if not forward:
+            results.reverse()
+        self.result_list = results
+        if results:
+            has_previous = has_more if not forward else cursor is not None
+            has_next = has_more if forward else True
+            if has_previous:
+                self.previous_page_url = self.get_query_string(
+                    {self.BEFORE_VAR: results[0].pk},
+                )
+            if has_next:
+                self.next_page_url = self.get_query_string(
+                    {self.AFTER_VAR: results[-1].pk},
+                )
+        self.multi_page = bool(self.previous_page_url or self.next_page_url)
+
+    def get_ordering_field_names(self):
+        names = [name for name in self.ordering if isinstance(name, str)]
+        if len(names) != len(self.ordering):
+            raise IncorrectLookupParameters("Only fields can order the keysets.")
+        return names
+
+    def get_reversed_ordering(self):
+        return [
+            name[1:] if name.startswith("-") else "-" + name
+            for name in self.get_ordering_field_names()
+        ]
+
+    def get_keyset_filter(self, cursor, forward):
+        """
+        Returns the filter of the records that come after (or, when not
+        `forward`, before) the record whose primary key is `cursor` in the
+        ordering of the list.
+        """
+        names = self.get_ordering_field_names()
+        fields = [name.lstrip("-") for name in names]
+        try:
+            values = self.root_queryset.values(*fields).get(pk=cursor)
+        except (self.model.DoesNotExist, ValueError):
+            raise IncorrectLookupParameters("Invalid keyset: {}.".format(cursor))
+        keyset_filter = Q(pk__in=[])
+        equal = Q()
+        for name, field in zip(names, fields):
+            lookup = "lt" if name.startswith("-") == forward else "gt"
+            if values[field] is None:
+                raise IncorrectLookupParameters("Keyset fields cannot be null.")
+            keyset_filter |= equal & Q(**{field + "__" + lookup: values[field]})
+            equal &= Q(**{field: values[field]})
+        # Bounding the first field as well lets the database scan an index.
+        first_lookup = "lt" if names[0].startswith("-") == forward else "gt"
+        first_bound = Q(**{fields[0] + "__" + first_lookup + "e": values[fields[0]]})
+        return first_bound & keyset_filter
+
+
 class GenericHistoryAdmin(admin.ModelAdmin):
     list_display = (
         "object_id",
@@ -98,21 +234,47 @@ class GenericHistoryAdmin(admin.ModelAdmin):
         "history_date",
         "history_type",
         "history_user",
+        "changeset_id",
         "difference_to_previous",
         "fields_that_differ",
+        "changed_values",
         "history_snapshot",
         "more_info",
         "related_field_history_admin",
+        "cause_chain_admin",
+        "caused_records_admin",
     ]
 
     readonly_fields = fields
 
     search_fields = ("object_id",)
 
+    search_help_text = _(
+        "Exact object id, or the beginning of one followed by *. Filter by "
+        "content type to search the objects of one model."
+    )
+
     list_filter = (ContentTypeListFilter, "history_type")
 
     show_full_result_count = False
 
+    paginator = EstimatedCountPaginator
+
+    # The keyset navigation needs columns that are never null.
+    sortable_by = ("object_id", "content_type", "history_date", "history_type")
+
+    list_select_related = ("content_type",)
+
+    list_deferred_fields = (
+        "data",
+        "additional_data",
+        "history_diff",
+        "history_changes",
+    )
+
+    def get_changelist(self, request, **kwargs):
+        return HistoryChangeList
+
     def get_queryset(self, request):
         # Capturing the request object in order to build the absolute URI in
         # `related_field_history_admin`
@@ -120,8 +282,37 @@ class GenericHistoryAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Looks the records up by object id: exact match by default, prefix
+        match when the term ends with `*`. Unlike the default case insensitive
+        substring match, both can use the indexes on the object id, with the
+        content type too when the list is filtered by it.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.endswith(PREFIX_SEARCH_SUFFIX):
+            prefix = search_term[: -len(PREFIX_SEARCH_SUFFIX)]
+            return queryset.filter(object_id__startswith=prefix), False
+        return queryset.filter(object_id=search_term), False
+
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None:
+            # The records related to this one are fetched with one recursive
+            # query each, instead of one query per record.
+            history = obj.__class__.objects.select_related("content_type")
+            obj.cause_chain_records = list(history.cause_chain(obj))
+            caused_records = history.filter(pk=obj.pk).with_related_tree()
+            obj.caused_records = list(
+                caused_records.exclude(pk=obj.pk).order_by("history_date", "id"),
+            )
+        return obj
+
     def history_snapshot(self, obj):
-        return self._dict_to_table(obj.data)
+        snapshot = obj.__class__.objects.snapshot_at(obj)
+        return self._dict_to_table(snapshot if snapshot is not None else obj.data)
 
     def more_info(self, obj):
         return self._dict_to_table(obj.additional_data)
@@ -134,6 +325,21 @@ class GenericHistoryAdmin(admin.ModelAdmin):
             return ", ".join(obj.history_diff)
         return None
 
+    def changed_values(self, obj):
+        changes = obj.get_changes()
+        if not changes:
+            return "--"
+        rows = format_html_join(
+            "",
+            '<tr><td style="border: 1px solid #eee;">{}</td><td>{}</td>'
+            "<td>{}</td></tr>",
+            (
+                (obj._get_field_name_display(field_name), old_value, new_value)
+                for field_name, (old_value, new_value) in changes.items()
+            ),
+        )
+        return format_html('<table style="border: 1px solid #eee;">{}</table>', rows)
+
     def _dict_to_table(self, dictionary):
         table = (
             '<table style="border: 1px solid #eee;">'
@@ -153,23 +359,51 @@ class GenericHistoryAdmin(admin.ModelAdmin):
         return mark_safe(table)
 
     def related_field_history_admin(self, obj):
-        if obj.related_field_history:
-            related_url = reverse(
-                "admin:atris_historicalrecord_change",
-                args=[obj.related_field_history.pk],
-            )
-            absolute_uri = self._request.build_absolute_uri(related_url)
-            related_object_model = obj.related_field_history.content_type.model
-            html = '<a href="{}">{}</a>'.format(
-                absolute_uri,
+        if obj.related_field_history_id:
+            cause_chain = getattr(obj, "cause_chain_records", None)
+            if cause_chain:
+                related_field_history = cause_chain[-2]
+            else:
+                related_field_history = obj.related_field_history
+            related_object_model = related_field_history.content_type.model
+            return self._record_link(
+                related_field_history,
                 obj.additional_data[related_object_model],
             )
-            return mark_safe(html)
         else:
             return "--"
 
     related_field_history_admin.short_description = "Related Field History"
 
+    def cause_chain_admin(self, obj):
+        cause_chain = getattr(obj, "cause_chain_records", [])[:-1]
+        return self._record_links(cause_chain)
+
+    cause_chain_admin.short_description = "Caused by"
+
+    def caused_records_admin(self, obj):
+        return self._record_links(getattr(obj, "caused_records", []))
+
+    caused_records_admin.short_description = "Caused"
+
+    def _record_links(self, records):
+        if not records:
+            return "--"
+        return mark_safe(
+            "<br>".join(self._record_link(record, str(record)) for record in records),
+        )
+
+    def _record_link(self, record, text):
+        related_url = reverse(
+            "admin:{}_{}_change".format(
+                record._meta.app_label,
+                record._meta.model_name,
+            ),
+            args=[record.pk],
+        )
+        absolute_uri = self._request.build_absolute_uri(related_url)
+        return format_html('<a href="{}">{}</a>', absolute_uri, text)
+
     def has_add_permission(self, request, obj=None):
         return False
 
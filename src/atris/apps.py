@@ -16,4 +16,5 @@ class AtrisConfig(AppConfig):
             history_logger.set_additional_data_properties(sender)
             history_logger.set_excluded_fields_names(sender)
             history_logger.set_interested_related_fields(sender)
+            history_logger.set_delta_related_fields(sender)
             history_logger.register_signal_handlers(sender)
@@ -1,12 +1,9 @@
 import logging
 
-from datetime import timedelta
-
 from django.core.management import BaseCommand
 from django.db import connection, transaction
-from django.utils.timezone import now
 
-from atris.models import get_history_model
+from atris.models import ArchivedHistoricalRecord, get_history_model
 
 
 logger = logging.getLogger("old_history_archiving")
@@ -19,7 +16,8 @@ class Command(BaseCommand):
         Archives historical records older than the specified days or months.
         You must supply either the days or the weeks param.
         The historical entries older than the specified days will be moved to
-        the "atris_archivedhistoricalrecord" table.
+        the "atris_archivedhistoricalrecord" table, except those still needed
+        to rebuild the snapshots of newer ones (see delta_snapshots).
     """
 
     PARAM_ERROR = "You must supply either the days or the weeks param"
@@ -52,9 +50,7 @@ class Command(BaseCommand):
         if not (days or weeks):
             self.stderr.write(f"{self.PARAM_ERROR}\n")
             return
-        old_history_entries = HistoricalRecord.objects.older_than(days, weeks)
-        handled_entries_nr = old_history_entries.count()
-        self.migrate_data(days, weeks)
+        handled_entries_nr = self.migrate_data(days, weeks)
         self.stdout.write(f"{handled_entries_nr} archived.\n")
 
     @transaction.atomic
@@ -65,26 +61,31 @@ class Command(BaseCommand):
                 "history records! The weeks parameter will be used as the"
                 "delimiter!"
             )
-        td = timedelta(weeks=weeks) if weeks else timedelta(days=days)
-        older_than_date = now() - td
-        cursor = connection.cursor()
+        old_history_entries = HistoricalRecord.objects.older_than(
+            days,
+            weeks,
+            complete_chains=True,
+        )
+        ids_sql, params = (
+            old_history_entries.order_by().values("pk").query.sql_with_params()
+        )
         fields_str = ",".join(
             [field.attname for field in HistoricalRecord._meta.fields]
         )
+        # Moved in one statement, so that the records deleted are exactly the
+        # ones archived.
         query = (
-            "INSERT INTO atris_archivedhistoricalrecord ({}) "
-            "SELECT {} FROM atris_historicalrecord "
-            "WHERE history_date < '{}';".format(
+            "WITH archived AS ("
+            "DELETE FROM {} WHERE id IN ({}) RETURNING {}"
+            ") INSERT INTO {} ({}) SELECT {} FROM archived;".format(
+                HistoricalRecord._meta.db_table,
+                ids_sql,
+                fields_str,
+                ArchivedHistoricalRecord._meta.db_table,
                 fields_str,
                 fields_str,
-                older_than_date.date(),
-            )
-        )
-        cursor.execute(query)
-        query = (
-            "DELETE FROM atris_historicalrecord "
-            "WHERE history_date < '{}';".format(
-                older_than_date.date(),
             )
         )
-        cursor.execute(query)
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.rowcount
@@ -0,0 +1,49 @@
+from django.core.management import BaseCommand
+from django.db import connections, router
+
+from atris.models import get_history_models
+
+
+class Command(BaseCommand):
+
+    help = """
+        Creates the jsonb_path_ops GIN indexes on the snapshots and the
+        additional data of the historical records, which serve the containment
+        queries of `where_data` and `where_additional`. They are large and
+        slow down every insert, so they are not created by the migrations.
+        The indexes are built concurrently, without blocking the writes, and
+        the ones which already exist are skipped.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drop",
+            dest="drop",
+            default=False,
+            action="store_true",
+            help="Drop the indexes instead of creating them.",
+        )
+
+    def handle(self, *args, **options):
+        for model in get_history_models():
+            indexes = getattr(model, "JSON_PATH_INDEXES", [])
+            if indexes:
+                self.handle_model(model, indexes, options["drop"])
+
+    def handle_model(self, model, indexes, drop):
+        connection = connections[router.db_for_write(model)]
+        with connection.cursor() as cursor:
+            existing = connection.introspection.get_constraints(
+                cursor,
+                model._meta.db_table,
+            )
+        # The indexes can't be created or dropped concurrently in a
+        # transaction.
+        with connection.schema_editor(atomic=False) as schema_editor:
+            for index in indexes:
+                if drop and index.name in existing:
+                    schema_editor.remove_index(model, index, concurrently=True)
+                    self.stdout.write(f"Dropped {index.name}.\n")
+                elif not drop and index.name not in existing:
+                    schema_editor.add_index(model, index, concurrently=True)
+                    self.stdout.write(f"Created {index.name}.\n")
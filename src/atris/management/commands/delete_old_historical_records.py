@@ -2,7 +2,13 @@ import logging
 
 from django.core.management import BaseCommand
 
-from atris.models import ArchivedHistoricalRecord, get_history_model
+from atris.models import (
+    ArchivedHistoricalRecord,
+    delete_unreferenced_blobs,
+    get_history_model,
+    get_history_models,
+    is_blob_storage_used,
+)
 
 
 logger = logging.getLogger("old_history_deleting")
@@ -13,6 +19,8 @@ class Command(BaseCommand):
     help = """
         Deletes historical records older than the specified days or months.
         You must supply either the days or the weeks param.
+        The old records still needed to rebuild the snapshots of newer ones
+        (see delta_snapshots) are kept.
     """
 
     PARAM_ERROR = "You must supply either the days or the weeks param"
@@ -49,6 +57,19 @@ class Command(BaseCommand):
             ),
         )
 
+        parser.add_argument(
+            "--delete-unreferenced-blobs",
+            dest="delete_unreferenced_blobs",
+            default=False,
+            action="store_true",
+            help=(
+                "Also delete the large values stored as blobs (see "
+                "blob_threshold) which no historical record references any "
+                "longer. The blob table is locked while all the history "
+                "tables are scanned."
+            ),
+        )
+
     def handle(self, *args, **options):
         days = options.get("days")
         weeks = options.get("weeks")
@@ -61,5 +82,16 @@ class Command(BaseCommand):
             if options.get("from_archive")
             else HistoricalRecord
         )
-        deleted_entries = model.objects.older_than(days, weeks).delete()
+        deleted_entries = model.objects.older_than(
+            days,
+            weeks,
+            complete_chains=True,
+        ).delete()
         self.stdout.write(f"{deleted_entries[0]} {model.__name__} deleted.\n")
+        if not options.get("delete_unreferenced_blobs"):
+            return
+        if not is_blob_storage_used():
+            self.stdout.write("No model stores large values as blobs.\n")
+            return
+        deleted_blobs = delete_unreferenced_blobs(get_history_models())
+        self.stdout.write(f"{deleted_blobs} unreferenced SnapshotBlob deleted.\n")
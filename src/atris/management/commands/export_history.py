@@ -0,0 +1,179 @@
+import time
+
+from datetime import datetime
+
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from atris.models import EXPORT_FORMATS, export_history, open_export_file
+
+
+class Command(BaseCommand):
+    help = """
+        Exports historical records as JSON lines or CSV, oldest first. The
+        records are streamed from the database, so exports of any size use a
+        constant amount of memory. The number of records exported per second
+        is reported on stderr.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            dest="model",
+            default=None,
+            help="Only export the history of this model (app_label.ModelName).",
+        )
+        parser.add_argument(
+            "--object-id",
+            dest="object_ids",
+            action="append",
+            default=None,
+            help=(
+                "Only export the history of the object with this id. Can be "
+                "repeated."
+            ),
+        )
+        parser.add_argument(
+            "--since",
+            dest="since",
+            default=None,
+            help="Only export the records created at or after this date.",
+        )
+        parser.add_argument(
+            "--until",
+            dest="until",
+            default=None,
+            help="Only export the records created before this date.",
+        )
+        parser.add_argument(
+            "--user",
+            dest="user",
+            default=None,
+            help="Only export the records of the user with this name.",
+        )
+        parser.add_argument(
+            "--user-id",
+            dest="user_id",
+            type=int,
+            default=None,
+            help="Only export the records of the user with this id.",
+        )
+        parser.add_argument(
+            "--format",
+            dest="export_format",
+            choices=EXPORT_FORMATS,
+            default="jsonl",
+        )
+        parser.add_argument(
+            "--output",
+            dest="output",
+            default=None,
+            help="File to write to, instead of stdout.",
+        )
+        parser.add_argument(
+            "--gzip",
+            dest="gzip",
+            default=False,
+            action="store_true",
+            help=(
+                "Compress the output file with gzip. Implied by an output "
+                "file name ending with .gz."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            dest="chunk_size",
+            type=int,
+            default=2000,
+            help="Number of records fetched at a time.",
+        )
+        parser.add_argument(
+            "--materialize",
+            dest="materialize",
+            default=False,
+            action="store_true",
+            help=(
+                "Export complete snapshots, also for the records which only "
+                "store the changes to their previous version."
+            ),
+        )
+        parser.add_argument(
+            "--archived",
+            dest="archived",
+            default=False,
+            action="store_true",
+            help=(
+                'Export the "archived historical records" table instead of '
+                'the default "historical records" table.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        compress = options["gzip"] or bool(output and output.endswith(".gz"))
+        if compress and not output:
+            raise CommandError("--gzip needs an --output file.")
+        filters = {
+            "model": self.get_model(options["model"]),
+            "object_ids": options["object_ids"],
+            "since": self.parse_date(options["since"]),
+            "until": self.parse_date(options["until"]),
+            "user": options["user"],
+            "user_id": options["user_id"],
+            "archived": options["archived"],
+        }
+        stream = open_export_file(output, compress) if output else self.stdout
+        started = time.monotonic()
+        try:
+            count = export_history(
+                stream,
+                export_format=options["export_format"],
+                chunk_size=options["chunk_size"],
+                materialize=options["materialize"],
+                progress=self.report_progress,
+                **filters,
+            )
+        finally:
+            if output:
+                stream.close()
+        self.report_progress(count, time.monotonic() - started, done=True)
+
+    def report_progress(self, count, elapsed, done=False):
+        rate = count / elapsed if elapsed else count
+        self.stderr.write(
+            "{} {} records in {:.1f}s ({:.0f} records/s)".format(
+                "Exported" if done else "Exporting...",
+                count,
+                elapsed,
+                rate,
+            ),
+        )
+
+    @staticmethod
+    def get_model(label):
+        if label is None:
+            return None
+        try:
+            return apps.get_model(label)
+        except (LookupError, ValueError):
+            raise CommandError("Unknown model: {}.".format(label))
+
+    @staticmethod
+    def parse_date(value):
+        if value is None:
+            return None
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                date = parse_date(value)
+                if date is not None:
+                    parsed = datetime.combine(date, datetime.min.time())
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise CommandError("Invalid date: {}.".format(value))
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
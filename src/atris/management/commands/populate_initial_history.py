@@ -6,6 +6,7 @@ from django.db.transaction import atomic
 
 from atris.models import get_history_model, registered_models
 from atris.models.helpers import get_instance_field_data
+from atris.models.snapshot_blob import extract_blobs, save_blobs
 
 
 HistoricalRecord = get_history_model()
@@ -113,9 +114,18 @@ class ModelHistoryCreator:
 
     def create_history_for_objects(self, objects):
         historical_instances = []
+        blobs = {}
+        history_logging = self.model._meta.history_logging
         for instance in objects:
             historical_record = self.create_history_for_object(instance)
+            historical_record.data, record_blobs = extract_blobs(
+                historical_record.data,
+                history_logging.blob_threshold,
+                history_logging.delta_related_fields,
+            )
+            blobs.update(record_blobs)
             historical_instances.append(historical_record)
+        save_blobs(blobs)
         HistoricalRecord.objects.bulk_create(
             historical_instances,
             batch_size=self.create_batch_size,
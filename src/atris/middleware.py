@@ -1,8 +1,34 @@
-from django.utils.deprecation import MiddlewareMixin
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 
-from atris.models import HistoryLogging
+from atris.models import history_context
 
 
-class LoggingRequestMiddleware(MiddlewareMixin):
-    def process_request(self, request):
-        HistoryLogging.thread.request = request
+class LoggingRequestMiddleware:
+    """
+    Attributes the history generated while handling a request to the user
+    making it. A weak reference to the request is kept in a context variable
+    for the duration of the request only, which makes the middleware safe to
+    use with both WSGI and ASGI servers. Its user is read when history is
+    generated, so the middleware may come before the authentication
+    middleware and the users logged in or authenticated by the view are
+    recorded.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with history_context(request=request):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with history_context(request=request):
+            return await self.get_response(request)
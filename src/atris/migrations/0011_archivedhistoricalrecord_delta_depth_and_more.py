@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-19 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atris", "0010_alter_archivedhistoricalrecord_additional_data_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedhistoricalrecord",
+            name="delta_depth",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="historicalrecord",
+            name="delta_depth",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-19 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atris", "0011_archivedhistoricalrecord_delta_depth_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SnapshotBlob",
+            fields=[
+                (
+                    "hash",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("value", models.TextField()),
+            ],
+        ),
+    ]
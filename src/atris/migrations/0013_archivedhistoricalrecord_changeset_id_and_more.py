@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atris", "0012_snapshotblob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedhistoricalrecord",
+            name="changeset_id",
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalrecord",
+            name="changeset_id",
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:12
+
+import django.contrib.postgres.operations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are created concurrently, which can't be done in a
+    # transaction.
+    atomic = False
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("atris", "0013_archivedhistoricalrecord_changeset_id_and_more"),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="archivedhistoricalrecord",
+            index=models.Index(
+                fields=["content_type", "history_date", "id"],
+                name="atris_ahr_ct_date_id",
+            ),
+        ),
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="archivedhistoricalrecord",
+            index=models.Index(
+                fields=["history_type", "history_date", "id"],
+                name="atris_ahr_type_date_id",
+            ),
+        ),
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="historicalrecord",
+            index=models.Index(
+                fields=["content_type", "history_date", "id"],
+                name="atris_hr_ct_date_id",
+            ),
+        ),
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="historicalrecord",
+            index=models.Index(
+                fields=["history_type", "history_date", "id"],
+                name="atris_hr_type_date_id",
+            ),
+        ),
+    ]
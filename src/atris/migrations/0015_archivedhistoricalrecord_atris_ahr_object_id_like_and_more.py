@@ -0,0 +1,49 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:14
+
+import django.contrib.postgres.operations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The indexes are created concurrently, which can't be done in a
+    # transaction.
+    atomic = False
+
+    dependencies = [
+        ("atris", "0014_archivedhistoricalrecord_atris_ahr_ct_date_id_and_more"),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="archivedhistoricalrecord",
+            index=models.Index(
+                fields=["object_id"],
+                name="atris_ahr_object_id_like",
+                opclasses=["text_pattern_ops"],
+            ),
+        ),
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="archivedhistoricalrecord",
+            index=models.Index(
+                fields=["content_type", "object_id"],
+                name="atris_ahr_ct_object_id_like",
+                opclasses=["int4_ops", "text_pattern_ops"],
+            ),
+        ),
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="historicalrecord",
+            index=models.Index(
+                fields=["object_id"],
+                name="atris_hr_object_id_like",
+                opclasses=["text_pattern_ops"],
+            ),
+        ),
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="historicalrecord",
+            index=models.Index(
+                fields=["content_type", "object_id"],
+                name="atris_hr_ct_object_id_like",
+                opclasses=["int4_ops", "text_pattern_ops"],
+            ),
+        ),
+    ]
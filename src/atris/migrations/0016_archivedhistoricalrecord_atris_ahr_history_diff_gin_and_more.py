@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:15
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # The indexes are created concurrently, which can't be done in a
+    # transaction.
+    atomic = False
+
+    dependencies = [
+        ("atris", "0015_archivedhistoricalrecord_atris_ahr_object_id_like_and_more"),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="archivedhistoricalrecord",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["history_diff"], name="atris_ahr_history_diff_gin"
+            ),
+        ),
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="historicalrecord",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["history_diff"], name="atris_hr_history_diff_gin"
+            ),
+        ),
+    ]
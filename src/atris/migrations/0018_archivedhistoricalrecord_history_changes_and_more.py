@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atris", "0016_archivedhistoricalrecord_atris_ahr_history_diff_gin_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedhistoricalrecord",
+            name="history_changes",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="historicalrecord",
+            name="history_changes",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:21
+
+import atris.models.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("atris", "0018_archivedhistoricalrecord_history_changes_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="archivedhistoricalrecord",
+            name="additional_data",
+            field=atris.models.fields.LazyJSONField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="archivedhistoricalrecord",
+            name="data",
+            field=atris.models.fields.LazyJSONField(),
+        ),
+        migrations.AlterField(
+            model_name="archivedhistoricalrecord",
+            name="history_changes",
+            field=atris.models.fields.LazyJSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="historicalrecord",
+            name="additional_data",
+            field=atris.models.fields.LazyJSONField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="historicalrecord",
+            name="data",
+            field=atris.models.fields.LazyJSONField(),
+        ),
+        migrations.AlterField(
+            model_name="historicalrecord",
+            name="history_changes",
+            field=atris.models.fields.LazyJSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.27 on 2026-10-19 07:26
+
+import django.contrib.postgres.operations
+from django.db import migrations, models
+
+import atris.models.fields
+
+
+class Migration(migrations.Migration):
+    # The index is created concurrently, which can't be done in a
+    # transaction.
+    atomic = False
+
+    dependencies = [
+        ("atris", "0019_alter_archivedhistoricalrecord_additional_data_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="archivedhistoricalrecord",
+            name="transaction_id",
+            field=atris.models.fields.TransactionIdField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalrecord",
+            name="transaction_id",
+            field=atris.models.fields.TransactionIdField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        django.contrib.postgres.operations.AddIndexConcurrently(
+            model_name="historicalrecord",
+            index=models.Index(fields=["transaction_id", "id"], name="atris_hr_feed"),
+        ),
+    ]
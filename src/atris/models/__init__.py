@@ -1,3 +1,6 @@
 from .archived_historical_record import *
+from .context import *
+from .export import *
 from .historical_record import *
 from .history_logging import *
+from .snapshot_blob import *
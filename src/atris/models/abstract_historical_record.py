@@ -1,21 +1,71 @@
 import logging
 
+from collections import defaultdict, namedtuple
 from datetime import timedelta
 
+from asgiref.sync import sync_to_async
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import FieldDoesNotExist
-from django.db import connection, models
-from django.db.models import JSONField, Q
+from django.db import connections, models, router, transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Q, Subquery, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import JSONObject, Lag, RowNumber
 from django.db.models.query import QuerySet
+from django.db.models.sql.where import WhereNode
 from django.utils.timezone import now
 
+from .fields import LazyJSONField, LazyJSONModelIterable, TransactionIdField
+from .restore import get_latest_snapshots, restore_snapshots
+from .snapshot_blob import BLOB_KEY, get_blob_hash, resolve_blob_references
+from .snapshots import apply_delta, reconstruct_data, split_ids
+
 
 logger = logging.getLogger(__name__)
 
 
+FieldChange = namedtuple("FieldChange", ["history_date", "user", "old", "new"])
+
+
 class HistoricalRecordQuerySet(QuerySet):
+    # The columns holding the snapshots and the other JSON documents.
+    DOCUMENT_FIELDS = ("data", "additional_data", "history_diff", "history_changes")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The JSON columns are decoded when accessed. See `atris.models.fields`.
+        self._iterable_class = LazyJSONModelIterable
+
+    def light(self):
+        """
+        Gets the historical records without loading their snapshots and the
+        other JSON documents, e.g. for listing them. A deferred column is
+        loaded, with one query per record, when it is accessed.
+        :rtype HistoricalRecordQuerySet
+        """
+        return self.defer(*self.DOCUMENT_FIELDS)
+
+    def data_fields(self, *field_names):
+        """
+        Gets the historical records without loading their snapshots (see
+        `light`) but with the values of the given fields, extracted from the
+        snapshots in SQL, as a dict in their `data_fields` attribute. The
+        values of the fields missing from a snapshot, as in the records
+        storing deltas, are None. Large values stored as blobs are returned
+        as references to them.
+        :rtype HistoricalRecordQuerySet
+        """
+        return self.light().annotate(
+            data_fields=JSONObject(
+                **{
+                    field_name: KeyTransform(field_name, "data")
+                    for field_name in field_names
+                }
+            ),
+        )
+
     def by_model_and_model_id(self, model, model_id):
         """
         Gets historical records by model and model id, so, basically the
@@ -70,6 +120,300 @@ class HistoricalRecordQuerySet(QuerySet):
             content_type__app_label=app_label,
         )
 
+    def changed_fields(self, *field_names, match="any"):
+        """
+        Gets the historical records in which the given fields changed, using
+        the GIN index on `history_diff`.
+        :param field_names: Names of the fields.
+        :param match: "any" for the records in which at least one of the
+                      fields changed, "all" for those in which all of them
+                      did.
+        :rtype HistoricalRecordQuerySet
+        """
+        return self.filter(self._changed_fields_filter(field_names, match))
+
+    def exclude_changed(self, *field_names, match="any"):
+        """
+        Gets the historical records in which the given fields did not change:
+        the opposite of `changed_fields` with the same `match`. The records
+        without a `history_diff`, such as the creations, are included.
+        :rtype HistoricalRecordQuerySet
+        """
+        return self.exclude(self._changed_fields_filter(field_names, match))
+
+    def _changed_fields_filter(self, field_names, match):
+        # && (overlap) and @> (contains) are the array operators the GIN index
+        # supports.
+        lookups = {"any": "history_diff__overlap", "all": "history_diff__contains"}
+        if match not in lookups:
+            raise ValueError(
+                'match must be "any" or "all", not {!r}.'.format(match),
+            )
+        return Q(**{lookups[match]: list(field_names)})
+
+    def where_data(self, **values):
+        """
+        Gets the historical records whose snapshot holds the given values,
+        e.g. `where_data(email="x@example.com")`, with containment queries
+        which the GIN index on `data` serves. The values are compared as
+        stored in the snapshots: as strings, primary keys for the related
+        objects. Records which store deltas only hold the values that
+        changed, so for those models this finds the versions which set the
+        values.
+        :rtype HistoricalRecordQuerySet
+        """
+        condition = Q()
+        for field_name, value in values.items():
+            condition &= self._data_contains(field_name, value)
+        return self.filter(condition)
+
+    def _data_contains(self, field_name, value):
+        if isinstance(value, models.Model):
+            value = value.pk
+        if value is None:
+            return Q(data__contains={field_name: None})
+        value = str(value)
+        # Large values may be stored as blobs, referenced by their hash.
+        return Q(data__contains={field_name: value}) | Q(
+            data__contains={field_name: {BLOB_KEY: get_blob_hash(value)}},
+        )
+
+    def where_additional(self, **values):
+        """
+        Gets the historical records whose additional data holds the given
+        values, with a containment query which the GIN index on
+        `additional_data` serves.
+        :rtype HistoricalRecordQuerySet
+        """
+        return self.filter(additional_data__contains=values)
+
+    def value_timeline(self, field_name):
+        """
+        Gets the values the given field had in the historical records, oldest
+        first, without loading the snapshots. Filter the records first, e.g.
+        with `where_data` or `by_model_and_model_id`, to use the indexes.
+        Large values stored as blobs are returned as references to them.
+        :return: Dicts with the `object_id`, `history_date`, `history_type`,
+                 `history_user` and `value` of each record.
+        """
+        return (
+            self.filter(data__has_key=field_name)
+            .annotate(value=KeyTransform(field_name, "data"))
+            .order_by("history_date", "id")
+            .values(
+                "object_id",
+                "history_date",
+                "history_type",
+                "history_user",
+                "value",
+            )
+        )
+
+    def field_timeline(self, model, object_id, field_name):
+        """
+        Gets the changes of a field of an object, oldest first, in one query
+        which compares each record's value with the previous one (`LAG`) and
+        never loads the snapshots. The first recorded value is returned as a
+        change from None.
+        :param model: Model which has the HistoricalRecord field.
+        :param object_id: The id of the object.
+        :param field_name: The name of a field holding single values (not a
+                           to-many relation).
+        :return: The changes.
+        :rtype list[FieldChange]
+        """
+        timelines = self.field_timelines(model, [object_id], field_name)
+        return timelines.get(str(object_id), [])
+
+    def field_timelines(self, model, object_ids, field_name):
+        """
+        `field_timeline` for several objects at once, still in one query.
+        :return: The changes by object id.
+        :rtype dict[str, list[FieldChange]]
+        """
+        history = self.by_model(model).filter(
+            object_id__in=[str(pk) for pk in object_ids],
+            # Records storing deltas only hold the values that changed.
+            data__has_key=field_name,
+        )
+        changes = (
+            history.annotate(
+                new=KeyTransform(field_name, "data"),
+                old=Window(
+                    Lag(KeyTransform(field_name, "data")),
+                    partition_by=[F("object_id")],
+                    order_by=[F("history_date").asc(), F("id").asc()],
+                ),
+            )
+            .filter(
+                Q(old__isnull=True, new__isnull=False)
+                | Q(old__isnull=False, new__isnull=True)
+                | ~Q(new=F("old"))
+            )
+            .order_by("object_id", "history_date", "id")
+            .values_list("object_id", "history_date", "history_user", "old", "new")
+        )
+        changes = list(changes)
+        values = [{"old": old, "new": new} for *_, old, new in changes]
+        # Large values may be stored as blobs, referenced by their hash.
+        resolve_blob_references(values)
+        timelines = defaultdict(list)
+        for (object_id, history_date, history_user, *_), value in zip(
+            changes,
+            values,
+        ):
+            timelines[object_id].append(
+                FieldChange(history_date, history_user, value["old"], value["new"]),
+            )
+        return dict(timelines)
+
+    def since(self, cursor=None, limit=None):
+        """
+        Gets the historical records written after the given feed cursor, in
+        the order of the change feed, so that consumers can tail the history
+        incrementally: pass the `feed_cursor` of the last record received to
+        get the next ones.
+
+        The feed is ordered by the id of the transaction which wrote each
+        record, then by record id, and only holds the records of the
+        transactions older than all the transactions still running. A
+        record committed late is therefore never placed before a cursor
+        already handed out, unlike with `history_date`. Long running
+        transactions hold the feed back until they end. Records updated in
+        place, such as debounced updates, are moved to the end of the feed.
+        Only the records written since the feed was added are part of it.
+        :param cursor: The cursor of the last record received, None to
+                       start from the beginning.
+        :param limit: Optional maximum number of records.
+        :rtype HistoricalRecordQuerySet
+        """
+        history = self.filter(
+            transaction_id__lt=RawSQL(
+                "txid_snapshot_xmin(txid_current_snapshot())",
+                [],
+            ),
+        )
+        if cursor is not None:
+            transaction_id, record_id = parse_feed_cursor(cursor)
+            history = history.filter(
+                Q(transaction_id__gt=transaction_id)
+                | Q(transaction_id=transaction_id, id__gt=record_id),
+                # Bounding the first column as well lets the index be scanned.
+                transaction_id__gte=transaction_id,
+            )
+        history = history.order_by("transaction_id", "id")
+        if limit is not None:
+            history = history[:limit]
+        return history
+
+    def as_of(self, model, when, ids=None):
+        """
+        Gets the state of the objects of a model at a point in time: the
+        latest historical record of each object at or before `when`, in one
+        query. The objects deleted by then are left out. The records of models
+        which store deltas can be turned into complete snapshots with
+        `materialize` or, for whole tables, `iter_materialized`.
+        :param model: Model which has the HistoricalRecord field.
+        :param when: The point in time.
+        :param ids: Optional ids of the objects to get.
+        :rtype HistoricalRecordQuerySet
+        """
+        history = self.by_model(model).filter(history_date__lte=when)
+        if ids is not None:
+            history = history.filter(object_id__in=[str(pk) for pk in ids])
+        latest_records = history.order_by(
+            "object_id",
+            "-history_date",
+            "-id",
+        ).distinct("object_id")
+        return self.filter(pk__in=latest_records.values("pk")).exclude(
+            history_type=self.model.DELETE,
+        )
+
+    def with_related_tree(self):
+        """
+        Gets the historical records in the queryset together with all the
+        records they caused, directly or not, through `related_field_history`,
+        with one recursive query.
+        :rtype HistoricalRecordQuerySet
+        """
+        roots_query = self.values("id").query
+        roots_sql, params = roots_query.get_compiler(using=self.db).as_sql()
+        tree_sql = (
+            "WITH RECURSIVE tree(id) AS ("
+            "SELECT id FROM {table} WHERE id IN ({roots}) "
+            "UNION "
+            "SELECT caused.id FROM {table} caused "
+            "JOIN tree ON caused.{cause} = tree.id"
+            ") SELECT id FROM tree"
+        ).format(roots=roots_sql, **self._tree_sql_names())
+        # The records loaded with the tree keep the related objects and the
+        # fields loaded by the queryset, but not its filters.
+        tree = self._chain()
+        tree.query.where = WhereNode()
+        tree.query.clear_limits()
+        return tree.filter(id__in=RawSQL(tree_sql, params))
+
+    def cause_chain(self, record):
+        """
+        Gets the chain of historical records which caused the given one
+        through `related_field_history`, with one recursive query.
+        :param record: The historical record.
+        :return: The records, from the original change to the given record.
+        :rtype HistoricalRecordQuerySet
+        """
+        chain_sql = (
+            "WITH RECURSIVE chain(id, cause_id) AS ("
+            "SELECT id, {cause} FROM {table} WHERE id = %s "
+            "UNION "
+            "SELECT cause.id, cause.{cause} FROM {table} cause "
+            "JOIN chain ON cause.id = chain.cause_id"
+            ") SELECT id FROM chain"
+        ).format(**self._tree_sql_names())
+        return self.filter(id__in=RawSQL(chain_sql, [record.id])).order_by(
+            "history_date",
+            "id",
+        )
+
+    def _tree_sql_names(self):
+        quote_name = connections[self.db].ops.quote_name
+        return {
+            "table": quote_name(self.model._meta.db_table),
+            "cause": quote_name(
+                self.model._meta.get_field("related_field_history").column,
+            ),
+        }
+
+    def by_changeset(self, changeset_id):
+        """
+        Gets the historical records generated in one request or transaction.
+        :param changeset_id: The `changeset_id` of the records.
+        :rtype HistoricalRecordQuerySet
+        """
+        return self.filter(changeset_id=changeset_id)
+
+    def changesets(self):
+        """
+        Rolls the historical records up by changeset, most recent first. Each
+        changeset is a dict holding the `changeset_id`, the modifying `user`
+        and `user_id`, the dates of the first and last records
+        (`started`, `ended`) and the number of records (`record_count`).
+        Records without a changeset are left out.
+        :rtype QuerySet
+        """
+        return (
+            self.exclude(changeset_id=None)
+            .values("changeset_id")
+            .annotate(
+                user=Max("history_user"),
+                user_id=Max("history_user_id"),
+                started=Min("history_date"),
+                ended=Max("history_date"),
+                record_count=Count("id"),
+            )
+            .order_by("-ended")
+        )
+
     def most_recent(self):
         """
         Gets the most recent historical record added to the database.
@@ -78,13 +422,26 @@ class HistoricalRecordQuerySet(QuerySet):
         """
         return self.first()
 
-    def older_than(self, days=None, weeks=None):
+    async def amost_recent(self):
+        """
+        Async version of `most_recent`.
+        :rtype HistoricalRecord
+        """
+        return await self.afirst()
+
+    def older_than(self, days=None, weeks=None, complete_chains=False):
         """
         Gets all historical record entries that are older than either the
         number of days or the number of weeks passed.
         The weeks parameter will be preferred if both are supplied.
         :param days: Number of days old a historical record can be, at most.
         :param weeks: Number of weeks old a historical record can be, at most.
+        :param complete_chains: Leave out the old records still needed to
+                                rebuild the snapshots of newer ones: those
+                                from the keyframe of the oldest newer record
+                                of each object onwards. The records left can
+                                be archived or deleted without breaking the
+                                history which remains.
         :return: All the historical record entries that are older than the
                  given param.
         :rtype list(HistoricalRecord)
@@ -98,7 +455,48 @@ class HistoricalRecordQuerySet(QuerySet):
                 "the weeks param will be used as the delimiter."
             )
         td = timedelta(weeks=weeks) if weeks else timedelta(days=days)
-        return self.filter(history_date__lte=now() - td)
+        date = now() - td
+        history = self.filter(history_date__lte=date)
+        if complete_chains:
+            history = history.filter(self._chain_not_needed_after(date))
+        return history
+
+    def _chain_not_needed_after(self, date):
+        """
+        Filter matching the records created at or before the given date which
+        no record created after it needs to rebuild its snapshot: the objects
+        have no newer records, or a keyframe follows the record, at the latest
+        with the first newer record.
+        """
+        object_records = self.model.objects.filter(
+            content_type_id=OuterRef("content_type_id"),
+            object_id=OuterRef("object_id"),
+        )
+        newer_records = object_records.filter(history_date__gt=date)
+        first_newer_record = newer_records.order_by("history_date", "id")
+        following_keyframes = object_records.filter(
+            Q(history_date__gt=OuterRef("history_date"))
+            | Q(history_date=OuterRef("history_date"), id__gt=OuterRef("id")),
+            Q(history_date__lte=date)
+            | Q(pk=Subquery(first_newer_record.values("pk")[:1])),
+            delta_depth=0,
+        )
+        return ~Exists(newer_records) | Exists(following_keyframes)
+
+    def latest_per_object(self, count=1):
+        """
+        Gets the `count` most recent historical records of each object in the
+        queryset, e.g. the latest records of many instances with one query.
+        :param count: The number of records to get for each object.
+        :rtype HistoricalRecordQuerySet
+        """
+        return self.annotate(
+            position_in_history=Window(
+                RowNumber(),
+                partition_by=[F("content_type_id"), F("object_id")],
+                order_by=[F("history_date").desc(), F("id").desc()],
+            ),
+        ).filter(position_in_history__lte=count)
 
     def previous_version_by_model_and_id(self, model, object_id, history_id):
         """
@@ -118,6 +516,244 @@ class HistoricalRecordQuerySet(QuerySet):
         )
         return main_qs.order_by("-history_date").first()
 
+    async def aprevious_version_by_model_and_id(self, model, object_id, history_id):
+        """
+        Async version of `previous_version_by_model_and_id`.
+        :rtype HistoricalRecord
+        """
+        main_qs = self.filter(
+            content_type__model=model.model,
+            content_type__app_label=model.app_label,
+            object_id=object_id,
+            id__lt=history_id,
+        )
+        return await main_qs.order_by("-history_date").afirst()
+
+    def snapshot_chain(self, record):
+        """
+        Gets the historical records needed to rebuild the snapshot of the given
+        record: the record itself and the ones leading back to its keyframe.
+        :param record: The historical record.
+        :return: The records, ordered from newest to oldest.
+        :rtype list(HistoricalRecord)
+        """
+        chain = self.filter(
+            not_after(record),
+            content_type_id=record.content_type_id,
+            object_id=record.object_id,
+        )
+        return list(
+            chain.order_by("-history_date", "-id")[: record.delta_depth + 1],
+        )
+
+    def snapshot_at(self, record):
+        """
+        Gets the complete snapshot of the object at the time the given record
+        was created, even if the record only stores the changes to its
+        previous version.
+        :param record: The historical record.
+        :return: The snapshot or None if the information is no longer
+                 available (older history was archived or deleted).
+        :rtype dict
+        """
+        if record.delta_depth == 0:
+            data = dict(record.data)
+        else:
+            data = reconstruct_data(self.snapshot_chain(record))
+        resolve_blob_references([data])
+        return data
+
+    async def asnapshot_at(self, record):
+        """
+        Async version of `snapshot_at`.
+        :rtype dict
+        """
+        return await sync_to_async(self.snapshot_at)(record)
+
+    def related_ids_at(self, record, field_name):
+        """
+        Gets the ids of the objects that were referenced through a to-many
+        relation at the time the given record was created. Works for
+        relations stored as deltas as well as for complete snapshots.
+        :param record: The historical record.
+        :param field_name: The name of the to-many relation field.
+        :return: The ids as strings or None if the information is no longer
+                 available.
+        :rtype list(str)
+        """
+        data = self.snapshot_at(record)
+        if data is None:
+            return None
+        return split_ids(data.get(field_name))
+
+    def materialize(self):
+        """
+        Evaluates the queryset and replaces the `data` of the records that
+        store deltas with their complete snapshots. The records of each object
+        are rebuilt together, with one query for the object's history chain.
+        Records whose keyframe was archived or deleted keep the data they
+        store. The values stored as blobs are fetched in one query.
+        :return: The historical records, with complete snapshots.
+        :rtype list(HistoricalRecord)
+        """
+        return self._materialize_records(list(self))
+
+    def iter_materialized(self, chunk_size=2000):
+        """
+        Streams the records of the queryset with complete snapshots, like
+        `materialize` does, fetching and rebuilding `chunk_size` records at a
+        time. Suited for querysets too large to be loaded at once.
+        :rtype iterator(HistoricalRecord)
+        """
+        chunk = []
+        for record in self.iterator(chunk_size=chunk_size):
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                yield from self._materialize_records(chunk)
+                chunk = []
+        yield from self._materialize_records(chunk)
+
+    def _materialize_records(self, records):
+        records_by_object = defaultdict(list)
+        for record in records:
+            if record.delta_depth:
+                key = (record.content_type_id, record.object_id)
+                records_by_object[key].append(record)
+        for object_records in records_by_object.values():
+            snapshots = self._rebuild_snapshots(object_records)
+            for record in object_records:
+                if snapshots.get(record.id) is not None:
+                    record.data = snapshots[record.id]
+        resolve_blob_references([record.data for record in records])
+        return records
+
+    async def amaterialize(self):
+        """
+        Async version of `materialize`.
+        :rtype list(HistoricalRecord)
+        """
+        return await sync_to_async(self.materialize)()
+
+    def restore(self):
+        """
+        Restores the objects to the state recorded by the historical records
+        in the queryset, in bulk: the objects which no longer exist are
+        recreated and their many-to-many relations are restored as well. If
+        the queryset holds several records of an object, the most recent one
+        is used. The restore is recorded as history.
+        :return: The restored instances.
+        :rtype list
+        """
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            return restore_snapshots(get_latest_snapshots(self.materialize()))
+
+    def revert_changeset(self, changeset_id):
+        """
+        Reverts the changes of a changeset: the objects it modified or deleted
+        are restored to the state they were in before it, and the objects it
+        created are deleted. The objects without history from before the
+        changeset, e.g. because it was deleted, are left as they are. The
+        revert is recorded as history.
+        :param changeset_id: The `changeset_id` of the records to revert.
+        :return: The restored instances.
+        :rtype list
+        """
+        changeset_records = self.model.objects.by_changeset(changeset_id)
+        object_records = changeset_records.filter(
+            content_type_id=OuterRef("content_type_id"),
+            object_id=OuterRef("object_id"),
+        )
+        # The latest record of each object before its first one in the
+        # changeset.
+        first_in_changeset = object_records.order_by("history_date", "id")
+        previous_records = (
+            self.model.objects.filter(
+                Exists(object_records),
+                history_date__lt=Subquery(
+                    first_in_changeset.values("history_date")[:1],
+                ),
+            )
+            .exclude(changeset_id=changeset_id)
+            .latest_per_object()
+        )
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            previous_records = previous_records.materialize()
+            snapshots = get_latest_snapshots(
+                [
+                    record
+                    for record in previous_records
+                    if record.history_type != self.model.DELETE
+                ],
+            )
+            restored_objects = {
+                (model, object_id)
+                for model, model_snapshots in snapshots.items()
+                for object_id in model_snapshots
+            }
+            created_objects = defaultdict(list)
+            # The first record of each object in the changeset.
+            first_records = (
+                changeset_records.order_by(
+                    "content_type_id",
+                    "object_id",
+                    "history_date",
+                    "id",
+                )
+                .distinct("content_type_id", "object_id")
+                .values_list("content_type_id", "object_id", "history_type")
+            )
+            for content_type_id, object_id, history_type in first_records:
+                model = ContentType.objects.get_for_id(content_type_id).model_class()
+                if (model, object_id) in restored_objects:
+                    continue
+                if history_type == self.model.CREATE:
+                    created_objects[model].append(object_id)
+                else:
+                    # The history from before the changeset was archived or
+                    # deleted: the object cannot be restored, and it was not
+                    # created by the changeset either.
+                    logger.warning(
+                        "Cannot revert changeset %s for %s id=%s: no earlier "
+                        "history.",
+                        changeset_id,
+                        model._meta.label,
+                        object_id,
+                    )
+            for model, object_ids in created_objects.items():
+                model._base_manager.filter(pk__in=object_ids).delete()
+            return restore_snapshots(snapshots)
+
+    def _rebuild_snapshots(self, records):
+        """
+        Rebuilds the snapshots of historical records belonging to the same
+        object, by fetching all the records between the oldest and the newest
+        of them together with the ones leading back to the oldest one's
+        keyframe.
+        """
+        ordered = sorted(records, key=lambda r: (r.history_date, r.id))
+        oldest, newest = ordered[0], ordered[-1]
+        object_history = self.model.objects.using(self.db).filter(
+            content_type_id=oldest.content_type_id,
+            object_id=oldest.object_id,
+        )
+        chain = object_history.filter(not_before(oldest), not_after(newest))
+        if oldest.delta_depth:
+            leading_to_keyframe = object_history.exclude(not_before(oldest))
+            leading_to_keyframe = leading_to_keyframe.order_by(
+                "-history_date",
+                "-id",
+            )[: oldest.delta_depth]
+            chain = chain.union(leading_to_keyframe, all=True)
+        snapshots = {}
+        data = None
+        for record in chain.order_by("history_date", "id"):
+            if record.delta_depth == 0:
+                data = dict(record.data)
+            elif data is not None:
+                data = apply_delta(data, record.data)
+            snapshots[record.id] = data
+        return snapshots
+
     def approx_count(self):
         """
         Takes a queryset and generates a fast approximate count(*) for it.
@@ -126,19 +762,50 @@ class HistoricalRecordQuerySet(QuerySet):
         large tables.
         :return: int representing approx count(*)
         """
-        table_name = self.model._meta.db_table
-        cursor = connection.cursor()
-        cursor.execute(
-            "SELECT reltuples "
-            "FROM pg_class "
-            "WHERE relname='{}';".format(
-                table_name,
-            ),
-        )
-        row = cursor.fetchone()
+        connection = connections[self.db]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)",
+                [connection.ops.quote_name(self.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
         return int(row[0])
 
 
+def parse_feed_cursor(cursor):
+    """
+    Returns the transaction id and record id of a feed cursor, as returned by
+    `AbstractHistoricalRecord.feed_cursor`.
+    """
+    try:
+        transaction_id, record_id = (int(part) for part in str(cursor).split("."))
+    except ValueError:
+        raise ValueError("Invalid feed cursor: {!r}.".format(cursor))
+    return transaction_id, record_id
+
+
+def not_before(record):
+    """
+    Filter matching the historical records created at the same time or after
+    the given one.
+    """
+    return Q(history_date__gt=record.history_date) | Q(
+        history_date=record.history_date,
+        id__gte=record.id,
+    )
+
+
+def not_after(record):
+    """
+    Filter matching the historical records created at the same time or before
+    the given one.
+    """
+    return Q(history_date__lt=record.history_date) | Q(
+        history_date=record.history_date,
+        id__lte=record.id,
+    )
+
+
 class AbstractHistoricalRecord(models.Model):
     CREATE = "+"
     UPDATE = "~"
@@ -174,8 +841,11 @@ class AbstractHistoricalRecord(models.Model):
         blank=True,
         null=True,
     )
+    # The previous and new values of the changed fields, as
+    # {field: [old, new]}, for the models using `store_changes`.
+    history_changes = LazyJSONField(null=True, blank=True)
 
-    data = JSONField()
+    data = LazyJSONField()
     related_field_history = models.ForeignKey(
         "self",
         on_delete=models.CASCADE,
@@ -183,7 +853,16 @@ class AbstractHistoricalRecord(models.Model):
         null=True,
         blank=True,
     )
-    additional_data = JSONField(null=True)
+    additional_data = LazyJSONField(null=True)
+    # Number of records since the object's latest keyframe, i.e. latest record
+    # holding a complete snapshot. See `atris.models.snapshots`.
+    delta_depth = models.PositiveSmallIntegerField(default=0)
+    # Groups the records generated in one request or transaction. See
+    # `atris.models.context`.
+    changeset_id = models.UUIDField(null=True, blank=True, db_index=True)
+    # The id of the last transaction which wrote the record. Orders the change
+    # feed, see `HistoricalRecordQuerySet.since`.
+    transaction_id = TransactionIdField(null=True, blank=True, editable=False)
     objects = HistoricalRecordQuerySet.as_manager()
 
     def __str__(self):
@@ -199,6 +878,16 @@ class AbstractHistoricalRecord(models.Model):
         abstract = True
         index_together = ["object_id", "history_date"]
 
+    @property
+    def feed_cursor(self):
+        """
+        The position of the record in the change feed. See
+        `HistoricalRecordQuerySet.since`.
+        """
+        if self.transaction_id is None:
+            return None
+        return "{}.{}".format(self.transaction_id, self.id)
+
     @property
     def previous_version(self):
         return self.__class__.objects.previous_version_by_model_and_id(
@@ -207,6 +896,19 @@ class AbstractHistoricalRecord(models.Model):
             history_id=self.id,
         )
 
+    async def aprevious_version(self):
+        """
+        Async version of `previous_version`. Does not need the content type of
+        the record to be loaded.
+        :rtype HistoricalRecord
+        """
+        previous_versions = self.__class__.objects.filter(
+            content_type_id=self.content_type_id,
+            object_id=self.object_id,
+            id__lt=self.id,
+        )
+        return await previous_versions.order_by("-history_date").afirst()
+
     def get_diff_to_prev_string(self):
         """
         Generates a string which describes the changes that occurred between
@@ -232,6 +934,37 @@ class AbstractHistoricalRecord(models.Model):
             diff_string += self.content_type.name
         return diff_string
 
+    def get_changes(self):
+        """
+        Returns the previous and new values of the fields changed by this
+        record, as `{field: [old, new]}`. They are read from `history_changes`
+        when the model stores them and computed from the snapshots of this
+        record and of the previous one otherwise.
+        :rtype dict
+        """
+        if self.history_changes is not None:
+            old_values, new_values = {}, {}
+            for field_name, (old_value, new_value) in self.history_changes.items():
+                old_values[field_name] = old_value
+                new_values[field_name] = new_value
+            resolve_blob_references([old_values, new_values])
+            return {
+                field_name: [old_values[field_name], new_values[field_name]]
+                for field_name in self.history_changes
+            }
+        if self.history_type != self.UPDATE or not self.history_diff:
+            return {}
+        previous_version = self.previous_version
+        if previous_version is None:
+            return {}
+        history = self.__class__.objects
+        data = history.snapshot_at(self) or {}
+        previous_data = history.snapshot_at(previous_version) or {}
+        return {
+            field_name: [previous_data.get(field_name), data.get(field_name)]
+            for field_name in self.history_diff
+        }
+
     def _get_field_name_display(self, field_name):
         model = self.content_type.model_class()
         try:
@@ -1,5 +1,46 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+
 from .historical_record import AbstractHistoricalRecord
 
 
 class ArchivedHistoricalRecord(AbstractHistoricalRecord):
-    pass
+    class Meta(AbstractHistoricalRecord.Meta):
+        indexes = [
+            # Used by the admin to list the history of a model or of a type.
+            models.Index(
+                fields=["content_type", "history_date", "id"],
+                name="atris_ahr_ct_date_id",
+            ),
+            models.Index(
+                fields=["history_type", "history_date", "id"],
+                name="atris_ahr_type_date_id",
+            ),
+            # Used by the prefix searches on the object id.
+            models.Index(
+                fields=["object_id"],
+                name="atris_ahr_object_id_like",
+                opclasses=["text_pattern_ops"],
+            ),
+            models.Index(
+                fields=["content_type", "object_id"],
+                name="atris_ahr_ct_object_id_like",
+                opclasses=["int4_ops", "text_pattern_ops"],
+            ),
+            # Used by `changed_fields`.
+            GinIndex(fields=["history_diff"], name="atris_ahr_history_diff_gin"),
+        ]
+
+    # See HistoricalRecord.JSON_PATH_INDEXES.
+    JSON_PATH_INDEXES = [
+        GinIndex(
+            fields=["data"],
+            name="atris_ahr_data_path_gin",
+            opclasses=["jsonb_path_ops"],
+        ),
+        GinIndex(
+            fields=["additional_data"],
+            name="atris_ahr_additional_path_gin",
+            opclasses=["jsonb_path_ops"],
+        ),
+    ]
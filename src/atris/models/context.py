@@ -0,0 +1,163 @@
+import uuid
+import weakref
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+from .helpers import CommitHook
+
+
+_current_context = ContextVar("atris_history_context", default=None)
+
+
+class HistoryContext:
+    """
+    Information shared by all the history generated in one scope, e.g. while
+    handling a request: the modifying user and the changeset id.
+
+    The user of a request is read from the request when history is
+    generated, since it may be set or changed after the context was entered
+    (e.g. by `login()` or by the authentication of an API view). Only a weak
+    reference to the request is kept, so the context does not keep the
+    request, its body and its files alive. The user's id and display name are
+    resolved the first time history is generated for a user and reused
+    afterwards.
+    """
+
+    def __init__(self, user=None, changeset_id=None, request=None):
+        self._user = user
+        self._request = weakref.ref(request) if request is not None else None
+        self.changeset_id = changeset_id or uuid.uuid4()
+        self._resolved_user = None
+        self._user_id_and_name = None
+
+    @property
+    def user(self):
+        if self._user is None and self._request is not None:
+            return getattr(self._request(), "user", None)
+        return self._user
+
+    @property
+    def has_user(self):
+        return getattr(self.user, "is_authenticated", False)
+
+    @property
+    def user_id_and_name(self):
+        user = self.user if self.has_user else None
+        if self._user_id_and_name is None or self._resolved_user is not user:
+            self._resolved_user = user
+            self._user_id_and_name = get_history_user_id_and_name(user)
+        return self._user_id_and_name
+
+    def inherit_user(self, context):
+        self._user = context._user
+        self._request = context._request
+        self._resolved_user = context._resolved_user
+        self._user_id_and_name = context._user_id_and_name
+
+
+def get_history_context():
+    """
+    Returns the HistoryContext of the current scope or None if history is
+    generated outside of any.
+    """
+    return _current_context.get()
+
+
+@contextmanager
+def history_context(user=None, changeset_id=None, request=None):
+    """
+    Attributes the history generated inside the block to the given user and
+    changeset. Used by `LoggingRequestMiddleware` for every request and useful
+    for code that runs outside of a request, such as tasks and scripts::
+
+        with history_context(user=user):
+            poll.save()
+
+    If neither a user nor a request (whose user is read when history is
+    generated) is given, the user of the enclosing context is used.
+    """
+    context = HistoryContext(
+        user=user,
+        changeset_id=changeset_id,
+        request=request,
+    )
+    enclosing_context = get_history_context()
+    if user is None and request is None and enclosing_context is not None:
+        context.inherit_user(enclosing_context)
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
+
+
+class TransactionChangeset:
+    """
+    The changeset of the history generated in a transaction outside of any
+    history context.
+    """
+
+    CONNECTION_ATTRIBUTE = "atris_transaction_changeset"
+
+    def __init__(self, using):
+        self.using = using
+        self.changeset_id = uuid.uuid4()
+        self.ended = False
+        self.commit_hook = CommitHook(using, self.end)
+
+    @classmethod
+    def for_connection(cls, using):
+        connection = connections[using]
+        changeset = getattr(connection, cls.CONNECTION_ATTRIBUTE, None)
+        if changeset is None or not changeset.is_current():
+            changeset = cls(using)
+            setattr(connection, cls.CONNECTION_ATTRIBUTE, changeset)
+            changeset.commit_hook.register()
+        return changeset
+
+    def is_current(self):
+        return not self.ended and self.commit_hook.is_pending()
+
+    def end(self):
+        self.ended = True
+
+
+def get_changeset_id(using):
+    """
+    Returns the id grouping the history generated in the current scope: the
+    changeset of the current history context or, outside of one, of the
+    current transaction on the `using` database. Returns None for history
+    generated in autocommit mode outside of any context.
+    """
+    context = get_history_context()
+    if context is not None:
+        return context.changeset_id
+    if connections[using].in_atomic_block:
+        return TransactionChangeset.for_connection(using).changeset_id
+    return None
+
+
+def get_history_user_id_and_name(user):
+    if not user:
+        return None, None
+    full_name = (
+        user.get_full_name()
+        if callable(
+            getattr(user, "get_full_name", None),
+        )
+        else None
+    )
+    username = (
+        user.get_username()
+        if callable(
+            getattr(user, "get_username", None),
+        )
+        else None
+    )
+    if user:
+        history_user = full_name or getattr(user, "email", None) or username
+        return user.id, history_user
+    return user.id, None
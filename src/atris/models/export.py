@@ -0,0 +1,237 @@
+"""
+Streaming exports of the history, e.g. for audits.
+
+The records are read with server-side cursors (`QuerySet.iterator`), turned
+into rows and written line by line, so the memory used does not depend on
+the number of records exported.
+"""
+import csv
+import gzip
+import io
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .archived_historical_record import ArchivedHistoricalRecord
+from .historical_record import get_history_model
+from .snapshot_blob import resolve_blob_references
+
+
+EXPORT_FORMATS = ("jsonl", "csv")
+
+EXPORT_COLUMNS = [
+    "id",
+    "content_type",
+    "object_id",
+    "history_date",
+    "history_type",
+    "history_user",
+    "history_user_id",
+    "changeset_id",
+    "related_field_history_id",
+    "delta_depth",
+    "history_diff",
+    "history_changes",
+    "data",
+    "additional_data",
+]
+
+
+def get_history_to_export(
+    model=None,
+    object_ids=None,
+    since=None,
+    until=None,
+    user=None,
+    user_id=None,
+    archived=False,
+):
+    """
+    Gets the historical records to export, oldest first.
+    :param model: Only the history of this model.
+    :param object_ids: Only the history of the objects with these ids.
+    :param since: Only the records created at or after this date.
+    :param until: Only the records created before this date.
+    :param user: Only the records of the user with this name.
+    :param user_id: Only the records of the user with this id.
+    :param archived: Export the archived records instead.
+    :rtype HistoricalRecordQuerySet
+    """
+    history_model = ArchivedHistoricalRecord if archived else get_history_model()
+    history = history_model.objects.all()
+    if model is not None:
+        history = history.by_model(model)
+    if object_ids is not None:
+        history = history.filter(object_id__in=[str(pk) for pk in object_ids])
+    if since is not None:
+        history = history.filter(history_date__gte=since)
+    if until is not None:
+        history = history.filter(history_date__lt=until)
+    if user is not None:
+        history = history.filter(history_user=user)
+    if user_id is not None:
+        history = history.filter(history_user_id=user_id)
+    return history.select_related("content_type").order_by("history_date", "id")
+
+
+def get_export_row(record):
+    return {
+        "id": record.id,
+        "content_type": "{}.{}".format(
+            record.content_type.app_label,
+            record.content_type.model,
+        ),
+        "object_id": record.object_id,
+        "history_date": record.history_date.isoformat(),
+        "history_type": record.history_type,
+        "history_user": record.history_user,
+        "history_user_id": record.history_user_id,
+        "changeset_id": str(record.changeset_id) if record.changeset_id else None,
+        "related_field_history_id": record.related_field_history_id,
+        "delta_depth": record.delta_depth,
+        "history_diff": record.history_diff,
+        "history_changes": record.history_changes,
+        "data": record.data,
+        "additional_data": record.additional_data,
+    }
+
+
+def iter_export_rows(records, chunk_size=2000, materialize=False):
+    """
+    Streams the rows of the given historical records, fetching `chunk_size`
+    records at a time. The values stored as blobs are written in place of
+    their references, fetched with one query per chunk.
+    :param materialize: If set, the rows hold complete snapshots, even for
+                        the records storing deltas. See `iter_materialized`.
+    :rtype iterator(dict)
+    """
+    if materialize:
+        records = records.iter_materialized(chunk_size=chunk_size)
+    else:
+        records = records.iterator(chunk_size=chunk_size)
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield from get_export_rows(chunk)
+            chunk = []
+    yield from get_export_rows(chunk)
+
+
+def get_export_rows(records):
+    changes = [
+        (
+            record,
+            {name: old for name, (old, _) in record.history_changes.items()},
+            {name: new for name, (_, new) in record.history_changes.items()},
+        )
+        for record in records
+        if record.history_changes
+    ]
+    resolve_blob_references(
+        [record.data for record in records]
+        + [old_values for _, old_values, _ in changes]
+        + [new_values for _, _, new_values in changes],
+    )
+    for record, old_values, new_values in changes:
+        record.history_changes = {
+            name: [old_values[name], new_values[name]]
+            for name in record.history_changes
+        }
+    return [get_export_row(record) for record in records]
+
+
+def iter_jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def iter_csv_lines(rows):
+    """
+    Streams the rows as CSV lines, after a header. The lists and dicts, such
+    as the snapshots, are written as JSON.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+
+    def pop_line():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writeheader()
+    yield pop_line()
+    for row in rows:
+        writer.writerow(
+            {
+                column: (
+                    json.dumps(value, cls=DjangoJSONEncoder)
+                    if isinstance(value, (dict, list))
+                    else value
+                )
+                for column, value in row.items()
+            },
+        )
+        yield pop_line()
+
+
+LINE_WRITERS = {"jsonl": iter_jsonl_lines, "csv": iter_csv_lines}
+
+
+def open_export_file(path, compress=False):
+    """
+    Opens the file to write an export to, compressed with gzip if
+    `compress` is set.
+    """
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def export_history(
+    stream,
+    export_format="jsonl",
+    chunk_size=2000,
+    materialize=False,
+    progress=None,
+    **filters,
+):
+    """
+    Writes the historical records selected by the `filters` (see
+    `get_history_to_export`) to a text stream, as JSON lines or CSV.
+    :param stream: The stream written to, e.g. a file opened with
+                   `open_export_file`.
+    :param export_format: "jsonl" or "csv".
+    :param chunk_size: Number of records fetched at a time.
+    :param materialize: See `iter_export_rows`.
+    :param progress: Optional callable, called after every `chunk_size`
+                     records with the number of records written and the
+                     number of seconds elapsed.
+    :return: The number of records written.
+    :rtype int
+    """
+    if export_format not in LINE_WRITERS:
+        raise ValueError(
+            "export_format must be one of {}, not {!r}.".format(
+                ", ".join(EXPORT_FORMATS),
+                export_format,
+            ),
+        )
+    records = get_history_to_export(**filters)
+    rows = iter_export_rows(records, chunk_size, materialize)
+    started = time.monotonic()
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            yield row
+            count += 1
+            if progress is not None and count % chunk_size == 0:
+                progress(count, time.monotonic() - started)
+
+    for line in LINE_WRITERS[export_format](counted(rows)):
+        stream.write(line)
+    return count
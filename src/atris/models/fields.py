@@ -0,0 +1,96 @@
+"""
+Fields of the historical records.
+
+JSON fields decoded the first time they are accessed: listing historical
+records rarely needs their snapshots, yet every record loaded decodes them.
+The historical records loaded as model instances keep the JSON text of these
+fields as returned by the database and decode it when the attribute is first
+read. Values loaded with `values()`, `values_list()` or as expressions are
+decoded as usual.
+"""
+from contextvars import ContextVar
+
+from django.db.models import BigIntegerField, Func, JSONField
+from django.db.models.expressions import Col
+from django.db.models.query import ModelIterable
+from django.db.models.query_utils import DeferredAttribute
+
+
+_decode_lazily = ContextVar("atris_decode_json_lazily", default=False)
+
+
+class UndecodedJSON(str):
+    """
+    The JSON text of a value loaded from the database, not decoded yet.
+    """
+
+
+class LazyJSONDescriptor(DeferredAttribute):
+    # A data descriptor, unlike DeferredAttribute, so that it is used even
+    # when the value is in the instance's __dict__.
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, UndecodedJSON):
+            value = self.field.decode(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+
+class LazyJSONField(JSONField):
+    descriptor_class = LazyJSONDescriptor
+
+    def from_db_value(self, value, expression, connection):
+        is_own_column = isinstance(expression, Col) and expression.target is self
+        if _decode_lazily.get() and is_own_column and isinstance(value, str):
+            return UndecodedJSON(value)
+        return super().from_db_value(value, expression, connection)
+
+    def decode(self, value):
+        return super().from_db_value(str(value), None, None)
+
+
+class LazyJSONModelIterable(ModelIterable):
+    """
+    Yields model instances whose `LazyJSONField` values are decoded when
+    accessed.
+    """
+
+    def __iter__(self):
+        instances = super().__iter__()
+        while True:
+            # Only the rows converted while building the instances are left
+            # undecoded, not those of the queries made between two instances.
+            token = _decode_lazily.set(True)
+            try:
+                instance = next(instances)
+            except StopIteration:
+                return
+            finally:
+                _decode_lazily.reset(token)
+            yield instance
+
+
+class CurrentTransactionId(Func):
+    function = "txid_current"
+    output_field = BigIntegerField()
+
+
+class TransactionIdField(BigIntegerField):
+    """
+    The id of the last transaction which wrote the row, set to
+    `txid_current()` by every insert and update made through the ORM, which
+    also covers the custom history models. The value is read back on insert;
+    after an update, the instance keeps the previous id until it is reloaded.
+    `QuerySet.bulk_update` and `QuerySet.update` don't set it: the
+    `CurrentTransactionId` expression must be passed explicitly.
+    """
+
+    db_returning = True
+
+    def pre_save(self, model_instance, add):
+        return CurrentTransactionId()
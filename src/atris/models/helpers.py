@@ -6,7 +6,7 @@ from typing import Dict, List, Optional, Type, Union
 
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import router
+from django.db import connections, router, transaction
 from django.db.models import Model
 
 
@@ -129,6 +129,71 @@ def get_instance_field_data(instance):
     return data
 
 
+def get_instances_field_data(instances):
+    """
+    Returns the data `get_instance_field_data` returns for each of the given
+    instances of the same model. The relations which need a query, to-many
+    and reverse one-to-one, are fetched for all the instances at once, with
+    one query per relation.
+    """
+    if not instances:
+        return []
+    model = type(instances[0])
+    model_meta = model._meta
+    excluded_fields_names = model_meta.history_logging.excluded_fields_names
+    fields = [
+        field
+        for field in model_meta.get_fields()
+        if field.name not in excluded_fields_names
+    ]
+    pks = [instance.pk for instance in instances]
+    related_ids = {
+        field.name: get_related_ids(model, field.name, pks)
+        for field in fields
+        if field.many_to_many
+        or field.one_to_many
+        or (field.one_to_one and not field.concrete)
+    }
+    result = []
+    for instance in instances:
+        data = {}
+        for field in fields:
+            name = field.name
+            if name in related_ids:
+                ids = [str(pk) for pk in related_ids[name].get(instance.pk, [])]
+                if field.one_to_one:
+                    data[name] = ids[0] if ids else None
+                else:
+                    data[name] = ", ".join(ids)
+                continue
+            try:
+                value = getattr(instance, get_attribute_name_from_field(field))
+            except ObjectDoesNotExist:
+                value = None
+            data[name] = str(value) if value is not None else None
+        result.append(data)
+    return result
+
+
+def get_related_ids(model, field_name, pks):
+    """
+    Returns the primary keys of the objects related to each of the given
+    objects through `field_name`, ordered by primary key.
+    :rtype dict
+    """
+    related_pk = "{}__pk".format(field_name)
+    rows = (
+        from_writable_db(model._base_manager)
+        .filter(pk__in=pks, **{"{}__isnull".format(field_name): False})
+        .order_by(related_pk)
+        .values_list("pk", related_pk)
+    )
+    related_ids = {}
+    for pk, related_id in rows:
+        related_ids.setdefault(pk, []).append(related_id)
+    return related_ids
+
+
 def get_attribute_name_from_field(field, flat_fk=True):
     accessor_for_simple_fields = "attname" if flat_fk else "name"
     if hasattr(field, "fk_field"):  # generic foreign key
@@ -152,3 +217,69 @@ def from_writable_db(manager):
     """
     writable_db = router.db_for_write(manager.model)
     return manager.using(writable_db)
+
+
+class CommitHook:
+    """
+    A function registered once with `transaction.on_commit`. Whether it is
+    still pending is known without scanning the commit hooks of the
+    connection every time: Django replaces their list when the transaction
+    ends or a savepoint is rolled back, so the list is only searched for the
+    hook when it was replaced since the hook was registered.
+    """
+
+    def __init__(self, using, hook):
+        self.using = using
+        self.hook = hook
+        self.connection_hooks = None
+
+    def register(self):
+        transaction.on_commit(self.hook, using=self.using)
+        self.connection_hooks = connections[self.using].run_on_commit
+
+    def is_pending(self):
+        """
+        Returns whether the hook was registered and was not discarded along
+        with the transaction, or the savepoint it was registered in, because
+        it was committed or rolled back.
+        """
+        connection_hooks = connections[self.using].run_on_commit
+        if connection_hooks is self.connection_hooks:
+            return True
+        if self.connection_hooks is None or not any(
+            self.hook in registered_hook for registered_hook in connection_hooks
+        ):
+            return False
+        self.connection_hooks = connection_hooks
+        return True
+
+
+class TransactionState:
+    """
+    A value kept among the commit hooks of the connection instead of on an
+    object, so that Django discards it along with them when the transaction,
+    or the savepoint it was stored in, is rolled back. It is dropped when the
+    transaction is committed. It must be stored inside an atomic block.
+    """
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+    def __call__(self):
+        pass
+
+    @classmethod
+    def store(cls, using, key, value):
+        transaction.on_commit(cls(key, value), using=using)
+
+    @classmethod
+    def pop(cls, using, key, default=None):
+        connection_hooks = connections[using].run_on_commit
+        # The state is usually the last hook registered, so search backwards.
+        for index in range(len(connection_hooks) - 1, -1, -1):
+            hook = connection_hooks[index][1]
+            if isinstance(hook, cls) and hook.key == key:
+                del connection_hooks[index]
+                return hook.value
+        return default
@@ -1,11 +1,56 @@
+from django.apps import apps
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
 
 from .abstract_historical_record import AbstractHistoricalRecord
 
 
 class HistoricalRecord(AbstractHistoricalRecord):
-    pass
+    class Meta(AbstractHistoricalRecord.Meta):
+        indexes = [
+            # Used by the admin to list the history of a model or of a type.
+            models.Index(
+                fields=["content_type", "history_date", "id"],
+                name="atris_hr_ct_date_id",
+            ),
+            models.Index(
+                fields=["history_type", "history_date", "id"],
+                name="atris_hr_type_date_id",
+            ),
+            # Used by the prefix searches on the object id.
+            models.Index(
+                fields=["object_id"],
+                name="atris_hr_object_id_like",
+                opclasses=["text_pattern_ops"],
+            ),
+            models.Index(
+                fields=["content_type", "object_id"],
+                name="atris_hr_ct_object_id_like",
+                opclasses=["int4_ops", "text_pattern_ops"],
+            ),
+            # Used by `changed_fields`.
+            GinIndex(fields=["history_diff"], name="atris_hr_history_diff_gin"),
+            # Used by `since`.
+            models.Index(fields=["transaction_id", "id"], name="atris_hr_feed"),
+        ]
+
+    # Used by `where_data` and `where_additional`. They are large and slow
+    # down every insert, so they are only created on demand, by the
+    # `create_json_path_indexes` command.
+    JSON_PATH_INDEXES = [
+        GinIndex(
+            fields=["data"],
+            name="atris_hr_data_path_gin",
+            opclasses=["jsonb_path_ops"],
+        ),
+        GinIndex(
+            fields=["additional_data"],
+            name="atris_hr_additional_path_gin",
+            opclasses=["jsonb_path_ops"],
+        ),
+    ]
 
 
 def get_history_model():
@@ -16,3 +61,15 @@ def get_history_model():
     else:
         content_type = ContentType.objects.get_by_natural_key(app_label, model)
         return content_type.model_class()
+
+
+def get_history_models():
+    """
+    Returns all the concrete historical record models, e.g. the default and
+    the archived ones, and the custom history model if there is one.
+    """
+    return [
+        model
+        for model in apps.get_models()
+        if issubclass(model, AbstractHistoricalRecord)
+    ]
@@ -1,15 +1,44 @@
 import logging
-import threading
 
+from collections import defaultdict
 from copy import copy
+from datetime import timedelta
 from sys import modules
 
-from django.core.exceptions import ObjectDoesNotExist
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import connections, router
 from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.timezone import now
 
+from .context import get_changeset_id, get_history_context, get_history_user_id_and_name
 from .exceptions import InvalidRelatedField
-from .helpers import from_writable_db, get_diff_fields, get_instance_field_data
+from .fields import CurrentTransactionId
+from .helpers import (
+    CommitHook,
+    TransactionState,
+    from_writable_db,
+    get_attribute_name_from_field,
+    get_diff_fields,
+    get_instance_field_data,
+    get_instances_field_data,
+)
 from .historical_record import get_history_model
+from .snapshot_blob import (
+    BLOB_KEY,
+    extract_blobs,
+    get_blob_hash,
+    is_blob_reference,
+    resolve_blob_references,
+    save_blobs,
+)
+from .snapshots import (
+    compose_related_deltas,
+    encode_related_deltas,
+    get_related_delta,
+    is_related_delta,
+    reconstruct_data,
+)
 
 
 registered_models = {}
@@ -27,6 +56,38 @@ def fake_save(obj, created=False):
     obj._meta.history_logging.post_save(obj, created=created)
 
 
+async def afake_save(obj, created=False):
+    """
+    Async version of `fake_save`. The history is generated in a worker thread
+    so that the event loop is not blocked.
+    """
+    await sync_to_async(fake_save)(obj, created=created)
+
+
+def bulk_fake_save(objs, created=False):
+    """
+    Generates History for all the given objects, like calling `fake_save` for
+    each of them, but with a fixed number of queries for the objects of each
+    model. Useful after bulk_create or QuerySet.update.
+    """
+    objs_by_model = defaultdict(list)
+    for obj in objs:
+        objs_by_model[obj.__class__].append(obj)
+    history_type = created and HistoricalRecord.CREATE or HistoricalRecord.UPDATE
+    for model, model_objs in objs_by_model.items():
+        model._meta.history_logging._create_historical_records(
+            model_objs,
+            history_type,
+        )
+
+
+async def abulk_fake_save(objs, created=False):
+    """
+    Async version of `bulk_fake_save`.
+    """
+    await sync_to_async(bulk_fake_save)(objs, created=created)
+
+
 class HistoryManager:
     def __get__(self, instance, model):
         if instance and model:
@@ -38,11 +99,24 @@ class HistoryManager:
             return HistoricalRecord.objects.by_model(model)
 
 
+class AsyncHistoryManager(HistoryManager):
+    """
+    The history of a model or instance, for use with the async ORM (`async
+    for`, `afirst()`, `amost_recent()`, ...). The content types of the records
+    are fetched along with them, so that displaying the records does not
+    trigger synchronous queries.
+    """
+
+    def __get__(self, instance, model):
+        history = super().__get__(instance, model)
+        if history is not None:
+            return history.select_related("content_type")
+
+
 # noinspection PyProtectedMember,PyAttributeOutsideInit
 class HistoryLogging:
 
-    thread = threading.local()
-    _cleared_related_objects = dict()
+    DEFAULT_KEYFRAME_INTERVAL = 20
 
     def __init__(
         self,
@@ -51,6 +125,13 @@ class HistoryLogging:
         ignore_history_for_users="",
         interested_related_fields="",
         history_user_param_name="",
+        delta_related_fields="",
+        delta_snapshots=False,
+        keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+        blob_threshold=None,
+        coalesce_saves=False,
+        debounce_seconds=None,
+        store_changes=False,
     ):
         """
         :param additional_data_param_name: String used to determine which field
@@ -66,6 +147,38 @@ class HistoryLogging:
             Dict should contain
 
         :type excluded_fields_param_name: str
+
+        :param delta_related_fields: String used to determine which field on
+            the object contains a list holding the names of the to-many
+            relation fields for which only the added and removed ids are
+            stored in each historical record.
+        :param delta_snapshots: If set, update records store only the values
+            of the fields that changed.
+        :type delta_snapshots: bool
+        :param keyframe_interval: Every `keyframe_interval` versions, a
+            complete snapshot is stored instead of deltas.
+        :type keyframe_interval: int
+
+        :param blob_threshold: If set, values longer than this number of
+            characters are stored once in the `SnapshotBlob` table and the
+            snapshots only hold a reference to them.
+        :type blob_threshold: int
+
+        :param coalesce_saves: If set, the changes made to an object inside a
+            transaction are recorded in a single historical record, generated
+            when the transaction is committed.
+        :type coalesce_saves: bool
+
+        :param debounce_seconds: If set, an update made less than this number
+            of seconds after the previous update of the object, by the same
+            user, is merged into the previous update's historical record
+            instead of generating a new one.
+        :type debounce_seconds: int
+
+        :param store_changes: If set, update records also store the previous
+            and new values of the changed fields, in `history_changes`, so
+            that they can be displayed without loading the previous record.
+        :type store_changes: bool
         """
         self.additional_data_param_name = additional_data_param_name
         self.class_additional_data_name = "__" + additional_data_param_name
@@ -73,6 +186,13 @@ class HistoryLogging:
         self.interested_related_fields_param_name = interested_related_fields
         self.ignore_history_for_users_param_name = ignore_history_for_users
         self.history_user_param_name = history_user_param_name
+        self.delta_related_fields_param_name = delta_related_fields
+        self.delta_snapshots = delta_snapshots
+        self.keyframe_interval = keyframe_interval
+        self.blob_threshold = blob_threshold
+        self.coalesce_saves = coalesce_saves
+        self.debounce_seconds = debounce_seconds
+        self.store_changes = store_changes
 
     def contribute_to_class(self, cls, name):
         if cls not in registered_models:
@@ -82,6 +202,7 @@ class HistoryLogging:
             }
         setattr(cls._meta, "history_logging", self)
         setattr(cls, name, HistoryManager())
+        setattr(cls, "a{}".format(name), AsyncHistoryManager())
         self.module = cls.__module__
         self.model = cls
 
@@ -181,6 +302,28 @@ class HistoryLogging:
                     ),
                 )
 
+    def set_delta_related_fields(self, cls):
+        self.delta_related_fields = set(
+            getattr(
+                cls,
+                self.delta_related_fields_param_name,
+                [],
+            ),
+        )
+        for field_name in self.delta_related_fields:
+            field = cls._meta.get_field(field_name)
+            if not (field.one_to_many or field.many_to_many):
+                raise InvalidRelatedField(
+                    "{} is not a to-many related field on {}".format(
+                        field.name,
+                        cls,
+                    ),
+                )
+
+    @property
+    def stores_deltas(self):
+        return self.delta_snapshots or bool(self.delta_related_fields)
+
     def register_signal_handlers(self, sender):
         post_save.connect(self.post_save, sender=sender, weak=False)
         post_delete.connect(self.post_delete, sender=sender, weak=False)
@@ -203,43 +346,74 @@ class HistoryLogging:
     def post_delete(self, instance, **kwargs):
         self._create_historical_record(instance, HistoricalRecord.DELETE)
 
-    def m2m_changed(self, instance, action, reverse, model, pk_set, **kwargs):
+    def m2m_changed(self, instance, action, reverse, model, pk_set, using, **kwargs):
         only_related_model_tracks_history = not hasattr(
             instance._meta, "history_logging"
         ) and hasattr(model._meta, "history_logging")
         if only_related_model_tracks_history:
             if action in ("post_add", "post_remove"):
-                for related_object in model.objects.filter(pk__in=pk_set):
-                    self._create_historical_record(
-                        related_object,
-                        HistoricalRecord.UPDATE,
-                    )
-            elif action == "pre_clear":
+                self._create_historical_records(
+                    model.objects.filter(pk__in=pk_set),
+                    HistoricalRecord.UPDATE,
+                )
+            elif action in ("pre_clear", "post_clear"):
                 field_name = find_m2m_field_name_by_model(
                     instance._meta,
                     model,
                     reverse,
                 )
-                related_objects = getattr(instance, field_name).all()
-                self._cleared_related_objects[instance] = list(related_objects)
-            elif action == "post_clear" and instance in self._cleared_related_objects:
-                related_objects = self._cleared_related_objects.pop(instance)
-                for related_object in related_objects:
-                    self._create_historical_record(
-                        related_object,
-                        HistoricalRecord.UPDATE,
-                        False,
-                    )
+                if action == "pre_clear":
+                    self.store_cleared_related_pks(instance, field_name, using)
+                    return
+                related_pks = self.pop_cleared_related_pks(
+                    instance,
+                    field_name,
+                    using,
+                )
+                self._create_historical_records(
+                    model.objects.filter(pk__in=related_pks),
+                    HistoricalRecord.UPDATE,
+                    False,
+                )
         elif action.startswith("post"):
             self._create_historical_record(instance, HistoricalRecord.UPDATE)
 
+    def store_cleared_related_pks(self, instance, field_name, using):
+        """
+        Remembers the primary keys of the objects about to be removed by a
+        `clear()` on one of the instance's many-to-many fields so that their
+        history can be generated once the relation is cleared. They are kept
+        by the transaction of the `clear()`, which discards them if the clear
+        fails and is rolled back.
+        """
+        related_objects = getattr(instance, field_name).all()
+        TransactionState.store(
+            using,
+            (instance, field_name),
+            list(related_objects.values_list("pk", flat=True)),
+        )
+
+    def pop_cleared_related_pks(self, instance, field_name, using):
+        return TransactionState.pop(using, (instance, field_name), [])
+
     def _create_historical_record(
         self, instance, history_type, propagate_to_related_fields=True
     ):
-        history_user = self.get_history_user(instance)
-        history_user_id, history_user_name = get_history_user_id_and_name(
-            history_user,
+        history_user_id, history_user_name = self.get_history_user_id_and_name(
+            instance,
         )
+        coalesced_history = CoalescedHistory.for_instance(instance)
+        if coalesced_history is not None:
+            handled = coalesced_history.add(
+                instance,
+                history_type,
+                history_user_id,
+                history_user_name,
+                self.get_ignored_users(instance),
+                propagate_to_related_fields,
+            )
+            if handled:
+                return
         generate_history = HistoricalRecordGenerator(
             instance,
             history_type,
@@ -250,43 +424,51 @@ class HistoryLogging:
         )
         generate_history()
 
+    def _create_historical_records(
+        self, instances, history_type, propagate_to_related_fields=True
+    ):
+        instances = list(instances)
+        if instances and CoalescedHistory.for_instance(instances[0]) is not None:
+            for instance in instances:
+                self._create_historical_record(
+                    instance,
+                    history_type,
+                    propagate_to_related_fields,
+                )
+            return
+        generate_history = BulkHistoricalRecordGenerator(
+            instances,
+            history_type,
+            propagate_to_related_fields,
+        )
+        generate_history()
+
     def get_ignored_users(self, instance):
         return getattr(instance, self.ignore_history_for_users_param_name, {})
 
     def get_history_user(self, instance):
         """
-        Get the modifying user from the middleware or the user registered on
-        the modified instance under the attribute declared with the name
-        specified by the `history_user_param_name` init variable.
+        Get the modifying user from the current history context (set by the
+        middleware or `history_context`) or the user registered on the
+        modified instance under the `history_user` attribute.
         """
-        try:
-            if self.thread.request.user.is_authenticated:
-                return self.thread.request.user
-        except AttributeError:
-            return getattr(instance, "history_user", None)
+        context = get_history_context()
+        if context is not None and context.has_user:
+            return context.user
+        return getattr(instance, "history_user", None)
 
-
-def get_history_user_id_and_name(user):
-    if not user:
-        return None, None
-    full_name = (
-        user.get_full_name()
-        if callable(
-            getattr(user, "get_full_name", None),
-        )
-        else None
-    )
-    username = (
-        user.get_username()
-        if callable(
-            getattr(user, "get_username", None),
+    def get_history_user_id_and_name(self, instance):
+        """
+        Get the id and the name of the modifying user. The user of the current
+        history context is resolved once and reused for all the history
+        generated in that context.
+        """
+        context = get_history_context()
+        if context is not None and context.has_user:
+            return context.user_id_and_name
+        return get_history_user_id_and_name(
+            getattr(instance, "history_user", None),
         )
-        else None
-    )
-    if user:
-        history_user = full_name or getattr(user, "email", None) or username
-        return user.id, history_user
-    return user.id, None
 
 
 def find_m2m_field_name_by_model(in_model_meta, for_model, reverse_m2m):
@@ -348,47 +530,147 @@ class HistoricalRecordGenerator:
         ignored_users=None,
         propagate_to_related_fields=True,
         extra_info=None,
+        previous_snapshot=None,
+        changeset_id=None,
     ):
         self.instance = instance
-        self.previous_data = getattr(
-            from_writable_db(self.instance.history).first(),
-            "data",
-            None,
-        )
         self.history_logging = self.instance._meta.history_logging
+        if previous_snapshot is None:
+            previous_snapshot = self.get_previous_snapshot()
+        self.previous_record, self.previous_data = previous_snapshot
         self.history_type = history_type
         self.user_id = user_id
         self.user_name = user_name
         self.ignored_users = ignored_users if ignored_users else {}
         self.propagate_to_related_fields = propagate_to_related_fields
         self.extra_info = extra_info
+        if changeset_id is None:
+            changeset_id = get_changeset_id(router.db_for_write(HistoricalRecord))
+        self.changeset_id = changeset_id
 
     def __call__(self):
         if self.should_skip_history_for_user():
-            logger.info(
-                "Skipping history instance for user '{}' "
-                "with user id '{}'".format(
-                    self.user_name,
-                    self.user_id,
-                )
-            )
+            self.log_skipped_history()
             return
         data = get_instance_field_data(self.instance)
+        self.resolve_previous_blobs(data)
+        instance_history = self.build_historical_record(data)
+        if instance_history is None:
+            return
+        save_blobs(extract_record_large_values(self.instance, instance_history))
+        instance_history.save()
+        self.generate_for_related_objects(instance_history)
+
+    def log_skipped_history(self):
+        logger.info(
+            "Skipping history instance for user '{}' "
+            "with user id '{}'".format(
+                self.user_name,
+                self.user_id,
+            )
+        )
+
+    def build_historical_record(self, data):
+        """
+        Returns the unsaved historical record for the instance's current data
+        or None if there are no changes to record. When the change is
+        debounced, the returned record is the previous one, with the change
+        merged into it.
+        """
         diff_fields, should_generate_history = self.get_differing_fields(data)
         if not should_generate_history:
-            return
+            return None
         additional_data = get_additional_data(self.instance)
         if self.extra_info:
             additional_data.update(self.extra_info)
-        instance_history = HistoricalRecord.objects.create(
+        debounced_record = self.get_debounced_record()
+        if debounced_record is not None:
+            return self.merge_into_record(
+                debounced_record,
+                data,
+                diff_fields,
+                additional_data,
+            )
+        delta_depth = self.get_delta_depth()
+        return HistoricalRecord(
             content_object=self.instance,
             history_type=self.history_type,
             history_user=self.user_name,
             history_user_id=self.user_id,
-            data=data,
+            data=self.get_data_to_store(data, diff_fields, delta_depth),
             history_diff=diff_fields,
+            history_changes=self.get_changes(data, diff_fields),
             additional_data=additional_data,
+            delta_depth=delta_depth,
+            changeset_id=self.changeset_id,
         )
+
+    def get_debounced_record(self):
+        """
+        Returns the previous historical record of the instance if the change
+        should be merged into it: both are updates, made by the same user in
+        the same changeset, less than `debounce_seconds` apart, and the
+        previous one does not record a change of a related object.
+        """
+        debounce_seconds = self.history_logging.debounce_seconds
+        record = self.previous_record
+        can_merge = (
+            debounce_seconds
+            and self.previous_data is not None
+            and self.history_type == HistoricalRecord.UPDATE
+            and record.history_type == HistoricalRecord.UPDATE
+            and record.related_field_history_id is None
+            and record.history_user_id == self.user_id
+            and record.history_user == self.user_name
+            and record.changeset_id == self.changeset_id
+            and record.history_date > now() - timedelta(seconds=debounce_seconds)
+        )
+        return record if can_merge else None
+
+    def merge_into_record(self, record, data, diff_fields, additional_data):
+        """
+        Updates the record with the instance's current data, as if it was
+        generated for the latest change. The record keeps its date.
+        """
+        merged_diff_fields = list(record.history_diff or [])
+        merged_diff_fields += [
+            field_name
+            for field_name in diff_fields
+            if field_name not in merged_diff_fields
+        ]
+        record.history_diff = merged_diff_fields
+        changes = self.get_changes(data, diff_fields)
+        if changes is not None:
+            # The record keeps the values from before its first change.
+            merged_changes = dict(record.history_changes or {})
+            for field_name, (old_value, new_value) in changes.items():
+                old_value = merged_changes.get(field_name, [old_value])[0]
+                merged_changes[field_name] = [old_value, new_value]
+            record.history_changes = merged_changes
+        record.additional_data = {**record.additional_data, **additional_data}
+        if record.delta_depth == 0:
+            record.data = data
+            return record
+        stored_data = dict(data)
+        if self.history_logging.delta_snapshots:
+            stored_data = {key: data[key] for key in merged_diff_fields}
+        # The deltas stored by the record are relative to the record before
+        # it, so they are composed with the deltas of the current change.
+        for field_name in self.history_logging.delta_related_fields:
+            if field_name not in stored_data:
+                continue
+            delta = get_related_delta(
+                self.previous_data.get(field_name),
+                data[field_name],
+            )
+            previous_delta = record.data.get(field_name)
+            if is_related_delta(previous_delta):
+                delta = compose_related_deltas(previous_delta, delta)
+            stored_data[field_name] = delta
+        record.data = stored_data
+        return record
+
+    def generate_for_related_objects(self, instance_history):
         if self.propagate_to_related_fields:
             generate_for_related_fields = RelatedFieldHistoryGenerator(
                 self.instance,
@@ -405,11 +687,101 @@ class HistoricalRecordGenerator:
             )
             generate_for_interested_objects()
 
+    def get_previous_snapshot(self):
+        """
+        Returns the latest historical record of the instance together with its
+        complete snapshot.
+        """
+        history = get_previous_records(
+            from_writable_db(self.instance.history),
+            self.history_logging,
+        )
+        if not self.history_logging.stores_deltas:
+            previous_record = history.first()
+            if previous_record is None:
+                return None, None
+            return previous_record, dict(previous_record.data)
+        # A keyframe is stored at least once every `keyframe_interval` records.
+        chain = list(
+            history.order_by("-history_date", "-id")[
+                : self.history_logging.keyframe_interval
+            ]
+        )
+        if not chain:
+            return None, None
+        return chain[0], reconstruct_data(chain)
+
+    def resolve_previous_blobs(self, data):
+        """
+        Replaces the blob references in the previous snapshot with their
+        values. The values identical to the current ones are not fetched.
+        """
+        if self.previous_data is None:
+            return
+        resolve_blob_references(
+            [self.previous_data],
+            self.get_known_blob_values(data),
+        )
+
+    def get_known_blob_values(self, data):
+        """
+        Returns, by hash, the values of the blobs referenced by the previous
+        snapshot which are identical to the current ones.
+        """
+        known_values = {}
+        for key, value in (self.previous_data or {}).items():
+            current_value = data.get(key)
+            if is_blob_reference(value) and isinstance(current_value, str):
+                if get_blob_hash(current_value) == value[BLOB_KEY]:
+                    known_values[value[BLOB_KEY]] = current_value
+        return known_values
+
+    def get_delta_depth(self):
+        can_store_delta = (
+            self.history_logging.stores_deltas
+            and self.history_type == HistoricalRecord.UPDATE
+            and self.previous_data is not None
+        )
+        if not can_store_delta:
+            return 0
+        delta_depth = self.previous_record.delta_depth + 1
+        return (
+            delta_depth if delta_depth < self.history_logging.keyframe_interval else 0
+        )
+
+    def get_data_to_store(self, data, diff_fields, delta_depth):
+        if delta_depth == 0:
+            return data
+        if self.history_logging.delta_snapshots:
+            data = {key: data[key] for key in diff_fields}
+        return encode_related_deltas(
+            data,
+            self.previous_data,
+            self.history_logging.delta_related_fields,
+        )
+
     def should_skip_history_for_user(self):
         ids_to_skip = self.ignored_users.get("user_ids", [])
         user_names_to_skip = self.ignored_users.get("user_names", [])
         return self.user_name in user_names_to_skip or self.user_id in ids_to_skip
 
+    def get_changes(self, data, diff_fields):
+        """
+        Returns the previous and new values of the changed fields, as
+        `{field: [old, new]}`, for the models which store them.
+        """
+        can_store_changes = (
+            self.history_logging.store_changes
+            and self.history_type == HistoricalRecord.UPDATE
+            and self.previous_data is not None
+        )
+        if not can_store_changes:
+            return None
+        return {
+            field_name: [self.previous_data.get(field_name), data.get(field_name)]
+            for field_name in diff_fields or []
+        }
+
     def get_differing_fields(self, data):
         if self.history_type == HistoricalRecord.UPDATE:
             diff_fields = get_diff_fields(
@@ -425,6 +797,273 @@ class HistoricalRecordGenerator:
         return diff_fields, should_generate_history
 
 
+class BulkHistoricalRecordGenerator:
+    """
+    Generates the history of several instances of the same model with a fixed
+    number of queries: the previous snapshots of all the instances are
+    fetched together, their relations are serialized together and the
+    historical records are inserted with one query.
+    """
+
+    def __init__(self, instances, history_type, propagate_to_related_fields=True):
+        self.instances = instances
+        self.history_type = history_type
+        self.propagate_to_related_fields = propagate_to_related_fields
+
+    def __call__(self):
+        if not self.instances:
+            return
+        generators = []
+        previous_snapshots = self.get_previous_snapshots()
+        for instance in self.instances:
+            generate_history = self.get_generator(
+                instance,
+                previous_snapshots.get(str(instance.pk), (None, None)),
+            )
+            if generate_history.should_skip_history_for_user():
+                generate_history.log_skipped_history()
+            else:
+                generators.append(generate_history)
+        all_data = get_instances_field_data(
+            [generate_history.instance for generate_history in generators],
+        )
+        self.resolve_previous_blobs(generators, all_data)
+        records = []
+        blobs = {}
+        for generate_history, data in zip(generators, all_data):
+            instance_history = generate_history.build_historical_record(data)
+            if instance_history is None:
+                continue
+            blobs.update(
+                extract_record_large_values(
+                    generate_history.instance,
+                    instance_history,
+                ),
+            )
+            records.append((generate_history, instance_history))
+        save_blobs(blobs)
+        # Debounced changes are merged into existing records.
+        new_records, merged_records = [], []
+        for _, instance_history in records:
+            if instance_history.pk is None:
+                new_records.append(instance_history)
+            else:
+                merged_records.append(instance_history)
+        HistoricalRecord.objects.bulk_create(new_records)
+        for instance_history in merged_records:
+            instance_history.transaction_id = CurrentTransactionId()
+        HistoricalRecord.objects.bulk_update(
+            merged_records,
+            [
+                "data",
+                "history_diff",
+                "history_changes",
+                "additional_data",
+                "transaction_id",
+            ],
+        )
+        for generate_history, instance_history in records:
+            generate_history.generate_for_related_objects(instance_history)
+
+    def get_generator(self, instance, previous_snapshot):
+        history_logging = instance._meta.history_logging
+        user_id, user_name = history_logging.get_history_user_id_and_name(instance)
+        return HistoricalRecordGenerator(
+            instance,
+            self.history_type,
+            user_id,
+            user_name,
+            history_logging.get_ignored_users(instance),
+            self.propagate_to_related_fields,
+            previous_snapshot=previous_snapshot,
+        )
+
+    def get_previous_snapshots(self):
+        """
+        Returns the latest historical record of each instance together with
+        its complete snapshot, by object id.
+        """
+        model = self.instances[0].__class__
+        history_logging = model._meta.history_logging
+        history = get_previous_records(
+            from_writable_db(HistoricalRecord.objects).by_model(model),
+            history_logging,
+        )
+        # A keyframe is stored at least once every `keyframe_interval` records.
+        count = (
+            history_logging.keyframe_interval if history_logging.stores_deltas else 1
+        )
+        latest_records = history.filter(
+            object_id__in=[instance.pk for instance in self.instances],
+        ).latest_per_object(count)
+        chains = defaultdict(list)
+        for record in latest_records.order_by("-history_date", "-id"):
+            chains[record.object_id].append(record)
+        previous_snapshots = {}
+        for object_id, chain in chains.items():
+            if history_logging.stores_deltas:
+                previous_data = reconstruct_data(chain)
+            else:
+                previous_data = dict(chain[0].data)
+            previous_snapshots[object_id] = (chain[0], previous_data)
+        return previous_snapshots
+
+    @staticmethod
+    def resolve_previous_blobs(generators, all_data):
+        known_values = {}
+        for generate_history, data in zip(generators, all_data):
+            known_values.update(generate_history.get_known_blob_values(data))
+        resolve_blob_references(
+            [generate_history.previous_data for generate_history in generators],
+            known_values,
+        )
+
+
+class CoalescedHistory:
+    """
+    The changes made inside a transaction to the objects of the models which
+    use `coalesce_saves`. One historical record is generated for each object
+    when the transaction is committed, against the object's history from
+    before the transaction:
+
+    * CREATE followed by UPDATEs is recorded as CREATE;
+    * UPDATEs are recorded as one UPDATE with the merged diff;
+    * UPDATEs followed by DELETE are recorded as DELETE, right away since the
+      object's data is no longer available at commit;
+    * CREATE followed by DELETE is not recorded.
+
+    Nothing is recorded if the transaction is rolled back.
+    """
+
+    CONNECTION_ATTRIBUTE = "atris_coalesced_history"
+
+    def __init__(self, using):
+        self.using = using
+        self.changes = {}
+        self.flushed = False
+        self.commit_hook = CommitHook(using, self.flush)
+
+    @classmethod
+    def for_instance(cls, instance):
+        """
+        Returns the changes pending on the connection the instance is written
+        to or None if the instance's changes are not coalesced.
+        """
+        if not instance._meta.history_logging.coalesce_saves:
+            return None
+        using = router.db_for_write(instance.__class__, instance=instance)
+        connection = connections[using]
+        if not connection.in_atomic_block:
+            return None
+        coalesced_history = getattr(connection, cls.CONNECTION_ATTRIBUTE, None)
+        if coalesced_history is None or not coalesced_history.is_pending():
+            coalesced_history = cls(using)
+            setattr(connection, cls.CONNECTION_ATTRIBUTE, coalesced_history)
+            coalesced_history.commit_hook.register()
+        return coalesced_history
+
+    def is_pending(self):
+        """
+        The changes are discarded together with the commit hook when the
+        transaction, or the savepoint in which they were first recorded, is
+        rolled back.
+        """
+        return not self.flushed and self.commit_hook.is_pending()
+
+    def add(
+        self,
+        instance,
+        history_type,
+        user_id,
+        user_name,
+        ignored_users,
+        propagate_to_related_fields,
+    ):
+        """
+        Records a change of the instance.
+        :return: False if the historical record must be generated right away.
+        :rtype bool
+        """
+        key = (instance.__class__, str(instance.pk))
+        previous_change = self.changes.pop(key, None)
+        if previous_change is not None:
+            if previous_change["history_type"] == HistoricalRecord.CREATE:
+                history_type = HistoricalRecord.CREATE
+            propagate_to_related_fields = (
+                propagate_to_related_fields
+                or previous_change["propagate_to_related_fields"]
+            )
+        if history_type == HistoricalRecord.DELETE:
+            created_in_transaction = (
+                previous_change is not None
+                and previous_change["history_type"] == HistoricalRecord.CREATE
+            )
+            return created_in_transaction
+        self.changes[key] = {
+            "instance": instance,
+            "history_type": history_type,
+            "user_id": user_id,
+            "user_name": user_name,
+            "ignored_users": ignored_users,
+            "propagate_to_related_fields": propagate_to_related_fields,
+            "changeset_id": get_changeset_id(self.using),
+            # Read now: the instance's additional data is not a field, so it
+            # is not read again at commit.
+            "additional_data": get_additional_data(instance),
+        }
+        return True
+
+    def flush(self):
+        self.flushed = True
+        saved_instances = self.get_saved_instances()
+        for (model, pk), change in self.changes.items():
+            instance = saved_instances[model].get(pk)
+            # Objects created in savepoints which were rolled back.
+            if instance is None:
+                continue
+            generate_history = HistoricalRecordGenerator(
+                instance,
+                change["history_type"],
+                change["user_id"],
+                change["user_name"],
+                change["ignored_users"],
+                change["propagate_to_related_fields"],
+                extra_info=change["additional_data"],
+                changeset_id=change["changeset_id"],
+            )
+            generate_history()
+        self.changes = {}
+
+    def get_saved_instances(self):
+        """
+        Reads the changed objects again, as committed: the instances saved may
+        have been modified since, or their changes rolled back along with a
+        savepoint. The attributes which are not fields, such as
+        `history_user`, are copied from the instances saved.
+        :return: The instances by pk, by model.
+        :rtype dict
+        """
+        pks_by_model = defaultdict(list)
+        for model, pk in self.changes:
+            pks_by_model[model].append(pk)
+        saved_instances = {}
+        for model, pks in pks_by_model.items():
+            field_names = {field.attname for field in model._meta.concrete_fields}
+            saved = model._base_manager.using(self.using).in_bulk(pks)
+            saved_instances[model] = {}
+            for pk, instance in saved.items():
+                changed_instance = self.changes[(model, str(pk))]["instance"]
+                instance.__dict__.update(
+                    {
+                        name: value
+                        for name, value in changed_instance.__dict__.items()
+                        if name not in field_names and not name.startswith("_")
+                    },
+                )
+                saved_instances[model][str(pk)] = instance
+        return saved_instances
+
+
 class RelatedFieldHistoryGenerator:
     def __init__(self, instance, instance_history, previous_data):
         self.instance = instance
@@ -532,10 +1171,14 @@ class InterestedObjectHistoryGenerator:
             history_type=HistoricalRecord.UPDATE,
             history_user=self.instance_history.history_user,
             history_user_id=self.instance_history.history_user_id,
-            data=get_instance_field_data(interested_object),
+            data=store_large_values(
+                interested_object,
+                get_instance_field_data(interested_object),
+            ),
             history_diff=[instance_name],
             additional_data=additional_data,
             related_field_history=self.instance_history,
+            changeset_id=self.instance_history.changeset_id,
         )
 
 
@@ -557,70 +1200,188 @@ class HistoryEnabledRelatedObjectsCollector:
         self.previous_data = previous_data
 
     def __call__(self):
-        related_objects = self.get_current_related_objects()
-        previous_objects = self.get_previous_objects()
-        if self.tracks_history(related_objects + previous_objects):
-            result = self.aggregate_related_objects(
-                related_objects,
-                previous_objects,
+        model_class = self.get_related_model()
+        if not self.tracks_history(model_class):
+            return dict()
+        current_pks = self.get_current_related_pks()
+        previous_pks = self.get_previous_object_pks()
+        pk_statuses = self.aggregate_related_pks(current_pks, previous_pks)
+        objects_by_pk = self.get_cached_related_objects()
+        # Only the objects that get a history record are instantiated, all in
+        # one query.
+        pks_to_fetch = [pk for pk in pk_statuses if pk not in objects_by_pk]
+        if pks_to_fetch:
+            objects = model_class.objects.in_bulk(
+                self.to_python_pks(model_class, pks_to_fetch),
             )
-        else:
-            result = dict()
-        return result
+            objects_by_pk.update({str(pk): obj for pk, obj in objects.items()})
+        return {
+            objects_by_pk[pk]: status
+            for pk, status in pk_statuses.items()
+            if pk in objects_by_pk
+        }
+
+    @staticmethod
+    def to_python_pks(model_class, pks):
+        """
+        Converts the pks, stored as strings, to the type of the model's pk.
+        The pks of generic relations may not be valid for the referenced
+        model, e.g. an integer referencing a model with UUID pks; those
+        objects don't exist and are left out.
+        """
+        pk_field = model_class._meta.pk
+        python_pks = []
+        for pk in pks:
+            try:
+                python_pks.append(pk_field.to_python(pk))
+            except ValidationError:
+                continue
+        return python_pks
 
     @staticmethod
-    def tracks_history(objects):
-        return objects and hasattr(objects[0]._meta, "history_logging")
+    def tracks_history(model_class):
+        return model_class is not None and hasattr(
+            model_class._meta,
+            "history_logging",
+        )
 
-    def get_current_related_objects(self):
+    def get_related_model(self):
+        if self.field.related_model:
+            return self.field.related_model
+        # The `related_model` field is None on GenericForeignKeys.
+        model_content_type = getattr(self.instance, self.field.ct_field)
+        if model_content_type is None:
+            return None
+        return model_content_type.model_class()
+
+    def get_cached_related_objects(self):
+        """
+        The object referenced through a to-one relation may already be loaded
+        on the instance, possibly with unsaved changes. That same object is
+        used instead of a fresh copy from the database.
+        """
+        if self.field.one_to_many or self.field.many_to_many:
+            return dict()
+        if not self.field.is_cached(self.instance):
+            return dict()
+        cached_object = self.field.get_cached_value(self.instance)
+        if cached_object is None:
+            return dict()
+        return {str(cached_object.pk): cached_object}
+
+    def get_current_related_pks(self):
+        if self.field.many_to_one or (self.field.one_to_one and self.field.concrete):
+            # Foreign keys (including generic ones) hold the primary key of the
+            # referenced object locally, no query is required.
+            pk = getattr(self.instance, get_attribute_name_from_field(self.field))
+            return [str(pk)] if pk is not None else []
         try:
             referenced_object = getattr(self.instance, self.field_name)
         except ObjectDoesNotExist:
             return []
-        if self.field.one_to_one or self.field.many_to_one:
-            # A single element is guaranteed.
-            related_objects = [referenced_object] if referenced_object else []
+        if self.field.one_to_one:
+            # Reverse side of a 1-to-1 relation.
+            return [str(referenced_object.pk)] if referenced_object else []
         elif self.field.one_to_many or self.field.many_to_many:
             # The attribute is a RelatedManager instance.
-            related_objects = list(referenced_object.all())
-        else:
-            raise TypeError(
-                "Field {} did not match any known related field types. Known "
-                "types: 1-to-1, 1-to-many, many-to-1, many-to-many.".format(self.field)
-            )
-        return related_objects
-
-    def get_previous_objects(self):
-        previous_pks = self.get_previous_object_pks()
-        if self.field.related_model:
-            model_class = self.field.related_model
-        else:
-            # The `related_model` field is None on GenericForeignKeys.
-            model_content_type = getattr(self.instance, self.field.ct_field)
-            model_class = model_content_type.model_class()
-        return list(model_class.objects.filter(pk__in=previous_pks))
+            pks = from_writable_db(referenced_object).values_list("pk", flat=True)
+            return [str(pk) for pk in pks]
+        raise TypeError(
+            "Field {} did not match any known related field types. Known "
+            "types: 1-to-1, 1-to-many, many-to-1, many-to-many.".format(self.field)
+        )
 
     def get_previous_object_pks(self):
         if not self.previous_data:
             return list()
-        previous_data = self.previous_data.get(self.field_name, None) or ""
+        # Snapshots are keyed by field name, which may differ from the
+        # accessor name of reverse relations.
+        previous_data = self.previous_data.get(self.field.name, None) or ""
         previous_pks = previous_data.split(", ")
         return [pk for pk in previous_pks if pk != ""]
 
-    def aggregate_related_objects(self, related_objects, previous_objects):
-        current_objects = set(related_objects)
-        previous_objects = set(previous_objects)
-        added = current_objects - previous_objects
-        unmodified = current_objects & previous_objects
-        removed = previous_objects - current_objects
+    def aggregate_related_pks(self, current_pks, previous_pks):
+        """
+        Maps the string representation of each primary key to its status:
+        ADDED, UNMODIFIED or REMOVED.
+        """
+        current_pks = set(current_pks)
+        previous_pks = set(previous_pks)
+        added = current_pks - previous_pks
+        unmodified = current_pks & previous_pks
+        removed = previous_pks - current_pks
         result = dict(
-            [(o, self.ADDED) for o in added]
-            + [(o, self.UNMODIFIED) for o in unmodified]
-            + [(o, self.REMOVED) for o in removed]
+            [(pk, self.ADDED) for pk in added]
+            + [(pk, self.UNMODIFIED) for pk in unmodified]
+            + [(pk, self.REMOVED) for pk in removed]
         )
         return result
 
 
+def get_previous_records(history, history_logging):
+    """
+    Returns the history without the columns the generators do not read from
+    the previous records: only the debounced changes, merged into them, need
+    more than the snapshot.
+    """
+    if history_logging.debounce_seconds:
+        return history
+    return history.defer("additional_data", "history_diff", "history_changes")
+
+
+def store_large_values(instance, data):
+    """
+    Stores the large values of the snapshot as blobs, as configured for the
+    instance's model, and returns the snapshot referencing them.
+    """
+    data, blobs = extract_large_values(instance, data)
+    save_blobs(blobs)
+    return data
+
+
+def extract_large_values(instance, data):
+    """
+    Replaces the large values of the snapshot with blob references, as
+    configured for the instance's model, without storing them.
+    :return: The snapshot and the blobs to store by hash.
+    :rtype tuple(dict, dict)
+    """
+    history_logging = instance._meta.history_logging
+    return extract_blobs(
+        data,
+        history_logging.blob_threshold,
+        # The deltas of these fields are applied on the previous values.
+        history_logging.delta_related_fields,
+    )
+
+
+def extract_record_large_values(instance, record):
+    """
+    Replaces the large values of the record's snapshot and changes with blob
+    references, as configured for the instance's model, without storing them.
+    :return: The blobs to store by hash.
+    :rtype dict
+    """
+    record.data, blobs = extract_large_values(instance, record.data)
+    if record.history_changes:
+        threshold = instance._meta.history_logging.blob_threshold
+        old_values, old_blobs = extract_blobs(
+            {name: old for name, (old, _) in record.history_changes.items()},
+            threshold,
+        )
+        new_values, new_blobs = extract_blobs(
+            {name: new for name, (_, new) in record.history_changes.items()},
+            threshold,
+        )
+        record.history_changes = {
+            name: [old_values[name], new_values[name]]
+            for name in record.history_changes
+        }
+        blobs.update(old_blobs)
+        blobs.update(new_blobs)
+    return blobs
+
+
 def get_additional_data(instance):
     history_logging = instance._meta.history_logging
     try:
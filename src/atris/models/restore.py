@@ -0,0 +1,247 @@
+"""
+Restoring objects to the state recorded by their historical records.
+
+The snapshots hold the values of the fields as strings. The values of the
+concrete fields, foreign keys included, are converted back and written with
+one `bulk_update` and one `bulk_create` per model. The to-many relations
+stored through automatically created many-to-many tables are restored with
+set-based writes to those tables. The relations stored on the related objects
+(reverse foreign keys, generic relations) belong to the related objects'
+history and are not restored.
+"""
+import ast
+import json
+
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import router, transaction
+
+from .helpers import from_writable_db, get_field_internal_type
+from .snapshots import split_ids
+
+
+LITERAL_INTERNAL_TYPES = {"ArrayField", "HStoreField", "JSONField"}
+
+
+def get_value_from_snapshot(field, value):
+    """
+    Converts a value stored in a snapshot back to the field's Python value.
+    """
+    if value is None:
+        return None
+    if get_field_internal_type(field) in LITERAL_INTERNAL_TYPES:
+        # These values are stored as the `str` of the Python value.
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            try:
+                return json.loads(value)
+            except ValueError:
+                return value
+    if field.is_relation:
+        return field.target_field.to_python(value)
+    return field.to_python(value)
+
+
+def get_latest_snapshots(records):
+    """
+    Returns the snapshot of the most recent of the given records of each
+    object, by model and object id.
+    """
+    latest_records = {}
+    for record in records:
+        key = (record.content_type_id, record.object_id)
+        latest_record = latest_records.get(key)
+        if latest_record is None or (record.history_date, record.id) > (
+            latest_record.history_date,
+            latest_record.id,
+        ):
+            latest_records[key] = record
+    snapshots = defaultdict(dict)
+    for (content_type_id, object_id), record in latest_records.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        snapshots[model][object_id] = record.data
+    return snapshots
+
+
+def restore_snapshots(snapshots):
+    """
+    Restores the objects to the given snapshots and records the restore as
+    history.
+    :param snapshots: Complete snapshots by model and object id, as returned
+                      by `get_latest_snapshots`.
+    :return: The restored instances.
+    :rtype list
+    """
+    restored = []
+    for model, model_snapshots in snapshots.items():
+        with transaction.atomic(using=router.db_for_write(model)):
+            restore_model_snapshots = ModelSnapshotsRestorer(model, model_snapshots)
+            restored += restore_model_snapshots()
+    return restored
+
+
+class ModelSnapshotsRestorer:
+    def __init__(self, model, snapshots):
+        self.model = model
+        self.snapshots = snapshots
+        self.using = router.db_for_write(model)
+        self.pks = {
+            object_id: model._meta.pk.to_python(object_id) for object_id in snapshots
+        }
+
+    def __call__(self):
+        # Imported here since the history logging module depends on the
+        # historical record model, which uses this module.
+        from .history_logging import BulkHistoricalRecordGenerator, HistoricalRecord
+
+        existing = from_writable_db(self.model._base_manager).in_bulk(
+            list(self.pks.values()),
+        )
+        fields = self.get_restored_fields()
+        updated, created = [], []
+        for object_id, data in self.snapshots.items():
+            pk = self.pks[object_id]
+            instance = existing.get(pk)
+            if instance is None:
+                instance = self.model(pk=pk)
+                created.append(instance)
+            else:
+                updated.append(instance)
+            for field in fields:
+                if field.name in data:
+                    value = get_value_from_snapshot(field, data[field.name])
+                    setattr(instance, field.attname, value)
+        if updated and fields:
+            self.model._base_manager.using(self.using).bulk_update(
+                updated,
+                [field.name for field in fields],
+            )
+        created_in_bulk = self.create(created)
+        changed_targets = self.restore_many_to_many_fields()
+        if hasattr(self.model._meta, "history_logging"):
+            # The history of the restored objects is propagated to the objects
+            # added to or removed from their many-to-many relations.
+            for instances, history_type in (
+                (updated, HistoricalRecord.UPDATE),
+                (created_in_bulk, HistoricalRecord.CREATE),
+            ):
+                generate_history = BulkHistoricalRecordGenerator(
+                    instances,
+                    history_type,
+                )
+                generate_history()
+        else:
+            # As m2m_changed would for a change made through the model's
+            # managers, the tracked objects added to or removed from the
+            # restored relations get their history.
+            for target_model, target_pks in changed_targets.items():
+                if not target_pks or not hasattr(target_model._meta, "history_logging"):
+                    continue
+                generate_history = BulkHistoricalRecordGenerator(
+                    list(
+                        target_model._base_manager.using(self.using).filter(
+                            pk__in=target_pks,
+                        ),
+                    ),
+                    HistoricalRecord.UPDATE,
+                    False,
+                )
+                generate_history()
+        return updated + created
+
+    def get_restored_fields(self):
+        return [
+            field for field in self.model._meta.concrete_fields if not field.primary_key
+        ]
+
+    def create(self, instances):
+        """
+        Creates the instances and returns the ones whose history is still to
+        be generated.
+        """
+        if not instances:
+            return []
+        if self.model._meta.parents:
+            # bulk_create does not support multi-table inheritance. The history
+            # of these instances is generated by the save.
+            for instance in instances:
+                instance.save(force_insert=True, using=self.using)
+            return []
+        self.model._base_manager.using(self.using).bulk_create(instances)
+        return instances
+
+    def restore_many_to_many_fields(self):
+        """
+        Restores the many-to-many relations and returns the primary keys of
+        the objects added to or removed from them, by model.
+        """
+        changed_targets = defaultdict(set)
+        for field in self.model._meta.get_fields():
+            if not field.many_to_many:
+                continue
+            through = getattr(field, "through", None) or field.remote_field.through
+            if not through._meta.auto_created:
+                continue
+            changed_targets[field.related_model] |= self.restore_many_to_many_field(
+                field,
+                through,
+            )
+        return changed_targets
+
+    def restore_many_to_many_field(self, field, through):
+        if field.concrete:
+            source_name = field.m2m_field_name()
+            target_name = field.m2m_reverse_field_name()
+        else:
+            source_name = field.remote_field.m2m_reverse_field_name()
+            target_name = field.remote_field.m2m_field_name()
+        source_attname = through._meta.get_field(source_name).attname
+        target_attname = through._meta.get_field(target_name).attname
+        target_model = field.related_model
+        restored_targets = {
+            self.pks[object_id]: {
+                target_model._meta.pk.to_python(pk)
+                for pk in split_ids(data[field.name])
+            }
+            for object_id, data in self.snapshots.items()
+            if field.name in data
+        }
+        if not restored_targets:
+            return set()
+        # Objects referenced by the snapshots may have been deleted since.
+        all_targets = set().union(*restored_targets.values())
+        existing_targets = set(
+            target_model._base_manager.using(self.using)
+            .filter(pk__in=all_targets)
+            .values_list("pk", flat=True)
+        )
+        through_manager = through._base_manager.using(self.using)
+        current_rows = through_manager.filter(
+            **{"{}__in".format(source_attname): list(restored_targets)}
+        ).values_list("pk", source_attname, target_attname)
+        rows_to_delete = []
+        current_targets = defaultdict(set)
+        changed_targets = set()
+        for row_pk, source_pk, target_pk in current_rows:
+            if target_pk in restored_targets[source_pk]:
+                current_targets[source_pk].add(target_pk)
+            else:
+                rows_to_delete.append(row_pk)
+                changed_targets.add(target_pk)
+        rows_to_create = [
+            (source_pk, target_pk)
+            for source_pk, target_pks in restored_targets.items()
+            for target_pk in target_pks & existing_targets
+            if target_pk not in current_targets[source_pk]
+        ]
+        changed_targets.update(target_pk for _, target_pk in rows_to_create)
+        through_manager.filter(pk__in=rows_to_delete).delete()
+        through_manager.bulk_create(
+            [
+                through(**{source_attname: source_pk, target_attname: target_pk})
+                for source_pk, target_pk in rows_to_create
+            ],
+        )
+        return changed_targets
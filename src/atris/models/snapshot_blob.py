@@ -0,0 +1,148 @@
+import hashlib
+
+from django.apps import apps
+from django.db import connections, models, router, transaction
+
+
+BLOB_KEY = "blob"
+
+
+class SnapshotBlob(models.Model):
+    """
+    Large snapshot values, stored once and referenced from the snapshots by the
+    SHA-256 hash of the value. See the `blob_threshold` parameter of
+    `HistoryLogging`.
+    """
+
+    hash = models.CharField(max_length=64, primary_key=True)
+    value = models.TextField()
+
+    class Meta:
+        app_label = "atris"
+
+    def __str__(self):
+        return self.hash
+
+
+def get_blob_hash(value):
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def is_blob_reference(value):
+    return isinstance(value, dict) and list(value.keys()) == [BLOB_KEY]
+
+
+def extract_blobs(data, threshold, excluded_keys=()):
+    """
+    Replaces the string values of `data` longer than `threshold` with
+    references to blobs.
+    :param excluded_keys: Keys whose values are never replaced.
+    :return: The data holding the references and the extracted values by hash.
+    :rtype tuple(dict, dict)
+    """
+    if threshold is None:
+        return data, {}
+    result = dict(data)
+    blobs = {}
+    for key, value in data.items():
+        if key in excluded_keys:
+            continue
+        if isinstance(value, str) and len(value) > threshold:
+            blob_hash = get_blob_hash(value)
+            blobs[blob_hash] = value
+            result[key] = {BLOB_KEY: blob_hash}
+    return result, blobs
+
+
+def save_blobs(blobs):
+    """
+    Stores the values by hash returned by `extract_blobs`, skipping the ones
+    that are already stored.
+    """
+    if blobs:
+        SnapshotBlob.objects.bulk_create(
+            [SnapshotBlob(hash=h, value=value) for h, value in blobs.items()],
+            ignore_conflicts=True,
+        )
+
+
+def resolve_blob_references(snapshots, known_values=None):
+    """
+    Replaces, in place, the blob references in the given snapshots with the
+    values they reference, fetching all of them in one query.
+    :param snapshots: Iterable of snapshot dicts.
+    :param known_values: Optional dict of values by hash which are already
+                         known and do not need to be fetched.
+    """
+    snapshots = [snapshot for snapshot in snapshots if snapshot]
+    known_values = dict(known_values or {})
+    missing = {
+        value[BLOB_KEY]
+        for snapshot in snapshots
+        for value in snapshot.values()
+        if is_blob_reference(value) and value[BLOB_KEY] not in known_values
+    }
+    if missing:
+        blobs = SnapshotBlob.objects.in_bulk(list(missing))
+        known_values.update({h: blob.value for h, blob in blobs.items()})
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            if is_blob_reference(value) and value[BLOB_KEY] in known_values:
+                snapshot[key] = known_values[value[BLOB_KEY]]
+
+
+# The hashes referenced by the snapshots and by the changes (pairs of old
+# and new values) of the records of one table.
+REFERENCED_HASHES_SQL = """
+SELECT value->>'blob' FROM {table}, jsonb_each({table}.data)
+WHERE jsonb_typeof(value) = 'object' AND value ? 'blob'
+UNION
+SELECT change->>'blob'
+FROM {table}, jsonb_each({table}.history_changes) AS changes(name, pair),
+    jsonb_array_elements(pair) AS change
+WHERE jsonb_typeof(change) = 'object' AND change ? 'blob'
+"""
+
+
+def is_blob_storage_used():
+    """
+    Returns whether any model stores its large values as blobs.
+    """
+    return any(
+        getattr(model._meta, "history_logging", None) is not None
+        and model._meta.history_logging.blob_threshold is not None
+        for model in apps.get_models()
+    )
+
+
+def delete_unreferenced_blobs(history_models):
+    """
+    Deletes the blobs which the records of the given history models no longer
+    reference, e.g. after old history was deleted. The blob table is locked
+    until they are deleted, so that no record referencing them can be written
+    meanwhile.
+    :param history_models: All the models whose records reference blobs. See
+                           `get_history_models`.
+    :return: The number of blobs deleted.
+    :rtype int
+    """
+    using = router.db_for_write(SnapshotBlob)
+    connection = connections[using]
+    blob_table = connection.ops.quote_name(SnapshotBlob._meta.db_table)
+    referenced_hashes = " UNION ".join(
+        REFERENCED_HASHES_SQL.format(
+            table=connection.ops.quote_name(model._meta.db_table),
+        )
+        for model in history_models
+    )
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(
+            "LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE".format(blob_table),
+        )
+        cursor.execute(
+            "WITH referenced(hash) AS ({}) "
+            "DELETE FROM {blob_table} WHERE NOT EXISTS ("
+            "SELECT 1 FROM referenced WHERE referenced.hash = {blob_table}.hash"
+            ")".format(referenced_hashes, blob_table=blob_table),
+        )
+        return cursor.rowcount
@@ -0,0 +1,130 @@
+"""
+Encoding and reconstruction of snapshots stored as deltas.
+
+A historical record whose `delta_depth` is 0 is a keyframe: its `data` holds
+the complete snapshot. A record with a `delta_depth` of N is the N-th record
+after the object's latest keyframe and holds only the changes relative to the
+record before it: just the values that changed when the model uses
+`delta_snapshots` and, for the to-many relations listed in
+`delta_related_fields`, the ids added and removed.
+"""
+ADDED_KEY = "added"
+REMOVED_KEY = "removed"
+
+
+def split_ids(value):
+    """
+    Splits a to-many relation value (as stored in a snapshot) into a list of
+    ids.
+    """
+    return [pk for pk in (value or "").split(", ") if pk != ""]
+
+
+def join_ids(ids):
+    """
+    Converts a list of ids into the value stored in a snapshot for a to-many
+    relation, sorted by primary key as `get_instance_field_data` does.
+    """
+    if all(pk.lstrip("-").isdigit() for pk in ids):
+        ids = sorted(ids, key=int)
+    else:
+        ids = sorted(ids)
+    return ", ".join(ids)
+
+
+def is_related_delta(value):
+    return isinstance(value, dict) and ADDED_KEY in value and REMOVED_KEY in value
+
+
+def get_related_delta(previous_value, value):
+    """
+    Returns the ids added and removed between two values of a to-many
+    relation.
+    """
+    previous_ids = split_ids(previous_value)
+    ids = split_ids(value)
+    previous_id_set = set(previous_ids)
+    id_set = set(ids)
+    return {
+        ADDED_KEY: [pk for pk in ids if pk not in previous_id_set],
+        REMOVED_KEY: [pk for pk in previous_ids if pk not in id_set],
+    }
+
+
+def apply_related_delta(previous_value, delta):
+    """
+    Returns the value of a to-many relation after applying the delta stored
+    by `get_related_delta` to its previous value.
+    """
+    removed = set(delta[REMOVED_KEY])
+    ids = [pk for pk in split_ids(previous_value) if pk not in removed]
+    present = set(ids)
+    ids += [pk for pk in delta[ADDED_KEY] if pk not in present]
+    return join_ids(ids)
+
+
+def compose_related_deltas(delta, next_delta):
+    """
+    Returns the delta equivalent to applying `delta` and then `next_delta`.
+    """
+    added, removed = delta[ADDED_KEY], delta[REMOVED_KEY]
+    next_added, next_removed = next_delta[ADDED_KEY], next_delta[REMOVED_KEY]
+    return {
+        ADDED_KEY: [pk for pk in added if pk not in next_removed]
+        + [pk for pk in next_added if pk not in removed],
+        REMOVED_KEY: [pk for pk in removed if pk not in next_added]
+        + [pk for pk in next_removed if pk not in added],
+    }
+
+
+def encode_related_deltas(data, previous_data, field_names):
+    """
+    Returns a copy of `data` in which the values of `field_names` are replaced
+    by their delta to `previous_data`.
+    """
+    encoded = dict(data)
+    for field_name in field_names:
+        if field_name in data:
+            encoded[field_name] = get_related_delta(
+                previous_data.get(field_name),
+                data[field_name],
+            )
+    return encoded
+
+
+def get_keyframe_index(chain):
+    """
+    Returns the position of the keyframe in a chain of historical records
+    ordered from newest to oldest, or None if the chain does not reach one.
+    """
+    for index, record in enumerate(chain):
+        if record.delta_depth == 0:
+            return index
+    return None
+
+
+def reconstruct_data(chain):
+    """
+    Rebuilds the complete snapshot of the newest record in `chain`, a list of
+    historical records of the same object ordered from newest to oldest.
+
+    :return: The snapshot or None if the chain does not reach a keyframe,
+             which happens when older history was archived or deleted.
+    """
+    keyframe_index = get_keyframe_index(chain)
+    if keyframe_index is None:
+        return None
+    data = dict(chain[keyframe_index].data)
+    for record in reversed(chain[:keyframe_index]):
+        data = apply_delta(data, record.data)
+    return data
+
+
+def apply_delta(data, delta_data):
+    result = dict(data)
+    for key, value in delta_data.items():
+        if is_related_delta(value):
+            result[key] = apply_related_delta(result.get(key), value)
+        else:
+            result[key] = value
+    return result
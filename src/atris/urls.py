@@ -0,0 +1,10 @@
+from django.urls import path
+
+from atris import views
+
+
+app_name = "atris"
+
+urlpatterns = [
+    path("feed/", views.history_feed, name="history_feed"),
+]
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_permission_codename
+from django.contrib.auth.decorators import user_passes_test
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from atris.models import get_export_row, get_history_model
+
+
+FEED_PAGE_SIZE = 100
+FEED_MAX_PAGE_SIZE = 1000
+
+
+def can_view_history(user):
+    opts = get_history_model()._meta
+    codename = get_permission_codename("view", opts)
+    if user.has_perm("{}.{}".format(opts.app_label, codename)):
+        return True
+    raise PermissionDenied
+
+
+@require_GET
+@user_passes_test(can_view_history)
+def history_feed(request):
+    """
+    Serves the change feed (see `HistoricalRecordQuerySet.since`) as JSON:
+    the records after the `cursor` query parameter, at most `limit` of them,
+    and the cursor to request the next ones with. The cursor is returned
+    unchanged when there are no new records.
+    """
+    cursor = request.GET.get("cursor") or None
+    try:
+        limit = min(int(request.GET.get("limit", FEED_PAGE_SIZE)), FEED_MAX_PAGE_SIZE)
+        records = list(
+            get_history_model()
+            .objects.select_related("content_type")
+            .since(cursor, max(limit, 1)),
+        )
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    results = [
+        {**get_export_row(record), "cursor": record.feed_cursor} for record in records
+    ]
+    return JsonResponse(
+        {
+            "results": results,
+            "cursor": records[-1].feed_cursor if records else cursor,
+        },
+    )
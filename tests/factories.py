@@ -11,6 +11,8 @@ from atris.models.helpers import get_field_internal_type
 from tests.models import (
     Actor,
     Admin,
+    Article,
+    Board,
     Choice,
     Episode,
     Episode2,
@@ -47,6 +49,7 @@ class AbstractFactory:
         "AutoField": lambda: random_integer(),
         "DateTimeField": lambda: now(),
         "CharField": lambda: random_string(),
+        "TextField": lambda: random_string(),
         "IntegerField": lambda: random_integer(),
         "UUIDField": lambda: uuid.uuid4(),
         "PositiveIntegerField": lambda: random_integer(),
@@ -111,10 +114,13 @@ class HistoricalRecordFactory(AbstractFactory):
         "content_type": lambda: random.choice(
             [ct for ct in ContentType.objects.all()],
         ),
+        "delta_depth": lambda: 0,
     }
 
     FIELDS_NOT_SPECIFIED_BY_DEFAULT = [
         "history_date",
+        # Set by the database.
+        "transaction_id",
     ]
 
 
@@ -130,6 +136,14 @@ class AdminFactory(AbstractFactory):
     MODEL = Admin
 
 
+class ArticleFactory(AbstractFactory):
+    MODEL = Article
+
+
+class BoardFactory(AbstractFactory):
+    MODEL = Board
+
+
 class ChoiceFactory(AbstractFactory):
     MODEL = Choice
 
@@ -69,6 +69,29 @@ class Group(models.Model):
     history = HistoryLogging()
 
 
+class Board(models.Model):
+    name = models.CharField(max_length=200)
+    members = models.ManyToManyField(Admin, related_name="boards")
+
+    delta_related_fields = ["members"]
+    history = HistoryLogging(
+        delta_related_fields="delta_related_fields",
+        keyframe_interval=3,
+    )
+
+
+class Article(models.Model):
+    title = models.CharField(max_length=200)
+    body = models.TextField()
+    views = models.IntegerField(default=0)
+
+    history = HistoryLogging(
+        delta_snapshots=True,
+        keyframe_interval=3,
+        blob_threshold=100,
+    )
+
+
 class Voter(models.Model):
     id = models.UUIDField(
         verbose_name="ID",
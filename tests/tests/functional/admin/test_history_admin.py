@@ -0,0 +1,201 @@
+from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from pytest import mark
+
+from atris.admin import get_table_row_estimate
+from atris.models import HistoricalRecord
+from tests.factories import HistoricalRecordFactory, PollFactory, ShowFactory
+from tests.models import Poll
+
+
+CHANGELIST_URL = reverse("admin:atris_historicalrecord_changelist")
+
+
+def get_changelist(client, **params):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(CHANGELIST_URL, params)
+    assert response.status_code == 200
+    return response, context.captured_queries
+
+
+@mark.django_db
+def test_changelist_queries_do_not_grow_with_records_shown(admin_client):
+    # arrange
+    PollFactory.create()
+    ShowFactory.create()
+    get_changelist(admin_client)
+    _, few_records_queries = get_changelist(admin_client)
+    PollFactory.create_batch(size=10)
+    ShowFactory.create_batch(size=10)
+    # act
+    response, many_records_queries = get_changelist(admin_client)
+    # assert
+    assert len(response.context["cl"].result_list) == 22
+    assert len(many_records_queries) == len(few_records_queries)
+
+
+@mark.django_db
+def test_changelist_does_not_load_snapshots(admin_client):
+    # arrange
+    PollFactory.create()
+    table = HistoricalRecord._meta.db_table
+    # act
+    _, queries = get_changelist(admin_client)
+    # assert
+    list_query = next(
+        query["sql"]
+        for query in queries
+        if query["sql"].startswith('SELECT "{}"."id"'.format(table))
+    )
+    assert '"{}"."data"'.format(table) not in list_query
+    assert '"{}"."additional_data"'.format(table) not in list_query
+    assert '"django_content_type"."model"' in list_query
+
+
+@mark.django_db
+def test_change_page_shows_snapshot(admin_client):
+    # arrange
+    poll = PollFactory.create(question="Dinner or lunch")
+    record = poll.history.get()
+    url = reverse("admin:atris_historicalrecord_change", args=[record.pk])
+    # act
+    response = admin_client.get(url)
+    # assert
+    assert response.status_code == 200
+    assert "Dinner or lunch" in response.content.decode()
+
+
+@mark.django_db
+def test_changelist_does_not_count_filtered_records(admin_client):
+    # arrange
+    PollFactory.create_batch(size=3)
+    ShowFactory.create()
+    content_type = ContentType.objects.get_for_model(Poll)
+    # act
+    response, queries = get_changelist(
+        admin_client,
+        content_type=content_type.id,
+        history_type__exact="+",
+    )
+    # assert
+    assert {record.content_type for record in response.context["cl"].result_list} == {
+        content_type,
+    }
+    assert len(response.context["cl"].result_list) == 3
+    assert not [query for query in queries if "COUNT(" in query["sql"].upper()]
+
+
+@mark.django_db
+def test_changelist_navigates_with_keysets(admin_client, monkeypatch):
+    # arrange
+    monkeypatch.setattr(admin.site._registry[HistoricalRecord], "list_per_page", 2)
+    PollFactory.create_batch(size=5)
+    ordered_ids = list(
+        HistoricalRecord.objects.order_by("-history_date", "-id").values_list(
+            "id",
+            flat=True,
+        ),
+    )
+    pages = []
+    # act
+    response, _ = get_changelist(admin_client)
+    while True:
+        cl = response.context["cl"]
+        pages.append([record.id for record in cl.result_list])
+        if cl.next_page_url is None:
+            break
+        response = admin_client.get(CHANGELIST_URL + cl.next_page_url)
+    previous_response = admin_client.get(CHANGELIST_URL + cl.previous_page_url)
+    # assert
+    assert pages == [ordered_ids[0:2], ordered_ids[2:4], ordered_ids[4:5]]
+    previous_cl = previous_response.context["cl"]
+    assert [record.id for record in previous_cl.result_list] == ordered_ids[2:4]
+    assert previous_cl.previous_page_url is not None
+    assert previous_cl.next_page_url is not None
+
+
+@mark.django_db
+def test_changelist_rejects_unknown_keyset(admin_client):
+    # act
+    response = admin_client.get(CHANGELIST_URL, {"after": "not-an-id"})
+    # assert
+    assert response.status_code == 302
+    assert response.url.endswith("?e=1")
+
+
+@mark.django_db
+def test_search_matches_exact_object_id(admin_client):
+    # arrange
+    polls = PollFactory.create_batch(size=12)
+    poll = polls[0]
+    # act
+    response, queries = get_changelist(admin_client, q=str(poll.pk))
+    # assert
+    result_list = response.context["cl"].result_list
+    assert [record.object_id for record in result_list] == [str(poll.pk)]
+    assert not [query for query in queries if "UPPER(" in query["sql"]]
+
+
+@mark.django_db
+def test_search_matches_object_id_prefix(admin_client):
+    # arrange
+    polls = PollFactory.create_batch(size=12)
+    prefix = str(polls[0].pk)[:-1]
+    expected = {str(poll.pk) for poll in polls if str(poll.pk).startswith(prefix)}
+    # act
+    response, _ = get_changelist(admin_client, q=prefix + "*")
+    # assert
+    result_list = response.context["cl"].result_list
+    assert {record.object_id for record in result_list} == expected
+
+
+@mark.django_db
+def test_change_page_shows_changed_values(admin_client):
+    # arrange
+    poll = PollFactory.create(question="Dinner or lunch")
+    poll.question = "Breakfast or brunch"
+    poll.save()
+    record = poll.history.first()
+    url = reverse("admin:atris_historicalrecord_change", args=[record.pk])
+    # act
+    response = admin_client.get(url)
+    # assert
+    content = response.content.decode()
+    assert "<td>Dinner or lunch</td><td>Breakfast or brunch</td>" in content
+
+
+@mark.django_db
+def test_table_row_estimate_read_from_statistics():
+    # arrange
+    PollFactory.create_batch(size=3)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE atris_historicalrecord")
+    # act
+    estimate = get_table_row_estimate("default", HistoricalRecord._meta.db_table)
+    # assert
+    assert estimate == HistoricalRecord.objects.count()
+
+
+@mark.django_db
+def test_change_page_queries_do_not_grow_with_caused_records(admin_client):
+    # arrange
+    root = PollFactory.create().history.get()
+    url = reverse("admin:atris_historicalrecord_change", args=[root.pk])
+
+    def get_change_page_queries():
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.get(url)
+        assert response.status_code == 200
+        return context.captured_queries
+
+    HistoricalRecordFactory.create(related_field_history=root)
+    get_change_page_queries()
+    few_records_queries = get_change_page_queries()
+    HistoricalRecordFactory.create_batch(size=5, related_field_history=root)
+    # act
+    many_records_queries = get_change_page_queries()
+    # assert
+    assert len(many_records_queries) == len(few_records_queries)
@@ -0,0 +1,139 @@
+import csv
+import gzip
+import json
+
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core import management
+from django.core.management import CommandError
+from django.utils.timezone import now
+from pytest import mark, raises
+
+from atris.models import export_history
+from tests.factories import ArticleFactory, ChoiceFactory, PollFactory
+from tests.models import Article
+
+
+def export(**options):
+    out, err = StringIO(), StringIO()
+    management.call_command("export_history", stdout=out, stderr=err, **options)
+    return out.getvalue(), err.getvalue()
+
+
+@mark.django_db
+def test_export_writes_json_lines_oldest_first():
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    poll.question = "What's for dinner?"
+    poll.save()
+    # act
+    out, err = export(model="tests.Poll")
+    # assert
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert [row["history_type"] for row in rows] == ["+", "~"]
+    assert [row["data"]["question"] for row in rows] == [
+        "Draft",
+        "What's for dinner?",
+    ]
+    assert rows[0]["content_type"] == "tests.poll"
+    assert rows[0]["object_id"] == str(poll.pk)
+    assert "Exported 2 records" in err
+    assert "records/s" in err
+
+
+@mark.django_db
+def test_export_filters_by_object_and_user():
+    # arrange
+    poll = PollFactory.create()
+    other_poll = PollFactory.create()
+    ChoiceFactory.create(poll=poll)
+    poll.history.update(history_user="auditor")
+    other_poll.history.update(history_user="auditor")
+    # act
+    out, _ = export(model="tests.Poll", object_ids=[poll.pk], user="auditor")
+    # assert
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert [row["object_id"] for row in rows] == [str(poll.pk)]
+
+
+@mark.django_db
+def test_export_filters_by_date_range():
+    # arrange
+    old_poll, poll = PollFactory.create_batch(size=2)
+    old_poll.history.update(history_date=datetime(2020, 1, 1, tzinfo=timezone.utc))
+    # act
+    out, _ = export(since="2021-01-01", until=(now() + timedelta(days=1)).isoformat())
+    # assert
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert [row["object_id"] for row in rows] == [str(poll.pk)]
+
+
+@mark.django_db
+def test_export_writes_gzipped_csv(tmp_path):
+    # arrange
+    PollFactory.create_batch(size=3)
+    path = tmp_path / "history.csv.gz"
+    # act
+    export(model="tests.Poll", export_format="csv", output=str(path))
+    # assert
+    with gzip.open(path, "rt", newline="") as exported:
+        rows = list(csv.DictReader(exported))
+    assert len(rows) == 3
+    assert json.loads(rows[0]["data"])["question"]
+
+
+@mark.django_db
+def test_export_materializes_snapshots():
+    # arrange
+    article = ArticleFactory.create(title="Draft")
+    article.views = 10
+    article.save()
+    # act
+    out, _ = export(model="tests.Article", materialize=True)
+    # assert
+    updated = json.loads(out.splitlines()[-1])
+    assert updated["delta_depth"] == 1
+    assert updated["data"]["title"] == "Draft"
+
+
+@mark.django_db
+@mark.parametrize("materialize", [False, True])
+def test_export_writes_values_stored_as_blobs(mocker, materialize):
+    # arrange
+    mocker.patch.object(Article._meta.history_logging, "store_changes", True)
+    first_body, second_body = "First " * 50, "Second " * 50
+    article = ArticleFactory.create(body=first_body)
+    article.body = second_body
+    article.save()
+    # act
+    out, _ = export(model="tests.Article", materialize=materialize, chunk_size=1)
+    # assert
+    created, updated = [json.loads(line) for line in out.splitlines()]
+    assert created["data"]["body"] == first_body
+    assert updated["data"]["body"] == second_body
+    assert updated["history_changes"]["body"] == [first_body, second_body]
+
+
+@mark.django_db
+def test_export_reports_progress_every_chunk():
+    # arrange
+    PollFactory.create_batch(size=5)
+    stream = StringIO()
+    progress = []
+    # act
+    count = export_history(
+        stream,
+        chunk_size=2,
+        progress=lambda exported, elapsed: progress.append(exported),
+    )
+    # assert
+    assert count == 5
+    assert progress == [2, 4]
+    assert len(stream.getvalue().splitlines()) == 5
+
+
+def test_export_rejects_unknown_model():
+    # act & assert
+    with raises(CommandError):
+        export(model="tests.Unknown")
@@ -7,8 +7,8 @@ from django.core import management
 from django.utils.timezone import now
 from pytest import mark
 
-from atris.models import ArchivedHistoricalRecord
-from tests.factories import PollFactory
+from atris.models import ArchivedHistoricalRecord, HistoricalRecord
+from tests.factories import ArticleFactory, PollFactory
 from tests.models import Poll
 
 
@@ -67,6 +67,27 @@ class TestArchiveCommand:
         assert "Both days and weeks parameters were supplied" in caplog.text
         assert ArchivedHistoricalRecord.objects.count() == 0
 
+    def test_records_needed_by_newer_snapshots_kept(self):
+        # arrange
+        out = StringIO()
+        article = ArticleFactory.create(views=0)
+        for views in range(1, 5):
+            article.views = views
+            article.save()
+        *old_records, newer_record = article.history.order_by("history_date", "id")
+        article.history.filter(pk__in=[r.pk for r in old_records]).update(
+            history_date=now() - timedelta(days=30),
+        )
+        # act
+        management.call_command("archive_old_historical_records", days=20, stdout=out)
+        # assert
+        assert "3 archived." in out.getvalue()
+        archived_records = ArchivedHistoricalRecord.objects.order_by("id")
+        assert [r.pk for r in archived_records] == [r.pk for r in old_records[:3]]
+        assert [r.delta_depth for r in article.history.order_by("id")] == [0, 1]
+        newer_record = article.history.get(pk=newer_record.pk)
+        assert HistoricalRecord.objects.snapshot_at(newer_record)["views"] == "4"
+
     def test_no_params_passed_signals_error(self):
         # arrange
         out = StringIO()
@@ -7,8 +7,9 @@ from django.core import management
 from django.utils.timezone import now
 from pytest import mark
 
-from tests.factories import ArchivedHistoricalRecordFactory, PollFactory
-from tests.models import Poll
+from atris.models import HistoricalRecord, SnapshotBlob, get_blob_hash
+from tests.factories import ArchivedHistoricalRecordFactory, ArticleFactory, PollFactory
+from tests.models import Article, Poll
 
 
 @mark.django_db
@@ -87,6 +88,84 @@ class TestDeleteCommand:
             "will be used as the delimiter." in caplog.text
         )
 
+    def test_records_needed_by_newer_snapshots_kept(self):
+        # arrange
+        out = StringIO()
+        article = ArticleFactory.create(views=0)
+        for views in range(1, 5):
+            article.views = views
+            article.save()
+        *old_records, newer_record = article.history.order_by("history_date", "id")
+        article.history.filter(pk__in=[r.pk for r in old_records]).update(
+            history_date=now() - timedelta(days=30),
+        )
+        # act
+        management.call_command("delete_old_historical_records", days=20, stdout=out)
+        # assert
+        assert "3 HistoricalRecord deleted." in out.getvalue()
+        assert [r.delta_depth for r in article.history.order_by("id")] == [0, 1]
+        newer_record = article.history.get(pk=newer_record.pk)
+        assert HistoricalRecord.objects.snapshot_at(newer_record)["views"] == "4"
+
+    def test_unreferenced_blobs_deleted(self):
+        # arrange
+        out = StringIO()
+        old_article = ArticleFactory.create(body="Old " * 50)
+        old_article.history.update(history_date=now() - timedelta(days=30))
+        article = ArticleFactory.create(body="Kept " * 50)
+        archived_blob = SnapshotBlob.objects.create(
+            hash=get_blob_hash("Archived"),
+            value="Archived",
+        )
+        ArchivedHistoricalRecordFactory.create(
+            data={"body": {"blob": archived_blob.hash}},
+        )
+        # act
+        management.call_command(
+            "delete_old_historical_records",
+            "--delete-unreferenced-blobs",
+            days=20,
+            stdout=out,
+        )
+        # assert
+        assert "1 unreferenced SnapshotBlob deleted." in out.getvalue()
+        assert set(SnapshotBlob.objects.values_list("hash", flat=True)) == {
+            get_blob_hash(article.body),
+            archived_blob.hash,
+        }
+
+    def test_unreferenced_blobs_kept_by_default(self):
+        # arrange
+        out = StringIO()
+        old_article = ArticleFactory.create(body="Old " * 50)
+        old_article.history.update(history_date=now() - timedelta(days=30))
+        # act
+        management.call_command("delete_old_historical_records", days=20, stdout=out)
+        # assert
+        assert "SnapshotBlob" not in out.getvalue()
+        assert SnapshotBlob.objects.filter(
+            hash=get_blob_hash(old_article.body),
+        ).exists()
+
+    def test_unreferenced_blobs_not_scanned_without_blob_storage(self, mocker):
+        # arrange
+        out = StringIO()
+        mocker.patch.object(Article._meta.history_logging, "blob_threshold", None)
+        scan = mocker.patch(
+            "atris.management.commands.delete_old_historical_records"
+            ".delete_unreferenced_blobs",
+        )
+        # act
+        management.call_command(
+            "delete_old_historical_records",
+            "--delete-unreferenced-blobs",
+            days=20,
+            stdout=out,
+        )
+        # assert
+        assert "No model stores large values as blobs." in out.getvalue()
+        scan.assert_not_called()
+
     @mark.parametrize(
         "delete_command_args",
         [
@@ -0,0 +1,57 @@
+from io import StringIO
+
+from django.core import management
+from django.db import connection
+from pytest import mark
+
+from atris.models import ArchivedHistoricalRecord, HistoricalRecord
+from tests.factories import PollFactory
+from tests.models import Poll
+
+
+JSON_PATH_INDEXES = [
+    "atris_hr_data_path_gin",
+    "atris_hr_additional_path_gin",
+    "atris_ahr_data_path_gin",
+    "atris_ahr_additional_path_gin",
+]
+
+
+def get_index_names():
+    with connection.cursor() as cursor:
+        return {
+            name
+            for model in (HistoricalRecord, ArchivedHistoricalRecord)
+            for name in connection.introspection.get_constraints(
+                cursor,
+                model._meta.db_table,
+            )
+        }
+
+
+def create_indexes(*args):
+    out = StringIO()
+    management.call_command("create_json_path_indexes", *args, stdout=out)
+    return out.getvalue()
+
+
+@mark.django_db(transaction=True)
+def test_json_path_indexes_created_on_demand():
+    # arrange
+    poll = PollFactory.create(question="What's for dinner?")
+    assert not get_index_names() & set(JSON_PATH_INDEXES)
+    # act
+    out = create_indexes()
+    # assert
+    try:
+        assert set(JSON_PATH_INDEXES) <= get_index_names()
+        assert out.count("Created") == 4
+        assert "Created" not in create_indexes()
+        history = HistoricalRecord.objects.by_model(Poll)
+        assert list(history.where_data(question="What's for dinner?")) == [
+            poll.history.get(),
+        ]
+    finally:
+        out = create_indexes("--drop")
+    assert out.count("Dropped") == 4
+    assert not get_index_names() & set(JSON_PATH_INDEXES)
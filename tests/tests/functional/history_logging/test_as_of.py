@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from pytest import mark
+
+from atris.models import HistoricalRecord
+from tests.factories import ArticleFactory, PollFactory
+from tests.models import Article, Poll
+
+
+def move_history_back(instance, delta):
+    instance.history.filter(history_date__gt=now() - delta).update(
+        history_date=now() - delta,
+    )
+
+
+@mark.django_db
+def test_latest_state_at_point_in_time_returned_per_object():
+    # arrange
+    poll1 = PollFactory.create(question="Poll 1")
+    poll2 = PollFactory.create(question="Poll 2")
+    move_history_back(poll1, timedelta(days=2))
+    move_history_back(poll2, timedelta(days=2))
+    poll1.question = "Poll 1, edited"
+    poll1.save()
+    move_history_back(poll1, timedelta(days=1))
+    poll2.question = "Poll 2, edited"
+    poll2.save()
+    # act
+    with CaptureQueriesContext(connection) as queries:
+        two_days_ago = list(
+            HistoricalRecord.objects.as_of(Poll, now() - timedelta(days=2)),
+        )
+    yesterday = HistoricalRecord.objects.as_of(Poll, now() - timedelta(days=1))
+    today = HistoricalRecord.objects.as_of(Poll, now())
+    # assert
+    assert len(queries) == 1
+    assert sorted(record.data["question"] for record in two_days_ago) == [
+        "Poll 1",
+        "Poll 2",
+    ]
+    assert sorted(record.data["question"] for record in yesterday) == [
+        "Poll 1, edited",
+        "Poll 2",
+    ]
+    assert sorted(record.data["question"] for record in today) == [
+        "Poll 1, edited",
+        "Poll 2, edited",
+    ]
+
+
+@mark.django_db
+def test_objects_deleted_before_point_in_time_left_out():
+    # arrange
+    poll1, poll2 = PollFactory.create_batch(size=2)
+    move_history_back(poll1, timedelta(days=1))
+    move_history_back(poll2, timedelta(days=1))
+    poll2_id = poll2.pk
+    poll2.delete()
+    # act
+    yesterday = HistoricalRecord.objects.as_of(Poll, now() - timedelta(hours=1))
+    today = HistoricalRecord.objects.as_of(Poll, now())
+    # assert
+    assert {record.object_id for record in yesterday} == {
+        str(poll1.pk),
+        str(poll2_id),
+    }
+    assert [record.object_id for record in today] == [str(poll1.pk)]
+
+
+@mark.django_db
+def test_point_in_time_state_restricted_to_ids():
+    # arrange
+    poll1, poll2, poll3 = PollFactory.create_batch(size=3)
+    # act
+    result = HistoricalRecord.objects.as_of(Poll, now(), ids=[poll1.pk, poll3.pk])
+    # assert
+    assert {record.object_id for record in result} == {
+        str(poll1.pk),
+        str(poll3.pk),
+    }
+
+
+@mark.django_db
+def test_point_in_time_snapshots_streamed_for_delta_snapshots():
+    # arrange
+    articles = ArticleFactory.create_batch(size=3, title="Draft", views=0)
+    for article in articles:
+        article.views = 1
+        article.save()
+    # act
+    result = list(
+        HistoricalRecord.objects.as_of(Article, now()).iter_materialized(
+            chunk_size=2,
+        ),
+    )
+    # assert
+    assert len(result) == 3
+    for record in result:
+        assert record.delta_depth == 1
+        assert record.data["title"] == "Draft"
+        assert record.data["views"] == "1"
@@ -0,0 +1,103 @@
+from asgiref.sync import async_to_sync
+from pytest import mark
+
+from atris.models import HistoricalRecord, abulk_fake_save, afake_save, history_context
+from tests.factories import AdminFactory, ArticleFactory, BoardFactory
+from tests.models import Poll
+
+
+def run(coroutine_function, *args, **kwargs):
+    return async_to_sync(coroutine_function)(*args, **kwargs)
+
+
+@mark.django_db
+def test_instance_history_iterated_asynchronously(poll):
+    # arrange
+    poll.question = "What's for dinner?"
+    poll.save()
+
+    async def get_history():
+        return [str(record) async for record in poll.ahistory]
+
+    # act
+    result = run(get_history)
+    # assert
+    assert result == [
+        "Update poll id={}".format(poll.pk),
+        "Create poll id={}".format(poll.pk),
+    ]
+
+
+@mark.django_db
+def test_model_history_most_recent_fetched_asynchronously(poll):
+    # act
+    result = run(Poll.ahistory.amost_recent)
+    # assert
+    assert result == Poll.history.most_recent()
+
+
+@mark.django_db
+def test_previous_version_fetched_asynchronously(poll):
+    # arrange
+    poll.question = "What's for dinner?"
+    poll.save()
+    updated, created = poll.history.all()
+    # act
+    result = run(updated.aprevious_version)
+    by_model_and_id = run(
+        HistoricalRecord.objects.all().aprevious_version_by_model_and_id,
+        model=updated.content_type,
+        object_id=updated.object_id,
+        history_id=updated.id,
+    )
+    # assert
+    assert result == created
+    assert by_model_and_id == created
+    assert run(created.aprevious_version) is None
+
+
+@mark.django_db
+def test_snapshots_rebuilt_asynchronously():
+    # arrange
+    admin = AdminFactory.create()
+    board = BoardFactory.create()
+    board.members.add(admin)
+    article = ArticleFactory.create(body="Body", views=0)
+    article.views = 1
+    article.save()
+    # act
+    board_snapshot = run(board.history.asnapshot_at, board.history.first())
+    article_records = run(article.history.amaterialize)
+    # assert
+    assert board_snapshot["members"] == str(admin.pk)
+    assert [record.data["views"] for record in article_records] == ["1", "0"]
+    assert article_records[0].data["body"] == "Body"
+
+
+@mark.django_db
+def test_fake_save_generates_history_asynchronously(poll, admin_user):
+    # arrange
+    Poll.objects.filter(pk=poll.pk).update(question="What's for dinner?")
+    poll.refresh_from_db()
+
+    async def fake_save_as_user():
+        with history_context(user=admin_user):
+            await afake_save(poll)
+
+    # act
+    run(fake_save_as_user)
+    # assert
+    latest = poll.history.first()
+    assert latest.history_type == "~"
+    assert latest.data["question"] == "What's for dinner?"
+    assert latest.history_user_id == admin_user.id
+
+
+@mark.django_db
+def test_bulk_fake_save_generates_history_asynchronously(poll):
+    # arrange
+    Poll.objects.update(question="What's for dinner?")
+    # act
+    run(abulk_fake_save, Poll.objects.all())
+    # assert
+    assert poll.history.first().history_diff == ["question"]
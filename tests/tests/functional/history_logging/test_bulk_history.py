@@ -0,0 +1,134 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from pytest import mark
+
+from atris.models import HistoricalRecord, bulk_fake_save
+from atris.models.helpers import get_instance_field_data, get_instances_field_data
+from tests.factories import (
+    AdminFactory,
+    BoardFactory,
+    GroupFactory,
+    PollFactory,
+    ShowFactory,
+)
+from tests.models import Poll
+
+
+def count_queries(function, *args, **kwargs):
+    with CaptureQueriesContext(connection) as context:
+        function(*args, **kwargs)
+    return len(context.captured_queries)
+
+
+@mark.django_db
+def test_history_for_objects_added_through_untracked_object_uses_fixed_queries():
+    # arrange
+    admin1, admin2 = AdminFactory.create_batch(size=2)
+    few_groups = GroupFactory.create_batch(size=2)
+    many_groups = GroupFactory.create_batch(size=10)
+    # act
+    few_queries = count_queries(admin1.groups.add, *few_groups)
+    many_queries = count_queries(admin2.groups.add, *many_groups)
+    # assert
+    assert few_queries == many_queries
+    for group in many_groups:
+        group_updated = group.history.first()
+        assert group_updated.history_type == "~"
+        assert group_updated.history_diff == ["admins"]
+        assert group_updated.data["admins"] == str(admin2.pk)
+
+
+@mark.django_db
+def test_history_for_objects_cleared_through_untracked_object_uses_fixed_queries():
+    # arrange
+    admin1, admin2 = AdminFactory.create_batch(size=2)
+    admin1.groups.set(GroupFactory.create_batch(size=2))
+    many_groups = GroupFactory.create_batch(size=10)
+    admin2.groups.set(many_groups)
+    # act
+    few_queries = count_queries(admin1.groups.clear)
+    many_queries = count_queries(admin2.groups.clear)
+    # assert
+    assert few_queries == many_queries
+    for group in many_groups:
+        assert group.history.first().data["admins"] == ""
+
+
+@mark.django_db
+def test_batched_history_stores_deltas_of_related_fields():
+    # arrange
+    admin1, admin2 = AdminFactory.create_batch(size=2)
+    boards = BoardFactory.create_batch(size=3)
+    # act
+    admin1.boards.add(*boards)
+    admin2.boards.add(*boards)
+    admin1.boards.remove(*boards)
+    # assert
+    for board in boards:
+        removed, added2, added1, created = board.history.all()
+        assert [record.delta_depth for record in board.history.all()] == [0, 2, 1, 0]
+        assert removed.data["members"] == str(admin2.pk)
+        assert added2.data["members"] == {"added": [str(admin2.pk)], "removed": []}
+        assert board.history.snapshot_at(added2)["members"] == ", ".join(
+            sorted([str(admin1.pk), str(admin2.pk)])
+        )
+
+
+@mark.django_db
+def test_bulk_fake_save_generates_history_after_queryset_update():
+    # arrange
+    polls = PollFactory.create_batch(size=3)
+    Poll.objects.update(question="What's for dinner?")
+    # act
+    bulk_fake_save(Poll.objects.all())
+    # assert
+    for poll in polls:
+        poll_updated = poll.history.first()
+        assert poll_updated.history_type == "~"
+        assert poll_updated.history_diff == ["question"]
+        assert poll_updated.data["question"] == "What's for dinner?"
+
+
+@mark.django_db
+def test_bulk_fake_save_generates_history_after_bulk_create():
+    # arrange
+    polls = Poll.objects.bulk_create(
+        [Poll(question="Question {}".format(i), pub_date=now()) for i in range(3)],
+    )
+    # act
+    bulk_fake_save(polls, created=True)
+    # assert
+    for poll in polls:
+        assert poll.history.get().history_type == "+"
+
+
+@mark.django_db
+def test_bulk_fake_save_skips_objects_without_changes():
+    # arrange
+    PollFactory.create_batch(size=3)
+    # act
+    bulk_fake_save(Poll.objects.all())
+    # assert
+    assert HistoricalRecord.objects.by_model(Poll).count() == 3
+
+
+@mark.django_db
+def test_batched_serialization_matches_single_instance_serialization(
+    episode,
+    season,
+    link,
+):
+    # arrange
+    show = episode.show
+    instances = [show, episode, season, link]
+    # assert
+    for instance in instances:
+        assert get_instances_field_data([instance]) == [
+            get_instance_field_data(instance),
+        ]
+    other_show = ShowFactory.create()
+    assert get_instances_field_data([show, other_show]) == [
+        get_instance_field_data(show),
+        get_instance_field_data(other_show),
+    ]
@@ -0,0 +1,137 @@
+import json
+import threading
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import PermissionDenied
+from django.db import connection, transaction
+from django.test import RequestFactory
+from pytest import mark, raises
+
+from atris.models import HistoricalRecord, bulk_fake_save
+from atris.views import history_feed
+from tests.factories import PollFactory
+from tests.models import Poll
+
+
+def read_feed(cursor=None, limit=None):
+    return list(HistoricalRecord.objects.since(cursor, limit))
+
+
+@mark.django_db(transaction=True)
+def test_feed_returns_records_in_order_from_cursor():
+    # arrange
+    polls = PollFactory.create_batch(size=3)
+    # act
+    first_page = read_feed(limit=2)
+    second_page = read_feed(first_page[-1].feed_cursor, limit=2)
+    third_page = read_feed(second_page[-1].feed_cursor, limit=2)
+    # assert
+    records = first_page + second_page
+    assert [record.object_id for record in records] == [str(p.pk) for p in polls]
+    assert third_page == []
+    assert all(record.transaction_id is not None for record in records)
+
+
+@mark.django_db(transaction=True)
+def test_feed_waits_for_transactions_committed_late():
+    # arrange
+    started, release = threading.Event(), threading.Event()
+
+    def create_poll_in_long_transaction():
+        try:
+            with transaction.atomic():
+                PollFactory.create(question="Late")
+                started.set()
+                release.wait(timeout=10)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=create_poll_in_long_transaction)
+    thread.start()
+    started.wait(timeout=10)
+    PollFactory.create(question="Early")
+    # act
+    while_running = read_feed()
+    release.set()
+    thread.join()
+    after_commit = read_feed()
+    # assert
+    assert while_running == []
+    assert [record.data["question"] for record in after_commit] == [
+        "Late",
+        "Early",
+    ]
+
+
+@mark.django_db(transaction=True)
+def test_updated_record_moves_to_end_of_feed():
+    # arrange
+    first_poll, second_poll = PollFactory.create_batch(size=2)
+    cursor = read_feed()[-1].feed_cursor
+    first_record = first_poll.history.get()
+    # act
+    first_record.additional_data = {"where_from": "Admin"}
+    first_record.save()
+    # assert
+    assert [record.pk for record in read_feed(cursor)] == [first_record.pk]
+
+
+@mark.django_db(transaction=True)
+def test_debounced_records_updated_in_bulk_move_to_end_of_feed(mocker):
+    # arrange
+    mocker.patch.object(Poll._meta.history_logging, "debounce_seconds", 60)
+    first_poll, second_poll = PollFactory.create_batch(size=2)
+    first_poll.question = "Updated"
+    first_poll.save()
+    second_poll.question = "Updated"
+    second_poll.save()
+    cursor = read_feed()[-1].feed_cursor
+    first_poll.question = "Debounced"
+    # act
+    bulk_fake_save([first_poll])
+    # assert
+    first_poll_updated = first_poll.history.get(history_type="~")
+    assert first_poll_updated.data["question"] == "Debounced"
+    assert [record.pk for record in read_feed(cursor)] == [first_poll_updated.pk]
+
+
+def test_feed_rejects_invalid_cursor():
+    # act & assert
+    with raises(ValueError):
+        HistoricalRecord.objects.since("not-a-cursor")
+
+
+@mark.django_db(transaction=True)
+def test_feed_view_returns_records_and_next_cursor(admin_user):
+    # arrange
+    PollFactory.create_batch(size=3)
+    request = RequestFactory().get("/feed/", {"limit": 2})
+    request.user = admin_user
+    # act
+    response = history_feed(request)
+    # assert
+    content = json.loads(response.content)
+    assert response.status_code == 200
+    assert len(content["results"]) == 2
+    assert content["cursor"] == content["results"][-1]["cursor"]
+
+
+def test_feed_view_requires_permission():
+    # arrange
+    request = RequestFactory().get("/feed/")
+    request.user = AnonymousUser()
+    # act & assert
+    with raises(PermissionDenied):
+        history_feed(request)
+
+
+def test_feed_view_requires_permission_of_history_model(mocker):
+    # arrange
+    mocker.patch("atris.views.get_history_model", return_value=Poll)
+    user = mocker.Mock(**{"has_perm.return_value": False})
+    request = RequestFactory().get("/feed/")
+    request.user = user
+    # act & assert
+    with raises(PermissionDenied):
+        history_feed(request)
+    user.has_perm.assert_called_once_with("tests.view_poll")
@@ -0,0 +1,80 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from pytest import mark
+
+from atris.models import HistoricalRecord, history_context
+from tests.factories import EpisodeFactory, PollFactory, ShowFactory, WriterFactory
+from tests.models import Poll
+
+
+@mark.django_db
+def test_records_generated_in_context_share_its_changeset(show, writer):
+    # act
+    with history_context() as context:
+        episode = EpisodeFactory.create(show=show, author=writer)
+    # assert
+    records = HistoricalRecord.objects.by_changeset(context.changeset_id)
+    assert set(records.values_list("object_id", flat=True)) == {
+        str(episode.pk),
+        str(show.pk),
+        str(writer.pk),
+    }
+    show_updated = show.history.first()
+    assert show_updated.related_field_history.changeset_id == context.changeset_id
+
+
+@mark.django_db
+def test_records_generated_in_different_contexts_have_different_changesets():
+    # act
+    with history_context() as context1:
+        poll1 = PollFactory.create()
+    with history_context() as context2:
+        poll2 = PollFactory.create()
+    # assert
+    assert poll1.history.get().changeset_id == context1.changeset_id
+    assert poll2.history.get().changeset_id == context2.changeset_id
+    assert context1.changeset_id != context2.changeset_id
+
+
+@mark.django_db(transaction=True)
+def test_records_generated_in_a_transaction_share_a_changeset():
+    # act
+    with transaction.atomic():
+        poll1 = PollFactory.create()
+        with transaction.atomic():
+            poll2 = PollFactory.create()
+    with transaction.atomic():
+        poll3 = PollFactory.create()
+    poll4 = PollFactory.create()
+    # assert
+    changeset1 = poll1.history.get().changeset_id
+    assert changeset1 is not None
+    assert poll2.history.get().changeset_id == changeset1
+    assert poll3.history.get().changeset_id not in (None, changeset1)
+    assert poll4.history.get().changeset_id is None
+
+
+@mark.django_db
+def test_changesets_rolled_up_most_recent_first():
+    # arrange
+    user = User(id=7, username="editor")
+    with history_context(user=user) as context1:
+        poll = PollFactory.create()
+        poll.question = "What's for dinner?"
+        poll.save()
+    with history_context() as context2:
+        ShowFactory.create()
+        WriterFactory.create()
+        PollFactory.create()
+    # act
+    result = list(HistoricalRecord.objects.by_model(Poll).changesets())
+    # assert
+    assert [changeset["changeset_id"] for changeset in result] == [
+        context2.changeset_id,
+        context1.changeset_id,
+    ]
+    assert result[0]["record_count"] == 1
+    assert result[1]["record_count"] == 2
+    assert result[1]["user"] == "editor"
+    assert result[1]["user_id"] == 7
+    assert result[1]["started"] < result[1]["ended"]
@@ -0,0 +1,196 @@
+from django.db import transaction
+from pytest import fixture, mark
+
+from atris.models import HistoricalRecord
+from tests.factories import AdminFactory, GroupFactory, PollFactory
+from tests.models import Group, Poll
+
+
+@fixture
+def coalesced_saves(mocker):
+    for model in (Group, Poll):
+        mocker.patch.object(model._meta.history_logging, "coalesce_saves", True)
+
+
+@fixture
+def commit(django_capture_on_commit_callbacks):
+    """
+    Runs the commit hooks registered inside the block, as if the transaction
+    was committed at its end.
+    """
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+@mark.django_db
+def test_create_followed_by_updates_recorded_as_create(coalesced_saves, commit):
+    # act
+    with commit():
+        poll = PollFactory.create(question="Draft")
+        poll.question = "What's for dinner?"
+        poll.save()
+        poll.question = "What's for lunch?"
+        poll.save()
+    # assert
+    poll_created = poll.history.get()
+    assert poll_created.history_type == "+"
+    assert poll_created.data["question"] == "What's for lunch?"
+
+
+@mark.django_db
+def test_updates_recorded_as_one_update_with_merged_diff(coalesced_saves, commit):
+    # arrange
+    with commit():
+        poll = PollFactory.create(question="Draft")
+    # act
+    with commit():
+        poll.question = "What's for dinner?"
+        poll.save()
+        poll.pub_date = poll.pub_date.replace(year=2000)
+        poll.save()
+    # assert
+    poll_updated, poll_created = poll.history.all()
+    assert poll_updated.history_type == "~"
+    assert sorted(poll_updated.history_diff) == ["pub_date", "question"]
+    assert poll_updated.data["question"] == "What's for dinner?"
+
+
+@mark.django_db
+def test_updates_reverted_in_transaction_not_recorded(coalesced_saves, commit):
+    # arrange
+    with commit():
+        poll = PollFactory.create(question="Draft")
+    # act
+    with commit():
+        poll.question = "What's for dinner?"
+        poll.save()
+        poll.question = "Draft"
+        poll.save()
+    # assert
+    assert poll.history.count() == 1
+
+
+@mark.django_db
+def test_create_followed_by_delete_not_recorded(coalesced_saves, commit):
+    # act
+    with commit():
+        poll = PollFactory.create()
+        poll_id = poll.pk
+        poll.question = "What's for dinner?"
+        poll.save()
+        poll.delete()
+    # assert
+    assert not HistoricalRecord.objects.by_model_and_model_id(Poll, poll_id).exists()
+
+
+@mark.django_db
+def test_updates_followed_by_delete_recorded_as_delete(coalesced_saves, commit):
+    # arrange
+    with commit():
+        poll = PollFactory.create()
+    poll_id = poll.pk
+    # act
+    with commit():
+        poll.question = "What's for dinner?"
+        poll.save()
+        poll.delete()
+    # assert
+    history = HistoricalRecord.objects.by_model_and_model_id(Poll, poll_id)
+    assert [record.history_type for record in history] == ["-", "+"]
+
+
+@mark.django_db
+def test_related_objects_set_after_create_recorded_in_create(coalesced_saves, commit):
+    # arrange
+    admins = AdminFactory.create_batch(size=2)
+    # act
+    with commit():
+        group = GroupFactory.create()
+        group.admins.set(admins)
+    # assert
+    group_created = group.history.get()
+    assert group_created.history_type == "+"
+    assert group_created.data["admins"] == ", ".join(
+        sorted(str(admin.pk) for admin in admins)
+    )
+
+
+@mark.django_db
+def test_changes_rolled_back_not_recorded(coalesced_saves, commit):
+    # act
+    with commit():
+        try:
+            with transaction.atomic():
+                PollFactory.create()
+                raise ValueError
+        except ValueError:
+            pass
+        poll = PollFactory.create()
+    # assert
+    assert HistoricalRecord.objects.by_model(Poll).count() == 1
+    assert poll.history.get().history_type == "+"
+
+
+@mark.django_db
+def test_changes_made_after_save_not_recorded(coalesced_saves, commit):
+    # act
+    with commit():
+        poll = PollFactory.create(question="Draft")
+        poll.question = "Not saved"
+    # assert
+    assert poll.history.get().data["question"] == "Draft"
+
+
+@mark.django_db
+def test_changes_rolled_back_with_savepoint_not_recorded(coalesced_saves, commit):
+    # act
+    with commit():
+        poll = PollFactory.create(question="Draft")
+        try:
+            with transaction.atomic():
+                poll.question = "What's for dinner?"
+                poll.save()
+                raise ValueError
+        except ValueError:
+            pass
+        other_poll = PollFactory.create()
+    # assert
+    assert poll.history.get().data["question"] == "Draft"
+    assert other_poll.history.get().history_type == "+"
+
+
+@mark.django_db
+def test_additional_data_of_last_save_recorded(coalesced_saves, commit):
+    # act
+    with commit():
+        poll = PollFactory.create(question="Draft")
+        poll.additional_data = {"where_from": "API"}
+        poll.question = "What's for dinner?"
+        poll.save()
+    # assert
+    assert poll.history.get().additional_data["where_from"] == "API"
+
+
+@mark.django_db
+def test_commit_hooks_do_not_grow_with_changes(coalesced_saves, commit):
+    # arrange
+    with commit() as one_change_hooks:
+        PollFactory.create()
+    # act
+    with commit() as many_changes_hooks:
+        for poll in PollFactory.create_batch(size=5):
+            poll.question = "What's for dinner?"
+            poll.save()
+    # assert
+    assert len(many_changes_hooks) == len(one_change_hooks)
+    assert HistoricalRecord.objects.by_model(Poll).count() == 6
+
+
+@mark.django_db
+def test_history_generated_right_away_without_coalescing(commit):
+    # act
+    with commit():
+        poll = PollFactory.create(question="Draft")
+        poll.question = "What's for dinner?"
+        poll.save()
+    # assert
+    assert poll.history.count() == 2
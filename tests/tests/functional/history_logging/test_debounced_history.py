@@ -0,0 +1,166 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from pytest import fixture, mark
+
+from atris.models import HistoricalRecord, history_context
+from tests.factories import (
+    AdminFactory,
+    ArticleFactory,
+    BoardFactory,
+    EpisodeFactory,
+    PollFactory,
+    ShowFactory,
+)
+from tests.models import Article, Board, Poll, Show
+
+
+@fixture
+def debounced_saves(mocker):
+    for model in (Article, Board, Poll):
+        mocker.patch.object(model._meta.history_logging, "debounce_seconds", 60)
+
+
+@mark.django_db
+def test_updates_within_window_merged_into_one_record(debounced_saves):
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    # act
+    poll.question = "What's for dinner?"
+    poll.save()
+    poll.pub_date = poll.pub_date - timedelta(days=1)
+    poll.save()
+    poll.question = "What's for lunch?"
+    poll.save()
+    # assert
+    poll_updated, poll_created = poll.history.all()
+    assert poll_updated.history_type == "~"
+    assert poll_updated.history_diff == ["question", "pub_date"]
+    assert poll_updated.data["question"] == "What's for lunch?"
+    assert poll_created.data["question"] == "Draft"
+
+
+@mark.django_db
+def test_update_after_window_generates_new_record(debounced_saves):
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    poll.question = "What's for dinner?"
+    poll.save()
+    poll.history.filter(history_type="~").update(
+        history_date=poll.history.first().history_date - timedelta(seconds=61),
+    )
+    # act
+    poll.question = "What's for lunch?"
+    poll.save()
+    # assert
+    assert poll.history.filter(history_type="~").count() == 2
+
+
+@mark.django_db
+def test_updates_by_different_users_not_merged(debounced_saves):
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    poll.question = "What's for dinner?"
+    poll.save()
+    # act
+    poll.history_user = User(id=1, username="other_user")
+    poll.question = "What's for lunch?"
+    poll.save()
+    # assert
+    updated_by_other_user, updated, _ = poll.history.all()
+    assert updated_by_other_user.history_user == "other_user"
+    assert updated.history_user is None
+
+
+@mark.django_db
+def test_updates_not_merged_without_debouncing():
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    # act
+    poll.question = "What's for dinner?"
+    poll.save()
+    poll.question = "What's for lunch?"
+    poll.save()
+    # assert
+    assert poll.history.count() == 3
+
+
+@mark.django_db
+def test_merged_delta_snapshot_holds_all_changed_fields(debounced_saves):
+    # arrange
+    article = ArticleFactory.create(title="Draft", body="Body", views=0)
+    # act
+    article.title = "Title"
+    article.save()
+    article.views = 1
+    article.save()
+    # assert
+    article_updated, article_created = article.history.all()
+    assert article_updated.delta_depth == 1
+    assert article_updated.data == {"title": "Title", "views": "1"}
+    snapshot = HistoricalRecord.objects.snapshot_at(article_updated)
+    assert snapshot == {
+        "id": str(article.id),
+        "title": "Title",
+        "body": "Body",
+        "views": "1",
+    }
+
+
+@mark.django_db
+def test_merged_related_deltas_relative_to_record_before(debounced_saves):
+    # arrange
+    admin1, admin2, admin3 = AdminFactory.create_batch(size=3)
+    board = BoardFactory.create()
+    board.members.add(admin1)
+    board.history.update(
+        history_date=board.history.first().history_date - timedelta(seconds=61),
+    )
+    # act
+    board.members.add(admin2, admin3)
+    board.members.remove(admin1, admin3)
+    # assert
+    members_changed, admin1_added, _ = board.history.all()
+    assert members_changed.delta_depth == 2
+    assert members_changed.data["members"] == {
+        "added": [str(admin2.pk)],
+        "removed": [str(admin1.pk)],
+    }
+    snapshot = HistoricalRecord.objects.snapshot_at(members_changed)
+    assert snapshot["members"] == str(admin2.pk)
+
+
+@mark.django_db
+def test_updates_in_different_changesets_not_merged(debounced_saves):
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    # act
+    with history_context():
+        poll.question = "What's for dinner?"
+        poll.save()
+    with history_context():
+        poll.question = "What's for lunch?"
+        poll.save()
+    # assert
+    assert poll.history.filter(history_type="~").count() == 2
+
+
+@mark.django_db
+def test_update_not_merged_into_related_object_record(
+    debounced_saves,
+    mocker,
+    writer,
+):
+    # arrange
+    mocker.patch.object(Show._meta.history_logging, "debounce_seconds", 60)
+    show = ShowFactory.create(title="Draft")
+    EpisodeFactory.create(show=show, author=writer)
+    # act
+    show.title = "Mercy Street"
+    show.save()
+    # assert
+    show_updated, episode_added = show.history.all()[:2]
+    assert show_updated.related_field_history is None
+    assert show_updated.history_diff == ["title"]
+    assert episode_added.related_field_history is not None
+    assert episode_added.history_diff == ["episode"]
@@ -0,0 +1,160 @@
+from pytest import mark
+
+from atris.models import HistoricalRecord
+from tests.conftest import history_format_fks
+from tests.factories import AdminFactory, ArticleFactory, BoardFactory
+from tests.models import Article
+
+
+def edit_article(article, **changes):
+    for field_name, value in changes.items():
+        setattr(article, field_name, value)
+    article.save()
+
+
+@mark.django_db
+def test_to_many_delta_fields_store_added_and_removed_ids_between_keyframes():
+    # arrange
+    board = BoardFactory.create()
+    admin1, admin2, admin3 = AdminFactory.create_batch(size=3)
+    # act
+    board.members.add(admin1, admin2)
+    board.members.remove(admin1)
+    board.members.add(admin3)
+    # assert
+    admin3_added, admin1_removed, admins_added, created = board.history.all()
+    assert created.delta_depth == 0
+    assert created.data["members"] == ""
+    assert admins_added.delta_depth == 1
+    assert admins_added.history_diff == ["members"]
+    assert admins_added.data["members"] == {
+        "added": history_format_fks([admin1.pk, admin2.pk]).split(", "),
+        "removed": [],
+    }
+    assert admin1_removed.delta_depth == 2
+    assert admin1_removed.data["members"] == {
+        "added": [],
+        "removed": [str(admin1.pk)],
+    }
+    # keyframe_interval=3
+    assert admin3_added.delta_depth == 0
+    assert admin3_added.data["members"] == history_format_fks([admin2.pk, admin3.pk])
+
+
+@mark.django_db
+def test_related_ids_rebuilt_for_every_version():
+    # arrange
+    board = BoardFactory.create()
+    admin1, admin2, admin3 = AdminFactory.create_batch(size=3)
+    board.members.add(admin1, admin2)
+    board.members.remove(admin1)
+    board.members.add(admin3)
+    board.members.remove(admin2)
+    # act
+    result = [
+        HistoricalRecord.objects.related_ids_at(record, "members")
+        for record in board.history.all()
+    ]
+    # assert
+    assert [set(ids) for ids in result] == [
+        {str(admin3.pk)},
+        {str(admin2.pk), str(admin3.pk)},
+        {str(admin2.pk)},
+        {str(admin1.pk), str(admin2.pk)},
+        set(),
+    ]
+
+
+@mark.django_db
+def test_unchanged_to_many_delta_field_does_not_generate_history():
+    # arrange
+    board = BoardFactory.create()
+    board.members.add(*AdminFactory.create_batch(size=2))
+    # act
+    board.save()
+    board.name = "Renamed"
+    board.save()
+    # assert
+    renamed, members_added, _ = board.history.all()
+    assert renamed.history_diff == ["name"]
+    assert renamed.delta_depth == 2
+    assert renamed.data["members"] == {"added": [], "removed": []}
+
+
+@mark.django_db
+def test_keyframe_stored_when_previous_snapshot_can_not_be_rebuilt():
+    # arrange
+    board = BoardFactory.create()
+    board.members.add(AdminFactory.create())
+    board.history.last().delete()
+    # act
+    board.members.add(AdminFactory.create())
+    # assert
+    admin_added = board.history.first()
+    assert admin_added.delta_depth == 0
+    assert admin_added.history_diff is None
+    assert len(admin_added.data["members"].split(", ")) == 2
+
+
+@mark.django_db
+def test_delta_snapshots_store_only_changed_values_between_keyframes():
+    # arrange
+    article = ArticleFactory.create(title="Title", body="Body", views=0)
+    # act
+    edit_article(article, views=1)
+    edit_article(article, title="New title", views=2)
+    edit_article(article, views=3)
+    # assert
+    keyframe, title_changed, views_changed, created = article.history.all()
+    assert created.delta_depth == 0
+    assert set(created.data) == {"id", "title", "body", "views"}
+    assert views_changed.delta_depth == 1
+    assert views_changed.data == {"views": "1"}
+    assert title_changed.delta_depth == 2
+    assert title_changed.data == {"title": "New title", "views": "2"}
+    # keyframe_interval=3
+    assert keyframe.delta_depth == 0
+    assert keyframe.data == {
+        "id": str(article.pk),
+        "title": "New title",
+        "body": "Body",
+        "views": "3",
+    }
+
+
+@mark.django_db
+def test_snapshot_at_rebuilds_complete_snapshot_of_delta_record():
+    # arrange
+    article = ArticleFactory.create(title="Title", body="Body", views=0)
+    edit_article(article, views=1)
+    edit_article(article, title="New title")
+    # act
+    result = HistoricalRecord.objects.snapshot_at(article.history.first())
+    # assert
+    assert result == {
+        "id": str(article.pk),
+        "title": "New title",
+        "body": "Body",
+        "views": "1",
+    }
+
+
+@mark.django_db
+def test_materialize_rebuilds_snapshots_with_one_query_per_object(
+    django_assert_num_queries,
+):
+    # arrange
+    articles = ArticleFactory.create_batch(size=2, body="Body", views=0)
+    for article in articles:
+        for views in range(1, 5):
+            edit_article(article, views=views)
+    # act
+    with django_assert_num_queries(3):
+        records = Article.history.order_by("history_date").materialize()
+    # assert
+    for article in articles:
+        views = [r.data["views"] for r in records if r.object_id == str(article.pk)]
+        assert views == ["0", "1", "2", "3", "4"]
+        assert all(
+            r.data["body"] == "Body" for r in records if r.object_id == str(article.pk)
+        )
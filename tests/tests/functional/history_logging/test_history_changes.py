@@ -0,0 +1,104 @@
+from pytest import fixture, mark
+
+from atris.models import bulk_fake_save, get_blob_hash
+from tests.factories import ArticleFactory, PollFactory
+from tests.models import Article, Poll
+
+
+LONG_BODY = "Lorem ipsum " * 20
+
+
+@fixture
+def stored_changes(mocker):
+    for model in (Article, Poll):
+        mocker.patch.object(model._meta.history_logging, "store_changes", True)
+
+
+@mark.django_db
+def test_update_stores_previous_and_new_values(stored_changes):
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    # act
+    poll.question = "What's for dinner?"
+    poll.save()
+    # assert
+    poll_updated, poll_created = poll.history.all()
+    assert poll_updated.history_changes == {
+        "question": ["Draft", "What's for dinner?"],
+    }
+    assert poll_created.history_changes is None
+
+
+@mark.django_db
+def test_changes_not_stored_by_default():
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    # act
+    poll.question = "What's for dinner?"
+    poll.save()
+    # assert
+    poll_updated = poll.history.first()
+    assert poll_updated.history_changes is None
+    assert poll_updated.get_changes() == {
+        "question": ["Draft", "What's for dinner?"],
+    }
+
+
+@mark.django_db
+def test_get_changes_reads_stored_changes(stored_changes, django_assert_num_queries):
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    poll.question = "What's for dinner?"
+    poll.save()
+    poll_updated = poll.history.first()
+    # act
+    with django_assert_num_queries(0):
+        changes = poll_updated.get_changes()
+    # assert
+    assert changes == {"question": ["Draft", "What's for dinner?"]}
+
+
+@mark.django_db
+def test_debounced_changes_keep_the_first_previous_value(stored_changes, mocker):
+    # arrange
+    mocker.patch.object(Poll._meta.history_logging, "debounce_seconds", 60)
+    poll = PollFactory.create(question="Draft")
+    # act
+    poll.question = "What's for dinner?"
+    poll.save()
+    poll.question = "What's for lunch?"
+    poll.save()
+    # assert
+    poll_updated = poll.history.first()
+    assert poll_updated.history_changes == {
+        "question": ["Draft", "What's for lunch?"],
+    }
+
+
+@mark.django_db
+def test_large_changed_values_stored_as_blobs(stored_changes):
+    # arrange
+    article = ArticleFactory.create(body="Short body")
+    # act
+    article.body = LONG_BODY
+    article.save()
+    # assert
+    article_updated = article.history.first()
+    assert article_updated.history_changes == {
+        "body": ["Short body", {"blob": get_blob_hash(LONG_BODY)}],
+    }
+    assert article_updated.get_changes() == {"body": ["Short body", LONG_BODY]}
+
+
+@mark.django_db
+def test_bulk_history_stores_changes(stored_changes):
+    # arrange
+    polls = PollFactory.create_batch(size=2, question="Draft")
+    Poll.objects.update(question="What's for dinner?")
+    # act
+    bulk_fake_save(Poll.objects.all())
+    # assert
+    for poll in polls:
+        assert poll.history.first().history_changes == {
+            "question": ["Draft", "What's for dinner?"],
+        }
@@ -1,5 +1,16 @@
 from django.contrib.auth.models import User
-from pytest import mark
+from pytest import fixture, mark
+
+from atris.models import history_context
+from tests.factories import ActorFactory, PollFactory
+
+
+@fixture
+def request_user(mocker):
+    user = User(id=2, username="request_user", first_name="Jane", last_name="Doe")
+    mocker.spy(user, "get_full_name")
+    with history_context(user=user):
+        yield user
 
 
 @mark.django_db
@@ -79,3 +90,54 @@ def test_users_marked_for_ignore_skip_history(poll):
     assert poll.history.count() == 1  # resulting from create
     assert poll.history.filter(history_user="ignore_user").exists() is False
     assert poll.history.filter(history_user_id=1010101).exists() is False
+
+
+@mark.django_db
+def test_request_user_resolved_once_for_all_history_of_the_request(
+    request_user, episode, actors
+):
+    # act
+    PollFactory.create()
+    ActorFactory.create()
+    episode.cast.add(*actors)
+    # assert
+    assert request_user.get_full_name.call_count == 1
+    assert episode.history.first().history_user == "Jane Doe"
+    assert episode.show.history.first().history_user_id == 2
+    assert actors[0].history.first().history_user == "Jane Doe"
+
+
+@mark.django_db
+def test_user_resolved_again_in_a_new_context(request_user, poll):
+    # act
+    with history_context(user=User(id=3, username="other_user")):
+        poll.question = "Another new question"
+        poll.save()
+    # assert
+    poll_updated, poll_created = poll.history.all()
+    assert poll_created.history_user == "Jane Doe"
+    assert poll_updated.history_user == "other_user"
+
+
+@mark.django_db
+def test_nested_context_without_user_keeps_enclosing_user(request_user, poll):
+    # act
+    with history_context() as context:
+        poll.question = "Another new question"
+        poll.save()
+    # assert
+    assert context.changeset_id is not None
+    assert poll.history.first().history_user == "Jane Doe"
+    assert request_user.get_full_name.call_count == 1
+
+
+@mark.django_db
+def test_user_set_on_instance_recorded_when_context_has_no_user(poll):
+    # arrange
+    poll.history_user = User(id=1, username="test_user_2")
+    poll.question = "Another new question"
+    # act
+    with history_context():
+        poll.save()
+    # assert
+    assert poll.history.first().history_user == "test_user_2"
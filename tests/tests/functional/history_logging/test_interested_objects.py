@@ -1,7 +1,9 @@
+from django.contrib.contenttypes.models import ContentType
 from pytest import mark
 
+from atris.models import HistoricalRecord
 from tests.factories import EpisodeFactory, LinkFactory, ShowFactory
-from tests.models import Episode, Link
+from tests.models import Episode, Link, Writer
 
 
 @mark.django_db
@@ -256,6 +258,19 @@ def test_related_history_for_interested_generic_foreign_key_without_generic_rela
     assert episode_updates[2].additional_data["link"] == "Created Link"
 
 
+@mark.django_db
+def test_no_related_history_for_generic_foreign_key_with_invalid_object_id():
+    # arrange
+    writer_content_type = ContentType.objects.get_for_model(Writer)
+    # act
+    link = LinkFactory.create(content_type=writer_content_type, object_id=1)
+    # assert
+    assert link.history.count() == 1
+    assert not HistoricalRecord.objects.filter(
+        content_type=writer_content_type,
+    ).exists()
+
+
 @mark.django_db
 def test_related_history_not_created_for_objects_not_added_in_interested_fields(
     show, writer, season
@@ -1,6 +1,8 @@
-from pytest import mark
+from django.db import DatabaseError, connection, transaction
+from django.db.models.signals import m2m_changed
+from pytest import mark, raises
 
-from atris.models import HistoryLogging
+from atris.models.helpers import TransactionState
 from tests.conftest import history_format_fks
 from tests.factories import (
     AdminFactory,
@@ -11,6 +13,15 @@ from tests.factories import (
     VoterFactory,
     WriterFactory,
 )
+from tests.models import Admin
+
+
+def get_stored_transaction_state():
+    return [
+        hook[1]
+        for hook in connection.run_on_commit
+        if isinstance(hook[1], TransactionState)
+    ]
 
 
 @mark.django_db
@@ -240,7 +251,7 @@ def test_history_generated_for_object_referenced_through_m2m_field_by_an_unregis
     voter.groups.remove(group2)
     voter.groups.clear()
     # assert
-    assert len(HistoryLogging._cleared_related_objects) == 0
+    assert get_stored_transaction_state() == []
     group1_cleared, group1_set = group1.history.all()[:2]
     assert group1_set.history_type == "~"
     assert group1_set.history_diff == ["voters"]
@@ -278,7 +289,7 @@ def test_history_generated_for_object_through_reverse_m2m_relation_with_untracke
     group.voters.remove(voter2)
     group.voters.clear()
     # assert
-    assert len(HistoryLogging._cleared_related_objects) == 0
+    assert get_stored_transaction_state() == []
     (
         voters_cleared,
         voter2_removed,
@@ -317,7 +328,7 @@ def test_history_generated_for_object_with_m2m_field_to_untracked_object(
     group.admins.remove(admin2)
     group.admins.clear()
     # assert
-    assert len(HistoryLogging._cleared_related_objects) == 0
+    assert get_stored_transaction_state() == []
     (
         admins_cleared,
         admin2_removed,
@@ -357,7 +368,7 @@ def test_history_generated_for_objects_added_through_reverse_m2m_relation_on_an_
     admin.groups.remove(group2)
     admin.groups.clear()
     # assert
-    assert len(HistoryLogging._cleared_related_objects) == 0
+    assert get_stored_transaction_state() == []
     group1_cleared, group1_set = group1.history.all()[:2]
     assert group1_set.history_type == "~"
     assert group1_set.history_diff == ["admins"]
@@ -381,6 +392,38 @@ def test_history_generated_for_objects_added_through_reverse_m2m_relation_on_an_
     assert group3_cleared.data["admins"] == ""
 
 
+@mark.django_db
+def test_clear_interrupted_by_an_error_does_not_affect_later_clears(groups):
+    # arrange
+    admin = AdminFactory.create()
+    group1, group2, group3 = groups
+    admin.groups.set([group1, group2])
+
+    def fail_clear(action, **kwargs):
+        if action == "pre_clear":
+            raise DatabaseError("Clear failed")
+
+    m2m_changed.connect(fail_clear, sender=Admin.groups.through)
+    try:
+        with raises(DatabaseError), transaction.atomic():
+            admin.groups.clear()
+    finally:
+        m2m_changed.disconnect(fail_clear, sender=Admin.groups.through)
+    assert get_stored_transaction_state() == []
+    admin.groups.set([group1, group3])
+    # act
+    admin.save()
+    admin.groups.clear()
+    # assert
+    assert get_stored_transaction_state() == []
+    for group in (group1, group3):
+        group_cleared, group_set = group.history.all()[:2]
+        assert group_set.data["admins"] == str(admin.pk)
+        assert group_cleared.data["admins"] == ""
+    # Removed by set(), not by the clear.
+    assert group2.history.count() == 3
+
+
 @mark.django_db
 def test_additional_data_from_initially_changed_instance_copied_to_history_of_fk_field(
     show,
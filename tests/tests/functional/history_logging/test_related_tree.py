@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pytest import fixture, mark
+
+from atris.models import HistoricalRecord
+from tests.factories import HistoricalRecordFactory
+
+
+@fixture
+def record_tree():
+    """
+    root
+    ├── child1
+    │   └── grandchild
+    └── child2
+    """
+    root = HistoricalRecordFactory.create()
+    child1 = HistoricalRecordFactory.create(related_field_history=root)
+    child2 = HistoricalRecordFactory.create(related_field_history=root)
+    grandchild = HistoricalRecordFactory.create(related_field_history=child1)
+    return root, child1, child2, grandchild
+
+
+@mark.django_db
+def test_related_tree_fetched_with_one_query(record_tree):
+    # arrange
+    root, child1, child2, grandchild = record_tree
+    HistoricalRecordFactory.create()
+    # act
+    with CaptureQueriesContext(connection) as queries:
+        result = set(HistoricalRecord.objects.filter(pk=root.pk).with_related_tree())
+    # assert
+    assert len(queries) == 1
+    assert result == {root, child1, child2, grandchild}
+
+
+@mark.django_db
+def test_related_tree_of_several_records(record_tree):
+    # arrange
+    root, child1, child2, grandchild = record_tree
+    other_root = HistoricalRecordFactory.create()
+    other_child = HistoricalRecordFactory.create(related_field_history=other_root)
+    # act
+    result = HistoricalRecord.objects.filter(pk__in=[child1.pk, other_root.pk])
+    # assert
+    assert set(result.with_related_tree()) == {
+        child1,
+        grandchild,
+        other_root,
+        other_child,
+    }
+
+
+@mark.django_db
+def test_cause_chain_fetched_with_one_query(record_tree):
+    # arrange
+    root, child1, child2, grandchild = record_tree
+    # act
+    with CaptureQueriesContext(connection) as queries:
+        result = list(HistoricalRecord.objects.cause_chain(grandchild))
+    # assert
+    assert len(queries) == 1
+    assert result == [root, child1, grandchild]
+    assert list(HistoricalRecord.objects.cause_chain(root)) == [root]
+
+
+@mark.django_db
+def test_interested_object_records_in_related_tree(show, writer, episode):
+    # arrange
+    episode_created = episode.history.get()
+    # act
+    result = HistoricalRecord.objects.filter(
+        pk=episode_created.pk,
+    ).with_related_tree()
+    # assert
+    assert set(result) == {
+        episode_created,
+        show.history.first(),
+        writer.history.first(),
+    }
@@ -0,0 +1,222 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pytest import mark
+
+from atris.models import HistoricalRecord, history_context
+from atris.models.restore import restore_snapshots
+from tests.factories import (
+    ActorFactory,
+    AdminFactory,
+    BoardFactory,
+    GroupFactory,
+    PollFactory,
+    VoterFactory,
+    WriterFactory,
+)
+from tests.models import Board, Episode, Episode2, Group, Poll, Voter
+
+
+@mark.django_db
+def test_objects_restored_to_snapshot():
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    original_pub_date = poll.pub_date
+    poll.question = "What's for dinner?"
+    poll.pub_date = original_pub_date - timedelta(days=1)
+    poll.save()
+    # act
+    poll.history.filter(history_type="+").restore()
+    # assert
+    poll.refresh_from_db()
+    assert poll.question == "Draft"
+    assert poll.pub_date == original_pub_date
+    poll_restored = poll.history.first()
+    assert poll_restored.history_type == "~"
+    assert sorted(poll_restored.history_diff) == ["pub_date", "question"]
+
+
+@mark.django_db
+def test_deleted_objects_recreated():
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    poll_id = poll.pk
+    poll.delete()
+    history = HistoricalRecord.objects.by_model_and_model_id(Poll, poll_id)
+    # act
+    history.filter(history_type="-").restore()
+    # assert
+    assert Poll.objects.get(pk=poll_id).question == "Draft"
+    assert history.first().history_type == "+"
+
+
+@mark.django_db
+def test_foreign_keys_and_structured_values_restored(episode, show, season):
+    # arrange
+    episode.keywords = ["pilot", "drama"]
+    episode.episode_metadata = {"rating": 5, "tags": ["new"], "final": False}
+    episode.season = season
+    episode.save()
+    episode_with_season = episode.history.first()
+    episode.keywords = []
+    episode.episode_metadata = {}
+    episode.season = None
+    episode.save()
+    # act
+    Episode.history.filter(pk=episode_with_season.pk).restore()
+    # assert
+    episode.refresh_from_db()
+    assert episode.keywords == ["pilot", "drama"]
+    assert episode.episode_metadata == {"rating": 5, "tags": ["new"], "final": False}
+    assert episode.season == season
+    assert episode.show == show
+
+
+@mark.django_db
+def test_many_to_many_relations_restored(episode):
+    # arrange
+    admin1, admin2, admin3 = AdminFactory.create_batch(size=3)
+    actor1, actor2 = ActorFactory.create_batch(size=2)
+    group = GroupFactory.create()
+    group.admins.set([admin1, admin2])
+    episode.cast.set([actor1])
+    group_with_admins = group.history.first()
+    episode_with_cast = episode.history.first()
+    group.admins.set([admin2, admin3])
+    episode.cast.set([actor2])
+    # act
+    HistoricalRecord.objects.filter(
+        pk__in=[group_with_admins.pk, episode_with_cast.pk],
+    ).restore()
+    # assert
+    assert set(group.admins.all()) == {admin1, admin2}
+    assert list(episode.cast.all()) == [actor1]
+    assert group.history.first().history_diff == ["admins"]
+
+
+@mark.django_db
+def test_history_generated_for_objects_added_and_removed_by_restore():
+    # arrange
+    group1, group2 = GroupFactory.create_batch(size=2)
+    episode = Episode2.objects.create(
+        title="Pilot",
+        description="",
+        author=WriterFactory.create(),
+    )
+    episode.groups.set([group1])
+    episode_with_groups = episode.history.first()
+    episode.groups.set([group2])
+    # act
+    episode.history.filter(pk=episode_with_groups.pk).restore()
+    # assert
+    assert list(episode.groups.all()) == [group1]
+    for group, expected in ((group1, str(episode.pk)), (group2, "")):
+        group_restored = group.history.first()
+        assert group_restored.history_type == "~"
+        assert group_restored.history_diff == ["episodes"]
+        assert group_restored.data["episodes"] == expected
+
+
+@mark.django_db
+def test_history_generated_for_tracked_objects_related_to_restored_untracked_ones(
+    choice,
+):
+    # arrange
+    group1, group2, group3 = GroupFactory.create_batch(size=3)
+    voter = VoterFactory.create(choice=choice)
+    voter.groups.set([group1, group2])
+    snapshot = {
+        "id": str(voter.pk),
+        "choice": str(choice.pk),
+        "name": voter.name,
+        "groups": f"{group2.pk}, {group3.pk}",
+    }
+    # act
+    restore_snapshots({Voter: {str(voter.pk): snapshot}})
+    # assert
+    assert set(voter.groups.all()) == {group2, group3}
+    for group, expected in ((group1, ""), (group3, str(voter.pk))):
+        group_restored = group.history.first()
+        assert group_restored.history_type == "~"
+        assert group_restored.history_diff == ["voters"]
+        assert group_restored.data["voters"] == expected
+    assert group2.history.count() == 2
+
+
+@mark.django_db
+def test_to_many_relations_stored_as_deltas_restored():
+    # arrange
+    admin1, admin2 = AdminFactory.create_batch(size=2)
+    board = BoardFactory.create()
+    board.members.add(admin1)
+    board.members.add(admin2)
+    board_with_admin1 = board.history.all()[1]
+    board.members.remove(admin1)
+    # act
+    Board.history.filter(pk=board_with_admin1.pk).restore()
+    # assert
+    assert list(board.members.all()) == [admin1]
+
+
+@mark.django_db
+def test_restore_uses_fixed_number_of_queries():
+    # arrange
+    few_polls = PollFactory.create_batch(size=2, question="Draft")
+    many_polls = PollFactory.create_batch(size=10, question="Draft")
+    Poll.objects.update(question="What's for dinner?")
+    few_history = HistoricalRecord.objects.filter(
+        object_id__in=[str(poll.pk) for poll in few_polls],
+    )
+    many_history = HistoricalRecord.objects.filter(
+        object_id__in=[str(poll.pk) for poll in many_polls],
+    )
+    # act
+    with CaptureQueriesContext(connection) as few_queries:
+        Poll.history.filter(pk__in=few_history).restore()
+    with CaptureQueriesContext(connection) as many_queries:
+        Poll.history.filter(pk__in=many_history).restore()
+    # assert
+    assert len(few_queries) == len(many_queries)
+    assert set(Poll.objects.values_list("question", flat=True)) == {"Draft"}
+
+
+@mark.django_db
+def test_changeset_reverted():
+    # arrange
+    poll_deleted = PollFactory.create(question="Deleted")
+    poll_deleted_id = poll_deleted.pk
+    poll_updated = PollFactory.create(question="Draft")
+    group = GroupFactory.create(name="Group")
+    with history_context() as context:
+        poll_updated.question = "What's for dinner?"
+        poll_updated.save()
+        poll_updated.question = "What's for lunch?"
+        poll_updated.save()
+        poll_deleted.delete()
+        poll_created = PollFactory.create()
+        group.admins.add(AdminFactory.create())
+    # act
+    HistoricalRecord.objects.revert_changeset(context.changeset_id)
+    # assert
+    poll_updated.refresh_from_db()
+    assert poll_updated.question == "Draft"
+    assert Poll.objects.get(pk=poll_deleted_id).question == "Deleted"
+    assert not Poll.objects.filter(pk=poll_created.pk).exists()
+    assert group.admins.exists() is False
+    assert Group.objects.get().name == "Group"
+
+
+@mark.django_db
+def test_changeset_reverted_without_earlier_history():
+    # arrange
+    poll = PollFactory.create(question="Draft")
+    HistoricalRecord.objects.all().delete()
+    with history_context() as context:
+        poll.question = "What's for dinner?"
+        poll.save()
+    # act
+    HistoricalRecord.objects.revert_changeset(context.changeset_id)
+    # assert
+    poll.refresh_from_db()
+    assert poll.question == "What's for dinner?"
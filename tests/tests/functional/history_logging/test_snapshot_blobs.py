@@ -0,0 +1,65 @@
+from pytest import mark
+
+from atris.models import HistoricalRecord, SnapshotBlob, get_blob_hash
+from tests.factories import ArticleFactory
+from tests.models import Article
+
+
+LONG_BODY = "Lorem ipsum " * 20
+
+
+@mark.django_db
+def test_values_above_threshold_stored_once_and_referenced_by_hash():
+    # arrange
+    article = ArticleFactory.create(body=LONG_BODY, views=0)
+    for views in range(1, 4):
+        article.views = views
+        article.save()
+    ArticleFactory.create(body=LONG_BODY)
+    # assert
+    keyframe = article.history.first()
+    created = article.history.last()
+    expected_reference = {"blob": get_blob_hash(LONG_BODY)}
+    assert keyframe.delta_depth == 0
+    assert keyframe.data["body"] == expected_reference
+    assert created.data["body"] == expected_reference
+    assert SnapshotBlob.objects.get().value == LONG_BODY
+
+
+@mark.django_db
+def test_values_below_threshold_stored_in_snapshot():
+    # arrange
+    article = ArticleFactory.create(body="Short body")
+    # assert
+    assert article.history.first().data["body"] == "Short body"
+    assert SnapshotBlob.objects.exists() is False
+
+
+@mark.django_db
+def test_changes_to_values_stored_as_blobs_detected():
+    # arrange
+    article = ArticleFactory.create(body=LONG_BODY)
+    # act
+    article.save()
+    article.body = LONG_BODY + "."
+    article.save()
+    # assert
+    body_updated, created = article.history.all()
+    assert body_updated.history_diff == ["body"]
+    assert SnapshotBlob.objects.count() == 2
+
+
+@mark.django_db
+def test_blob_references_resolved_in_one_query_when_reading(
+    django_assert_num_queries,
+):
+    # arrange
+    ArticleFactory.create(body=LONG_BODY)
+    ArticleFactory.create(body=LONG_BODY + ".")
+    # act
+    with django_assert_num_queries(2):
+        records = Article.history.materialize()
+    snapshot = HistoricalRecord.objects.snapshot_at(records[0])
+    # assert
+    assert [r.data["body"] for r in records] == [LONG_BODY + ".", LONG_BODY]
+    assert snapshot["body"] == LONG_BODY + "."
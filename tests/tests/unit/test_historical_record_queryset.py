@@ -1,10 +1,10 @@
 import logging
 
 from django.contrib.contenttypes.models import ContentType
-from pytest import fail, mark
+from pytest import fail, mark, raises
 
 from atris.models import HistoricalRecord
-from tests.factories import ChoiceFactory, PollFactory, VoterFactory
+from tests.factories import ArticleFactory, ChoiceFactory, PollFactory, VoterFactory
 from tests.models import Choice, Episode, Poll, Special
 
 
@@ -90,3 +90,203 @@ def test_historical_records_approx_count_does_not_raise():
         HistoricalRecord.objects.approx_count()
     except Exception:
         fail("HistoricalRecord.objects.approx_count() should not raise any error!")
+
+
+def _update_poll(poll, **values):
+    for field_name, value in values.items():
+        setattr(poll, field_name, value)
+    poll.save()
+    return poll.history.first()
+
+
+@mark.django_db
+def test_changed_fields_matches_any_or_all_fields(poll):
+    # arrange
+    question_changed = _update_poll(poll, question="What's for dinner?")
+    both_changed = _update_poll(
+        poll,
+        question="What's for lunch?",
+        pub_date=poll.pub_date.replace(year=2000),
+    )
+    # act
+    any_changed = poll.history.changed_fields("question", "pub_date")
+    all_changed = poll.history.changed_fields("question", "pub_date", match="all")
+    # assert
+    assert set(any_changed) == {question_changed, both_changed}
+    assert list(all_changed) == [both_changed]
+
+
+@mark.django_db
+def test_exclude_changed_keeps_records_without_the_fields(poll):
+    # arrange
+    creation = poll.history.get()
+    _update_poll(poll, question="What's for dinner?")
+    pub_date_changed = _update_poll(poll, pub_date=poll.pub_date.replace(year=2000))
+    # act
+    result = poll.history.exclude_changed("question")
+    # assert
+    assert set(result) == {creation, pub_date_changed}
+
+
+@mark.django_db
+def test_changed_fields_rejects_unknown_match():
+    # act & assert
+    with raises(ValueError):
+        HistoricalRecord.objects.changed_fields("question", match="some")
+
+
+@mark.django_db
+def test_where_data_finds_versions_holding_values(poll):
+    # arrange
+    question = poll.question
+    same_question_poll = PollFactory.create(question=question)
+    _update_poll(poll, question="What's for dinner?")
+    choice = ChoiceFactory.create(poll=poll)
+    # act
+    by_question = HistoricalRecord.objects.by_model(Poll).where_data(
+        question=question,
+    )
+    by_poll = HistoricalRecord.objects.by_model(Choice).where_data(poll=poll)
+    # assert
+    assert {(r.object_id, r.history_type) for r in by_question} == {
+        (str(poll.pk), "+"),
+        (str(same_question_poll.pk), "+"),
+    }
+    assert [r.object_id for r in by_poll] == [str(choice.pk)]
+
+
+@mark.django_db
+def test_where_data_finds_values_stored_as_blobs():
+    # arrange
+    body = "Lorem ipsum " * 20
+    article = ArticleFactory.create(body=body)
+    ArticleFactory.create(body="Short body")
+    # act
+    result = HistoricalRecord.objects.where_data(body=body)
+    # assert
+    assert [record.object_id for record in result] == [str(article.pk)]
+
+
+@mark.django_db
+def test_where_additional_finds_records_by_additional_data(poll):
+    # arrange
+    poll.additional_data = {"where_from": "Admin"}
+    admin_update = _update_poll(poll, question="What's for dinner?")
+    # act
+    result = HistoricalRecord.objects.where_additional(where_from="Admin")
+    # assert
+    assert list(result) == [admin_update]
+
+
+@mark.django_db
+def test_value_timeline_lists_field_values_oldest_first(poll):
+    # arrange
+    first_question = poll.question
+    _update_poll(poll, question="What's for dinner?")
+    _update_poll(poll, question="What's for lunch?")
+    # act
+    timeline = poll.history.value_timeline("question")
+    # assert
+    assert [entry["value"] for entry in timeline] == [
+        first_question,
+        "What's for dinner?",
+        "What's for lunch?",
+    ]
+    assert [entry["history_type"] for entry in timeline] == ["+", "~", "~"]
+
+
+@mark.django_db
+def test_field_timeline_lists_only_changes_of_the_field(poll):
+    # arrange
+    first_question = poll.question
+    _update_poll(poll, question="What's for dinner?")
+    _update_poll(poll, pub_date=poll.pub_date.replace(year=2000))
+    _update_poll(poll, question="What's for lunch?")
+    # act
+    timeline = HistoricalRecord.objects.field_timeline(Poll, poll.pk, "question")
+    # assert
+    assert [(change.old, change.new) for change in timeline] == [
+        (None, first_question),
+        (first_question, "What's for dinner?"),
+        ("What's for dinner?", "What's for lunch?"),
+    ]
+    assert timeline == sorted(timeline, key=lambda change: change.history_date)
+
+
+@mark.django_db
+def test_field_timelines_of_several_objects_in_one_query(
+    poll,
+    django_assert_num_queries,
+):
+    # arrange
+    other_poll = PollFactory.create(question="First")
+    _update_poll(other_poll, question="Second")
+    _update_poll(poll, pub_date=poll.pub_date.replace(year=2000))
+    # act
+    with django_assert_num_queries(1):
+        timelines = HistoricalRecord.objects.field_timelines(
+            Poll,
+            [poll.pk, other_poll.pk],
+            "question",
+        )
+    # assert
+    assert [change.new for change in timelines[str(poll.pk)]] == [poll.question]
+    assert [(change.old, change.new) for change in timelines[str(other_poll.pk)]] == [
+        (None, "First"),
+        ("First", "Second"),
+    ]
+
+
+@mark.django_db
+def test_field_timeline_resolves_values_stored_as_blobs():
+    # arrange
+    body = "Lorem ipsum " * 20
+    article = ArticleFactory.create(body="Short body")
+    article.body = body
+    article.save()
+    # act
+    timeline = HistoricalRecord.objects.field_timeline(
+        type(article),
+        article.pk,
+        "body",
+    )
+    # assert
+    assert [(change.old, change.new) for change in timeline] == [
+        (None, "Short body"),
+        ("Short body", body),
+    ]
+
+
+@mark.django_db
+def test_light_defers_json_columns(poll):
+    # act
+    record = HistoricalRecord.objects.light().get(object_id=poll.pk)
+    # assert
+    assert {"data", "additional_data", "history_diff", "history_changes"} <= (
+        record.get_deferred_fields()
+    )
+
+
+@mark.django_db
+def test_data_fields_extracts_fields_from_snapshots(poll):
+    # arrange
+    _update_poll(poll, question="What's for dinner?")
+    # act
+    records = poll.history.data_fields("question", "missing")
+    # assert
+    assert [record.data_fields for record in records] == [
+        {"question": "What's for dinner?", "missing": None},
+        {"question": poll.history.last().data["question"], "missing": None},
+    ]
+    assert "data" in records[0].get_deferred_fields()
+
+
+@mark.django_db
+def test_json_columns_decoded_when_accessed(poll):
+    # act
+    record = poll.history.get()
+    # assert
+    assert isinstance(record.__dict__["data"], str)
+    assert record.data["question"] == poll.question
+    assert record.__dict__["data"] is record.data
+    assert poll.history.values_list("data", flat=True).get() == record.data
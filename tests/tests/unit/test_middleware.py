@@ -1,7 +1,12 @@
+import asyncio
+import gc
+import weakref
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
 from pytest import fixture
 
 from atris.middleware import LoggingRequestMiddleware
-from atris.models import HistoryLogging
+from atris.models import get_history_context
 
 
 @fixture(scope="function")
@@ -13,7 +18,76 @@ def mock_request(mocker):
 
 
 def test_logging_request_middleware(mock_request):
-    assert not hasattr(HistoryLogging.thread, "request")
-    middleware = LoggingRequestMiddleware(lambda get_response: None)
-    middleware.process_request(mock_request)
-    assert HistoryLogging.thread.request == mock_request
+    def get_response(request):
+        return get_history_context()
+
+    middleware = LoggingRequestMiddleware(get_response)
+    context = middleware(mock_request)
+    assert context.user == mock_request.user
+    assert get_history_context() is None
+
+
+def test_async_logging_request_middleware(mock_request):
+    async def get_response(request):
+        return get_history_context()
+
+    middleware = LoggingRequestMiddleware(get_response)
+    assert iscoroutinefunction(middleware)
+    context = async_to_sync(middleware)(mock_request)
+    assert context.user == mock_request.user
+    assert get_history_context() is None
+
+
+def test_concurrent_requests_have_separate_contexts(mocker):
+    handled = []
+
+    async def get_response(request):
+        context = get_history_context()
+        handled.append(request)
+        # Both requests are being handled before either one completes.
+        while len(handled) < 2:
+            await asyncio.sleep(0)
+        return context, get_history_context()
+
+    middleware = LoggingRequestMiddleware(get_response)
+
+    async def handle_requests(*requests):
+        return await asyncio.gather(*(middleware(request) for request in requests))
+
+    request1, request2 = mocker.Mock(), mocker.Mock()
+    (context1, context1_after), (context2, context2_after) = async_to_sync(
+        handle_requests,
+    )(request1, request2)
+    assert context1 is context1_after
+    assert context2 is context2_after
+    assert context1.user == request1.user
+    assert context2.user == request2.user
+    assert context1.changeset_id != context2.changeset_id
+
+
+def test_request_not_kept_alive_by_context(mocker):
+    def get_response(request):
+        return get_history_context()
+
+    request = mocker.Mock()
+    request_ref = weakref.ref(request)
+    context = LoggingRequestMiddleware(get_response)(request)
+    del request
+    gc.collect()
+    assert request_ref() is None
+    assert context.user is None
+
+
+def test_user_read_from_request_when_history_generated(mocker):
+    def get_response(request):
+        context = get_history_context()
+        user_before_login = context.user
+        request.user = mocker.Mock(id=2, get_full_name=lambda: "Logged In")
+        return user_before_login, context.user, context.user_id_and_name
+
+    request = mocker.Mock(spec=["path"])
+    middleware = LoggingRequestMiddleware(get_response)
+    user_before_login, user, user_id_and_name = middleware(request)
+    assert user_before_login is None
+    assert user is request.user
+    assert user_id_and_name == (2, "Logged In")
@@ -0,0 +1,45 @@
+from pytest import mark
+
+from atris.models.history_logging import HistoryEnabledRelatedObjectsCollector
+from tests.conftest import history_format_fks
+from tests.factories import SeasonFactory, ShowFactory
+
+
+@mark.django_db
+def test_related_objects_compared_by_pk_and_fetched_in_one_query(
+    show, django_assert_num_queries
+):
+    # arrange
+    kept, added = SeasonFactory.create_batch(size=2, show=show)
+    removed = SeasonFactory.create(show=ShowFactory.create())
+    previous_data = {"season": history_format_fks([kept.pk, removed.pk])}
+    get_related_objects = HistoryEnabledRelatedObjectsCollector(
+        show,
+        "season",
+        previous_data,
+    )
+    # act
+    with django_assert_num_queries(2):
+        result = get_related_objects()
+    # assert
+    assert result == {
+        kept: HistoryEnabledRelatedObjectsCollector.UNMODIFIED,
+        added: HistoryEnabledRelatedObjectsCollector.ADDED,
+        removed: HistoryEnabledRelatedObjectsCollector.REMOVED,
+    }
+
+
+@mark.django_db
+def test_loaded_to_one_related_object_reused_without_query(
+    episode, django_assert_num_queries
+):
+    # arrange
+    episode.show.title = "Unsaved title"
+    get_related_objects = HistoryEnabledRelatedObjectsCollector(episode, "show")
+    # act
+    with django_assert_num_queries(0):
+        result = get_related_objects()
+    # assert
+    (show,) = result.keys()
+    assert show is episode.show
+    assert result[show] is HistoryEnabledRelatedObjectsCollector.ADDED